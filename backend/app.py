@@ -1,17 +1,42 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, make_response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from dotenv import load_dotenv
+from functools import wraps
+import hashlib
+import hmac
+import json
 import os
+import time
 from gemini_service import GeminiService
 from prompt_evaluator import PromptEvaluator
+from prompt_prescreen import PromptPrescreen
 from database import Database
+from job_queue import JobQueue
+from draft_pregenerator import DraftPregenerator
+from batch_runner import BatchRunner
+from evaluation_cache import EvaluationCache
+from metrics import metrics
+from profiler import Profiler, profiler
+from response_cache import ResponseCache
+from compression import ResponseCompressor
+from data_transfer import decode_ndjson, encode_ndjson
 
 # 환경 변수 로드
 load_dotenv()
 
+class ProfiledJSONProvider(DefaultJSONProvider):
+    """JSON 직렬화 시간을 프로파일링 serialize 단계로 기록"""
+
+    def dumps(self, obj, **kwargs):
+        with profiler.phase('serialize'):
+            return super().dumps(obj, **kwargs)
+
 app = Flask(__name__)
+if profiler.enabled:
+    app.json = ProfiledJSONProvider(app)
 # CORS 설정: 개발 환경 및 배포 환경 허용
-CORS(app, origins=[
+ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://localhost:8000",
     "http://localhost:5500",
@@ -19,18 +44,278 @@ CORS(app, origins=[
     "http://127.0.0.1:8000",
     "http://127.0.0.1:5500",
     "https://hotdeli88-pixel.github.io"
-])
+]
+CORS(app, origins=ALLOWED_ORIGINS)
 
 # 서비스 초기화
 gemini_service = GeminiService()
-prompt_evaluator = PromptEvaluator(gemini_service)
-db = Database()
+db = Database(os.getenv('DATABASE_PATH', 'aiedap.db'))
+evaluation_cache = EvaluationCache(db)
+prompt_prescreen = PromptPrescreen(db)
+prompt_evaluator = PromptEvaluator(gemini_service, evaluation_cache, prompt_prescreen)
+job_queue = JobQueue(db)
+draft_pregenerator = DraftPregenerator(db, gemini_service, job_queue)
+batch_runner = BatchRunner()
+response_cache = ResponseCache()
+response_compressor = ResponseCompressor()
+# HTTP로 mode=replace 가져오기를 허용하는 관리자 토큰 (비어 있으면 명령줄에서만 가능)
+IMPORT_REPLACE_TOKEN = os.getenv('IMPORT_REPLACE_TOKEN', '')
+
+def run_generate_content_job(payload):
+    """콘텐츠 생성 작업"""
+    html_content = gemini_service.generate_html_content(payload['prompt'], payload.get('student_name', ''))
+    return {"html_content": html_content}
+
+def save_approved_content(project_id, html_content, draft_key=None):
+    """프로젝트 승인, 콘텐츠 저장, 버전 히스토리 저장을 하나의 트랜잭션으로 처리
+
+    draft_key가 있으면 미리 생성한 초안을 사용한 것으로 함께 기록합니다.
+    """
+    with db.transaction():
+        if draft_key:
+            db.use_draft(draft_key)
+        updated_project = db.approve_project(project_id, html_content)
+        if not updated_project:
+            raise ValueError("프로젝트를 찾을 수 없습니다")
+
+        db.create_version(
+            project_id,
+            updated_project['prompt'],
+            html_content,
+            updated_project.get('evaluation'),
+            'approved'
+        )
+    return updated_project
+
+def run_approve_project_job(payload):
+    """프로젝트 승인 작업 (콘텐츠 생성 후 승인 및 버전 저장)"""
+    project_id = payload['project_id']
+    project = db.get_project(project_id)
+    if not project:
+        raise ValueError("프로젝트를 찾을 수 없습니다")
+
+    prompt = payload.get('prompt') or project['prompt']
+    student_name = payload.get('student_name') or project['student_name']
+
+    # 미리 생성한 초안이 있으면 사용, 없으면 콘텐츠 생성 (트랜잭션 밖에서 수행)
+    draft_key, html_content = draft_pregenerator.lookup(project_id, prompt, student_name)
+    if html_content is None:
+        html_content = gemini_service.generate_html_content(prompt, student_name)
+
+    updated_project = save_approved_content(project_id, html_content, draft_key)
+    return {"project_id": project_id, "status": updated_project['status'], "from_draft": draft_key is not None}
+
+def run_batch_approve_job(payload):
+    """일괄 승인 작업 (콘텐츠를 병렬로 생성하고 끝나는 순서대로 묶어서 저장, 결과는 항목별로 기록)"""
+    project_ids = payload['project_ids']
+    projects = db.get_projects_by_ids(project_ids)
+
+    def generate(project_id):
+        project = projects.get(project_id)
+        if not project:
+            raise ValueError("프로젝트를 찾을 수 없습니다")
+        draft_key, html_content = draft_pregenerator.lookup(project_id, project['prompt'], project['student_name'])
+        if html_content is None:
+            batch_runner.throttle()
+            html_content = gemini_service.generate_html_content(project['prompt'], project['student_name'])
+        return project_id, html_content, draft_key
+
+    def save(generated):
+        project_id, html_content, draft_key = generated
+        updated_project = save_approved_content(project_id, html_content, draft_key)
+        return {"status": updated_project['status'], "from_draft": draft_key is not None}
+
+    outcomes = batch_runner.commit_in_groups(db, batch_runner.run(generate, project_ids), save)
+    return batch_runner.report(project_ids, outcomes, 'project_id')
+
+job_queue.register('generate_content', run_generate_content_job)
+job_queue.register('approve_project', run_approve_project_job)
+job_queue.register('batch_approve', run_batch_approve_job)
+job_queue.register(DraftPregenerator.JOB_KIND, draft_pregenerator.run)
+# 재시작 전에 남아 있던 작업 처리
+job_queue.start()
+
+def job_accepted(job, **extra):
+    """작업 등록 응답 (202 Accepted, extra는 응답 본문에 추가)"""
+    response = jsonify({
+        "success": True,
+        "job": job,
+        **extra
+    })
+    response.status_code = 202
+    response.headers['Location'] = f"/api/jobs/{job['id']}"
+    return response
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    profiler.start_request(request.headers.get(Profiler.HEADER))
+
+@app.after_request
+def record_request_metrics(response):
+    """라우트별 응답 시간과 상태 코드 기록 (스트리밍 응답은 헤더 전송 시점까지)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('aiedap_http_request_duration_seconds', time.perf_counter() - started,
+                        {"method": request.method, "route": route})
+        metrics.inc('aiedap_http_requests_total',
+                    {"method": request.method, "route": route, "status": response.status_code})
+        # 압축까지 끝난 뒤 기록 (after_request는 등록의 역순으로 실행)
+        trace = profiler.finish_request(request.method, request.path, route, response.status_code)
+        if trace:
+            response.headers['X-Profile-Trace'] = trace
+    return response
+
+@app.teardown_request
+def abandon_profile(error=None):
+    """응답 전에 실패한 요청의 프로파일링 정리"""
+    profiler.abandon_request()
+
+@app.after_request
+def compress_response(response):
+    """큰 JSON 응답을 Accept-Encoding에 따라 압축 (스트리밍 응답 제외)"""
+    if (response.is_streamed or response.direct_passthrough or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if not response_compressor.eligible(body):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = response_compressor.negotiate(request.headers.get('Accept-Encoding'))
+    if encoding:
+        with profiler.phase('compress'):
+            response.set_data(response_compressor.compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def cached_read(view):
+    """변경 카운터 기반 ETag/조건부 GET과 응답 캐시
+
+    데이터가 바뀌지 않았으면 If-None-Match에 304로 응답하고,
+    같은 URL의 반복 조회는 쿼리 없이 캐시된 본문을 반환합니다.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = db.get_change_counter()
+        etag = f"v{version}"
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            key = request.full_path
+            cached = response_cache.get(key, version)
+            if cached:
+                body, status, mimetype = cached
+                response = app.response_class(body, status=status, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response_cache.put(key, version, response.get_data(), response.status_code, response.mimetype)
+                response.headers['X-Cache'] = 'MISS'
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
+
+def idempotent(view):
+    """Idempotency-Key 헤더가 있으면 같은 키의 재시도에 처음 응답을 그대로 반환"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+
+        scope = f"{request.method} {request.path}"
+        stored = db.reserve_idempotency_key(scope, key)
+        if stored:
+            status_code, body = stored
+            if status_code is None:
+                return jsonify({"error": "같은 Idempotency-Key의 요청이 처리 중입니다"}), 409
+            response = app.response_class(body, status=status_code, mimetype='application/json')
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            db.release_idempotency_key(scope, key)
+            raise
+        if response.status_code >= 500:
+            # 서버 오류는 저장하지 않고 재시도 허용
+            db.release_idempotency_key(scope, key)
+        else:
+            db.complete_idempotency_key(scope, key, response.status_code, response.get_data(as_text=True))
+        return response
+    return wrapper
+
+def batch_project_ids(data):
+    """요청 본문의 project_ids 검사 (순서를 유지하며 중복 제거, 잘못되었으면 ValueError)"""
+    project_ids = batch_runner.validate((data or {}).get('project_ids'), "project_ids")
+    if not all(isinstance(project_id, int) and not isinstance(project_id, bool) for project_id in project_ids):
+        raise ValueError("project_ids는 정수 목록이어야 합니다")
+    return list(dict.fromkeys(project_ids))
+
+def dedupe_key(*parts):
+    """진행 중인 동일 작업을 찾기 위한 키"""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def sse_event(event, data):
+    """Server-Sent Events 메시지 형식으로 변환"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_generation(prompt, student_name, on_complete=None, draft_html=None):
+    """생성 중인 HTML 조각을 SSE로 전달하고, 완료되면 on_complete(html) 결과를 done 이벤트로 전달
+
+    draft_html이 있으면 모델을 호출하지 않고 한 조각으로 전달합니다.
+    """
+    def generate():
+        chunks = []
+        try:
+            source = [draft_html] if draft_html is not None else gemini_service.stream_html_content(
+                prompt, student_name)
+            for chunk in source:
+                chunks.append(chunk)
+                yield sse_event('chunk', {"html": chunk})
+            html_content = ''.join(chunks)
+            done = on_complete(html_content) if on_complete else {"html_content": html_content}
+            yield sse_event('done', {"success": True, **done})
+        except Exception as e:
+            yield sse_event('error', {"error": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """서버 상태 확인"""
     return jsonify({"status": "ok", "message": "Server is running"})
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus 형식 지표"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profiles', methods=['GET'])
+def get_profiles():
+    """최근 느린 요청/느린 쿼리 추적 기록 (PROFILE_ENABLED=1일 때)"""
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 200)
+    except ValueError:
+        return jsonify({"error": "limit은 정수여야 합니다"}), 400
+    kind = request.args.get('kind')
+    if kind not in (None, 'request', 'query'):
+        return jsonify({"error": "kind는 request 또는 query입니다"}), 400
+    return jsonify({
+        "success": True,
+        "enabled": profiler.enabled,
+        "traces": profiler.recent(limit, kind) if profiler.enabled else []
+    })
+
 @app.route('/api/evaluate-prompt', methods=['POST'])
 def evaluate_prompt():
     """프롬프트 적절성 평가"""
@@ -38,12 +323,13 @@ def evaluate_prompt():
         data = request.get_json()
         prompt = data.get('prompt', '')
         student_name = data.get('student_name', '')
+        force = bool(data.get('force', False))
         
         if not prompt:
             return jsonify({"error": "프롬프트가 필요합니다"}), 400
         
-        # AI 평가 수행
-        evaluation = prompt_evaluator.evaluate(prompt, student_name)
+        # AI 평가 수행 (force=true이면 캐시를 건너뛰고 재평가)
+        evaluation = prompt_evaluator.evaluate(prompt, student_name, force=force)
         
         return jsonify({
             "success": True,
@@ -52,6 +338,53 @@ def evaluate_prompt():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/evaluate-prompt/batch', methods=['POST'])
+def evaluate_prompts_batch():
+    """여러 프롬프트를 병렬로 평가 (항목별 결과, 일부가 실패해도 나머지는 평가)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        items = batch_runner.validate(data.get('prompts'), "prompts")
+        force = bool(data.get('force', False))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def evaluate(item):
+        # 문자열이면 프롬프트만, 객체이면 prompt/student_name
+        prompt, student_name = (item, '') if isinstance(item, str) else (
+            (item.get('prompt', ''), item.get('student_name', '')) if isinstance(item, dict) else ('', ''))
+        if not prompt:
+            raise ValueError("프롬프트가 필요합니다")
+        # 사전 검사/캐시로 처리되면 속도 제한 없이 바로 반환
+        evaluation = prompt_evaluator.evaluate(prompt, student_name, force=force, throttle=batch_runner.throttle)
+        return {"evaluation": evaluation}
+
+    try:
+        result = batch_runner.report(list(range(len(items))), batch_runner.run(evaluate, items), 'index')
+        return jsonify({"success": True, **result})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/evaluate-prompt/cache-stats', methods=['GET'])
+def get_evaluation_cache_stats():
+    """평가 캐시 적중/미스, 사전 검사, 평가 응답 검증/복구 통계"""
+    return jsonify({
+        "success": True,
+        "stats": evaluation_cache.stats(),
+        "prescreen": prompt_prescreen.stats(),
+        "parsing": prompt_evaluator.parse_stats()
+    })
+
+@app.route('/api/drafts/stats', methods=['GET'])
+def get_draft_stats():
+    """HTML 초안 미리 생성 현황 (사용률, 낭비된 생성 수)"""
+    try:
+        return jsonify({
+            "success": True,
+            "pregeneration": draft_pregenerator.stats()
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/generate-content', methods=['POST'])
 def generate_content():
     """승인된 프롬프트로 HTML 콘텐츠 생성"""
@@ -63,17 +396,30 @@ def generate_content():
         if not prompt:
             return jsonify({"error": "프롬프트가 필요합니다"}), 400
         
-        # Gemini API로 HTML 콘텐츠 생성
-        html_content = gemini_service.generate_html_content(prompt, student_name)
+        # Gemini API 호출은 백그라운드 작업으로 처리
+        job = job_queue.enqueue('generate_content', {
+            "prompt": prompt,
+            "student_name": student_name
+        }, dedupe_key=dedupe_key('generate_content', prompt, student_name))
         
-        return jsonify({
-            "success": True,
-            "html_content": html_content
-        })
+        return job_accepted(job)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/generate-content/stream', methods=['POST'])
+def generate_content_stream():
+    """HTML 콘텐츠를 생성하면서 SSE로 스트리밍"""
+    data = request.get_json()
+    prompt = data.get('prompt', '')
+    student_name = data.get('student_name', '')
+
+    if not prompt:
+        return jsonify({"error": "프롬프트가 필요합니다"}), 400
+
+    return stream_generation(prompt, student_name)
+
 @app.route('/api/projects', methods=['POST'])
+@idempotent
 def create_project():
     """프로젝트 생성 (학생이 프롬프트 제출)"""
     try:
@@ -88,6 +434,7 @@ def create_project():
         
         # 데이터베이스에 프로젝트 저장
         project = db.create_project(student_name, title, prompt, evaluation)
+        schedule_draft(project)
         
         return jsonify({
             "success": True,
@@ -96,32 +443,81 @@ def create_project():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def schedule_draft(project):
+    """평가 점수가 높은 프로젝트의 HTML 초안 생성 예약 (실패해도 프로젝트 생성에는 영향 없음)"""
+    try:
+        draft_pregenerator.schedule(project)
+    except Exception:
+        app.logger.exception("HTML 초안 예약 실패: %s", project['id'])
+
+def _pagination_args():
+    """목록 조회 공통 쿼리 파라미터 (limit, cursor, include_html)"""
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor') or None
+    include_html = request.args.get('include_html', '').lower() in ('1', 'true', 'yes')
+    return limit, cursor, include_html
+
 @app.route('/api/projects/pending', methods=['GET'])
+@cached_read
 def get_pending_projects():
-    """승인 대기 중인 프로젝트 조회"""
+    """승인 대기 중인 프로젝트 조회 (키셋 페이지네이션)"""
     try:
-        projects = db.get_pending_projects()
+        limit, cursor, include_html = _pagination_args()
+        projects, next_cursor = db.get_pending_projects(limit, cursor, include_html)
         return jsonify({
             "success": True,
-            "projects": projects
+            "projects": projects,
+            "next_cursor": next_cursor
         })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/projects', methods=['GET'])
+@cached_read
 def get_projects():
-    """프로젝트 조회 (학생별 필터링 가능)"""
+    """프로젝트 조회 (학생별/상태별 필터링, 키셋 페이지네이션)"""
     try:
         student_name = request.args.get('student_name')
-        projects = db.get_all_projects(student_name)
+        status = request.args.get('status')
+        limit, cursor, include_html = _pagination_args()
+        projects, next_cursor = db.list_projects(status, student_name, limit, cursor, include_html)
+        return jsonify({
+            "success": True,
+            "projects": projects,
+            "next_cursor": next_cursor
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/projects/search', methods=['GET'])
+@cached_read
+def search_projects():
+    """프로젝트 전문 검색 (제목/프롬프트/평가 피드백, 관련도순)"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({"error": "검색어(q)가 필요합니다"}), 400
+        projects, next_offset = db.search_projects(
+            query,
+            status=request.args.get('status'),
+            student_name=request.args.get('student_name'),
+            limit=request.args.get('limit', type=int),
+            offset=request.args.get('offset', 0, type=int)
+        )
         return jsonify({
             "success": True,
-            "projects": projects
+            "projects": projects,
+            "next_offset": next_offset
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/projects/<int:project_id>', methods=['GET'])
+@cached_read
 def get_project(project_id):
     """특정 프로젝트 조회"""
     try:
@@ -136,6 +532,7 @@ def get_project(project_id):
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/projects/<int:project_id>/approve', methods=['PUT'])
+@idempotent
 def approve_project(project_id):
     """프로젝트 승인"""
     try:
@@ -148,28 +545,108 @@ def approve_project(project_id):
         if not project:
             return jsonify({"error": "프로젝트를 찾을 수 없습니다"}), 404
         
-        # 콘텐츠 생성
-        html_content = gemini_service.generate_html_content(prompt or project['prompt'], student_name or project['student_name'])
-        
-        # 프로젝트 승인 및 콘텐츠 저장
-        updated_project = db.approve_project(project_id, html_content)
+        # 콘텐츠 생성 및 승인은 백그라운드 작업으로 처리
+        # 같은 프로젝트의 승인 작업(일괄 승인 포함)이 진행 중이면 새로 생성하지 않고 그 작업 반환 (중복 클릭 방지)
+        with db.transaction():
+            active_job_id = db.get_active_approve_jobs([project_id]).get(project_id)
+            job = job_queue.get(active_job_id) if active_job_id else job_queue.enqueue('approve_project', {
+                "project_id": project_id,
+                "prompt": prompt,
+                "student_name": student_name
+            }, dedupe_key=dedupe_key('approve_project', project_id))
         
-        # 버전 히스토리 저장
-        db.create_version(
-            project_id,
-            project['prompt'],
-            html_content,
-            project.get('evaluation'),
-            'approved'
+        return job_accepted(job)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/projects/batch/approve', methods=['PUT'])
+@idempotent
+def approve_projects_batch():
+    """여러 프로젝트 일괄 승인 (콘텐츠 생성과 저장은 하나의 백그라운드 작업으로 처리)"""
+    try:
+        project_ids = batch_project_ids(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        # 이미 승인되었거나 승인 작업(단건/일괄)이 진행 중인 프로젝트는 제외해 같은 콘텐츠를 두 번 생성하지 않음
+        with db.transaction():
+            projects = db.get_projects_by_ids(project_ids)
+            active_jobs = db.get_active_approve_jobs(project_ids)
+            pending = []
+            skipped = []
+            for project_id in project_ids:
+                if project_id in active_jobs:
+                    skipped.append({"project_id": project_id, "reason": "in_progress", "job_id": active_jobs[project_id]})
+                elif project_id in projects and projects[project_id]['status'] == 'approved':
+                    skipped.append({"project_id": project_id, "reason": "already_approved"})
+                else:
+                    pending.append(project_id)
+            if not pending:
+                return jsonify({"success": True, "job": None, "skipped": skipped})
+            # 같은 프로젝트 목록의 일괄 승인이 진행 중이면 새로 생성하지 않음
+            job = job_queue.enqueue('batch_approve', {
+                "project_ids": pending
+            }, dedupe_key=dedupe_key('batch_approve', sorted(pending)))
+        return job_accepted(job, skipped=skipped)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/projects/batch/reject', methods=['PUT'])
+def reject_projects_batch():
+    """여러 프로젝트 일괄 거부 (UPDATE 한 번, 초안 폐기까지 하나의 트랜잭션)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        project_ids = batch_project_ids(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        with db.transaction():
+            rejected = set(db.reject_projects(project_ids, data.get('rejection_reason', '')))
+            for project_id in rejected:
+                draft_pregenerator.discard(project_id)
+
+        not_found = ValueError("프로젝트를 찾을 수 없습니다")
+        outcomes = (
+            (index, {"status": "rejected"}, None) if project_id in rejected else (index, None, not_found)
+            for index, project_id in enumerate(project_ids)
         )
-        
-        return jsonify({
-            "success": True,
-            "project": updated_project
-        })
+        return jsonify({"success": True, **batch_runner.report(project_ids, outcomes, 'project_id')})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/projects/<int:project_id>/approve/stream', methods=['POST'])
+def approve_project_stream(project_id):
+    """프로젝트 승인 (생성 중인 HTML을 SSE로 스트리밍하고 완료 시 저장)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        prompt = data.get('prompt', '')
+        student_name = data.get('student_name', '')
+
+        project = db.get_project(project_id)
+        if not project:
+            return jsonify({"error": "프로젝트를 찾을 수 없습니다"}), 404
+
+        prompt = prompt or project['prompt']
+        student_name = student_name or project['student_name']
+        draft_key, draft_html = draft_pregenerator.lookup(project_id, prompt, student_name)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    return stream_generation(
+        prompt,
+        student_name,
+        lambda html_content: finish_approve_stream(project_id, html_content, draft_key),
+        draft_html
+    )
+
+def finish_approve_stream(project_id, html_content, draft_key=None):
+    """승인 스트림 완료 처리 (스트림이 끝까지 전달된 경우에만 저장, 저장하는 HTML은 최소화)"""
+    html_content = gemini_service.html_minifier.minify(html_content)
+    updated_project = save_approved_content(project_id, html_content, draft_key)
+    # HTML은 이미 chunk 이벤트로 전달했으므로 제외
+    updated_project.pop('html_content', None)
+    return {"project": updated_project}
+
 @app.route('/api/projects/<int:project_id>/reject', methods=['PUT'])
 def reject_project(project_id):
     """프로젝트 거부"""
@@ -177,13 +654,11 @@ def reject_project(project_id):
         data = request.get_json()
         rejection_reason = data.get('rejection_reason', '')
         
-        # 프로젝트 조회
-        project = db.get_project(project_id)
-        if not project:
-            return jsonify({"error": "프로젝트를 찾을 수 없습니다"}), 404
-        
-        # 프로젝트 거부
+        # 프로젝트 거부 (UPDATE ... RETURNING 한 번으로 처리)
         updated_project = db.reject_project(project_id, rejection_reason)
+        if not updated_project:
+            return jsonify({"error": "프로젝트를 찾을 수 없습니다"}), 404
+        draft_pregenerator.discard(project_id)
         
         return jsonify({
             "success": True,
@@ -193,8 +668,9 @@ def reject_project(project_id):
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/projects/<int:project_id>/versions', methods=['GET'])
+@cached_read
 def get_project_versions(project_id):
-    """프로젝트의 버전 히스토리 조회"""
+    """프로젝트의 버전 히스토리 조회 (메타데이터만)"""
     try:
         versions = db.get_versions_by_project(project_id)
         return jsonify({
@@ -204,17 +680,27 @@ def get_project_versions(project_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/projects/<int:project_id>/versions/<int:version_id>', methods=['GET'])
+@cached_read
+def get_project_version(project_id, version_id):
+    """특정 버전 조회 (프롬프트, 평가, HTML 포함)"""
+    try:
+        version = db.get_version(version_id)
+        if not version or version['project_id'] != project_id:
+            return jsonify({"error": "버전을 찾을 수 없습니다"}), 404
+        return jsonify({
+            "success": True,
+            "version": version
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/projects/<int:project_id>', methods=['PUT'])
 def update_project(project_id):
     """프로젝트 업데이트"""
     try:
         data = request.get_json()
 
-        # 프로젝트 조회
-        project = db.get_project(project_id)
-        if not project:
-            return jsonify({"error": "프로젝트를 찾을 수 없습니다"}), 404
-
         # 업데이트할 필드만 추출
         updates = {}
         allowed_fields = ['title', 'prompt', 'evaluation', 'status', 'html_content']
@@ -222,17 +708,27 @@ def update_project(project_id):
             if field in data:
                 updates[field] = data[field]
 
-        # 버전 히스토리 저장 (프롬프트나 평가가 변경된 경우)
-        if 'prompt' in updates or 'evaluation' in updates:
-            db.create_version(
-                project_id,
-                updates.get('prompt', project['prompt']),
-                updates.get('html_content', project.get('html_content')),
-                updates.get('evaluation', project.get('evaluation')),
-                updates.get('status', project['status'])
-            )
+        # 조회, 버전 저장, 업데이트를 하나의 트랜잭션으로 처리
+        with db.transaction():
+            project = db.get_project(project_id)
+            if not project:
+                return jsonify({"error": "프로젝트를 찾을 수 없습니다"}), 404
+
+            # 버전 히스토리 저장 (프롬프트나 평가가 변경된 경우)
+            if 'prompt' in updates or 'evaluation' in updates:
+                db.create_version(
+                    project_id,
+                    updates.get('prompt', project['prompt']),
+                    updates.get('html_content', project.get('html_content')),
+                    updates.get('evaluation', project.get('evaluation')),
+                    updates.get('status', project['status'])
+                )
 
-        updated_project = db.update_project(project_id, **updates)
+            updated_project = db.update_project(project_id, **updates)
+
+        # 프롬프트가 바뀌면 미리 생성한 초안은 사용할 수 없음
+        if updates.get('prompt', project['prompt']) != project['prompt']:
+            draft_pregenerator.discard(project_id)
 
         return jsonify({
             "success": True,
@@ -245,13 +741,9 @@ def update_project(project_id):
 def delete_project(project_id):
     """프로젝트 삭제"""
     try:
-        # 프로젝트 조회
-        project = db.get_project(project_id)
-        if not project:
-            return jsonify({"error": "프로젝트를 찾을 수 없습니다"}), 404
-
         # 프로젝트 삭제
-        db.delete_project(project_id)
+        if not db.delete_project(project_id):
+            return jsonify({"error": "프로젝트를 찾을 수 없습니다"}), 404
 
         return jsonify({
             "success": True,
@@ -261,6 +753,7 @@ def delete_project(project_id):
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/students', methods=['GET'])
+@cached_read
 def get_students():
     """모든 학생 목록 조회"""
     try:
@@ -272,6 +765,67 @@ def get_students():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/stats', methods=['GET'])
+@cached_read
+def get_stats():
+    """대시보드 통계 (상태별 수, 학생별 평균 점수, 점수 분포, 일별 제출 수)"""
+    try:
+        stats = db.get_stats(request.args.get('days', type=int))
+        return jsonify({
+            "success": True,
+            "stats": stats
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """백그라운드 작업 상태 조회"""
+    try:
+        job = job_queue.get(job_id)
+        if not job:
+            return jsonify({"error": "작업을 찾을 수 없습니다"}), 404
+        return jsonify({
+            "success": True,
+            "job": job
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/export', methods=['GET'])
+def export_data():
+    """프로젝트와 버전 전체를 NDJSON으로 스트리밍 내보내기 (gzip=1이면 gzip 파일)"""
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    filename = time.strftime('aiedap-%Y%m%d-%H%M%S.ndjson') + ('.gz' if compress else '')
+    return Response(
+        stream_with_context(encode_ndjson(db.export_records(), compress)),
+        mimetype='application/gzip' if compress else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"', 'Cache-Control': 'no-cache'}
+    )
+
+@app.route('/api/import', methods=['POST'])
+def import_data():
+    """NDJSON(또는 gzip) 본문을 스트리밍으로 읽어 한 트랜잭션으로 가져오기 (mode=append|replace)
+
+    replace는 기존 데이터를 모두 지우므로 IMPORT_REPLACE_TOKEN을 설정하고 X-Admin-Token 헤더로
+    같은 값을 보낸 경우에만 허용합니다.
+    """
+    mode = request.args.get('mode', 'append')
+    if mode == 'replace' and not (
+            IMPORT_REPLACE_TOKEN
+            and hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), IMPORT_REPLACE_TOKEN.encode())):
+        return jsonify({"error": "mode=replace는 관리자 토큰이 필요합니다"}), 403
+    try:
+        imported = db.import_records(decode_ndjson(request.stream), mode=mode)
+        return jsonify({
+            "success": True,
+            "imported": imported
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=True, port=port, host='0.0.0.0')
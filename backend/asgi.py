@@ -0,0 +1,281 @@
+"""AIEDAP 백엔드 ASGI 진입점
+
+Gemini를 호출하는 엔드포인트(프롬프트 평가, SSE 스트리밍 생성/승인)는 이벤트 루프에서
+비동기로 처리해 응답을 기다리는 동안 워커 스레드를 점유하지 않습니다. 데이터베이스
+작업은 크기가 제한된 스레드 풀에서 실행하고, 나머지 라우트는 기존 Flask 앱에 그대로
+위임합니다. 위임한 라우트는 별도 스레드 풀에서 동시에 실행하므로 느린 요청(일괄 평가 등)
+뒤에 다른 요청이 줄 서지 않습니다.
+
+실행:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import os
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from a2wsgi import WSGIMiddleware
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+
+from app import (
+    ALLOWED_ORIGINS, app as flask_app, db, draft_pregenerator, finish_approve_stream,
+    gemini_service, prompt_evaluator, response_compressor, sse_event
+)
+from metrics import metrics
+
+# 데이터베이스 작업을 실행하는 스레드 수
+db_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ASGI_DB_WORKERS', 8)),
+    thread_name_prefix='asgi-db'
+)
+# 위임한 Flask 라우트를 실행하는 스레드 수 (gunicorn의 --threads에 해당)
+wsgi_app = WSGIMiddleware(flask_app, workers=int(os.getenv('ASGI_WSGI_WORKERS', 16)))
+
+async def app(scope, receive, send):
+    """ASGI 애플리케이션 (비동기 라우트가 아니면 Flask 앱으로 위임)"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['method'] == 'POST':
+        route = match_route(scope['path'])
+        if route:
+            handler, rule, kwargs = route
+            body = await read_body(receive)
+            data = parse_json(scope, body)
+            if handler is approve_project_stream and not data:
+                # Flask 라우트와 같이 본문이 없거나 잘못되어도 기본값으로 처리
+                data = {}
+            if isinstance(data, dict):
+                request = AsyncRequest(scope, receive, send, rule)
+                return await request.run(handler, data, **kwargs)
+            # JSON 객체가 아니면 오류 응답까지 Flask와 동일하도록 위임
+            receive = replay_body(body, receive)
+
+    await wsgi_app(scope, receive, send)
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            db_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+def match_route(path):
+    """Flask URL 규칙으로 비동기 라우트 찾기 ((handler, rule, kwargs) 또는 None)"""
+    try:
+        rule, kwargs = flask_app.url_map.bind('localhost').match(path, 'POST', return_rule=True)
+    except (HTTPException, RequestRedirect):
+        return None
+    handler = ASYNC_ROUTES.get(rule.endpoint)
+    return (handler, rule.rule, kwargs) if handler else None
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+def replay_body(body, receive):
+    """이미 읽은 본문을 다시 전달하는 receive"""
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        return await receive()
+    return replay
+
+def parse_json(scope, body):
+    """Content-Type이 JSON인 본문 해석 (아니거나 잘못된 형식이면 None)"""
+    headers = dict(scope['headers'])
+    mimetype = headers.get(b'content-type', b'').split(b';')[0].strip().lower()
+    # Flask의 request.is_json과 같은 기준
+    if mimetype != b'application/json' and not (
+            mimetype.startswith(b'application/') and mimetype.endswith(b'+json')):
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+class AsyncRequest:
+    """비동기 라우트 하나의 요청/응답 처리 (CORS 헤더, 지표 기록)"""
+
+    def __init__(self, scope, receive, send, rule):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.rule = rule
+        self.started = time.perf_counter()
+        self.origin = dict(scope['headers']).get(b'origin', b'').decode('latin-1')
+
+    async def run(self, handler, data, **kwargs):
+        try:
+            await handler(self, data, **kwargs)
+        except Exception as e:
+            await self.json({"error": str(e)}, 500)
+
+    def _headers(self, content_type, extra=()):
+        headers = [(b'content-type', content_type.encode('latin-1'))]
+        if self.origin in ALLOWED_ORIGINS:
+            headers.append((b'access-control-allow-origin', self.origin.encode('latin-1')))
+            headers.append((b'vary', b'Origin'))
+        headers.extend(extra)
+        return headers
+
+    def _record(self, status):
+        """Flask의 after_request와 같은 라우트별 지표 기록"""
+        metrics.observe('aiedap_http_request_duration_seconds', time.perf_counter() - self.started,
+                        {"method": "POST", "route": self.rule})
+        metrics.inc('aiedap_http_requests_total',
+                    {"method": "POST", "route": self.rule, "status": status})
+
+    async def json(self, data, status=200):
+        """jsonify와 같은 형식의 JSON 응답 (app.compress_response와 같은 기준으로 압축)"""
+        with flask_app.app_context():
+            body = flask_app.json.response(data).get_data()
+        headers = []
+        if response_compressor.eligible(body):
+            headers.append((b'vary', b'Accept-Encoding'))
+            accept_encoding = dict(self.scope['headers']).get(b'accept-encoding', b'').decode('latin-1')
+            encoding = response_compressor.negotiate(accept_encoding)
+            if encoding:
+                body = response_compressor.compress(body, encoding)
+                headers.append((b'content-encoding', encoding.encode('latin-1')))
+        headers.append((b'content-length', str(len(body)).encode()))
+        self._record(status)
+        await self.send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': self._headers('application/json', headers)
+        })
+        await self.send({'type': 'http.response.body', 'body': body})
+
+    async def stream(self, prompt, student_name, on_complete=None, draft_html=None):
+        """생성 중인 HTML 조각을 SSE로 전달 (app.stream_generation과 같은 이벤트)
+
+        클라이언트 연결이 끊기면 모델 호출을 취소하고 on_complete를 실행하지 않습니다.
+        draft_html이 있으면 모델을 호출하지 않고 한 조각으로 전달합니다.
+        """
+        self._record(200)
+        await self.send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': self._headers('text/event-stream; charset=utf-8', [
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ])
+        })
+
+        async def generate():
+            chunks = []
+            try:
+                if draft_html is not None:
+                    chunks.append(draft_html)
+                    await self._event('chunk', {"html": draft_html})
+                else:
+                    async for chunk in gemini_service.stream_html_content_async(prompt, student_name):
+                        chunks.append(chunk)
+                        await self._event('chunk', {"html": chunk})
+                html_content = ''.join(chunks)
+                if on_complete:
+                    loop = asyncio.get_running_loop()
+                    done = await loop.run_in_executor(db_executor, on_complete, html_content)
+                else:
+                    done = {"html_content": html_content}
+                await self._event('done', {"success": True, **done})
+            except Exception as e:
+                await self._event('error', {"error": str(e)})
+
+        task = asyncio.ensure_future(generate())
+        watcher = asyncio.ensure_future(self._wait_disconnect())
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            return
+        await self.send({'type': 'http.response.body', 'body': b''})
+
+    async def _event(self, event, data):
+        await self.send({
+            'type': 'http.response.body',
+            'body': sse_event(event, data).encode('utf-8'),
+            'more_body': True
+        })
+
+    async def _wait_disconnect(self):
+        while True:
+            message = await self.receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+async def in_db_executor(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(db_executor, fn, *args)
+
+async def evaluate_prompt(request, data):
+    """프롬프트 적절성 평가 (app.evaluate_prompt와 동일)"""
+    prompt = data.get('prompt', '')
+    student_name = data.get('student_name', '')
+    force = bool(data.get('force', False))
+
+    if not prompt:
+        return await request.json({"error": "프롬프트가 필요합니다"}, 400)
+
+    evaluation = await prompt_evaluator.evaluate_async(
+        prompt, student_name, force=force, executor=db_executor)
+    await request.json({
+        "success": True,
+        "evaluation": evaluation
+    })
+
+async def generate_content_stream(request, data):
+    """HTML 콘텐츠를 생성하면서 SSE로 스트리밍 (app.generate_content_stream과 동일)"""
+    prompt = data.get('prompt', '')
+    student_name = data.get('student_name', '')
+
+    if not prompt:
+        return await request.json({"error": "프롬프트가 필요합니다"}, 400)
+
+    await request.stream(prompt, student_name)
+
+async def approve_project_stream(request, data, project_id):
+    """프로젝트 승인 스트리밍 (app.approve_project_stream과 동일)"""
+    prompt = data.get('prompt', '')
+    student_name = data.get('student_name', '')
+
+    project = await in_db_executor(db.get_project, project_id)
+    if not project:
+        return await request.json({"error": "프로젝트를 찾을 수 없습니다"}, 404)
+
+    prompt = prompt or project['prompt']
+    student_name = student_name or project['student_name']
+    draft_key, draft_html = await in_db_executor(draft_pregenerator.lookup, project_id, prompt, student_name)
+
+    await request.stream(
+        prompt,
+        student_name,
+        lambda html_content: finish_approve_stream(project_id, html_content, draft_key),
+        draft_html
+    )
+
+# Flask 엔드포인트 이름 -> 비동기 처리 함수
+ASYNC_ROUTES = {
+    'evaluate_prompt': evaluate_prompt,
+    'generate_content_stream': generate_content_stream,
+    'approve_project_stream': approve_project_stream,
+}
@@ -0,0 +1,113 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from metrics import metrics
+from resilience import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+class BatchRunner:
+    """여러 항목의 모델 호출을 크기가 제한된 스레드 풀에서 병렬로 실행
+
+    스레드 풀은 모든 일괄 요청이 함께 사용하므로 동시에 진행되는 모델 호출은 max_workers개를
+    넘지 않으며, 모델을 호출하기 직전에 rate_limiter.acquire()로 분당 호출 수를 제한합니다.
+    항목별 실패는 다른 항목에 영향을 주지 않고 결과에 항목별로 기록됩니다.
+    """
+
+    def __init__(self, max_workers=None, rate_per_minute=None, max_items=None, commit_size=None):
+        self.max_workers = max_workers or int(os.getenv('BATCH_MAX_WORKERS', 8))
+        self.rate_per_minute = rate_per_minute if rate_per_minute is not None else int(
+            os.getenv('BATCH_RATE_LIMIT_PER_MINUTE', 120))
+        self.max_items = max_items or int(os.getenv('BATCH_MAX_ITEMS', 100))
+        self.commit_size = commit_size or int(os.getenv('BATCH_COMMIT_SIZE', 10))
+        # 처음 max_workers개는 바로 호출하고 이후는 분당 rate_per_minute개로 제한
+        self.rate_limiter = RateLimiter(self.rate_per_minute / 60.0, burst=self.max_workers)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+
+    def validate(self, items, name):
+        """요청 본문의 항목 목록 검사 (잘못되었으면 ValueError)"""
+        if not isinstance(items, list) or not items:
+            raise ValueError(f"{name} 목록이 필요합니다")
+        if len(items) > self.max_items:
+            raise ValueError(f"한 번에 최대 {self.max_items}개까지 처리할 수 있습니다")
+        return items
+
+    def throttle(self):
+        """모델 호출 직전에 호출 (속도 제한으로 기다린 시간은 지표로 기록)"""
+        waited = self.rate_limiter.acquire()
+        if waited:
+            metrics.inc('aiedap_batch_throttled_seconds_total', value=waited)
+
+    def run(self, fn, items):
+        """fn(item)을 병렬로 실행하고 끝나는 순서대로 (index, 결과, 오류) 반환"""
+        executor = self._get_executor()
+        futures = {executor.submit(fn, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], None if error else future.result(), error
+
+    def commit_in_groups(self, db, outcomes, save):
+        """run()의 성공 결과를 commit_size개씩 한 트랜잭션으로 save(결과)하고 (index, 저장 결과, 오류) 반환
+
+        그룹 저장 중 오류가 나면 그룹 전체를 롤백한 뒤 항목별 트랜잭션으로 다시 저장해
+        실패한 항목만 오류로 기록합니다.
+        """
+        group = []
+        for index, value, error in outcomes:
+            if error is not None:
+                yield index, None, error
+                continue
+            group.append((index, value))
+            if len(group) >= self.commit_size:
+                yield from self._commit(db, group, save)
+                group = []
+        if group:
+            yield from self._commit(db, group, save)
+
+    def _commit(self, db, group, save):
+        try:
+            with db.transaction():
+                saved = [(index, save(value), None) for index, value in group]
+        except Exception as e:
+            logger.warning("일괄 저장 실패, 항목별로 다시 저장: %s", e)
+            saved = []
+            for index, value in group:
+                try:
+                    with db.transaction():
+                        saved.append((index, save(value), None))
+                except Exception as item_error:
+                    saved.append((index, None, item_error))
+        metrics.inc('aiedap_batch_commits_total', value=1)
+        return saved
+
+    @staticmethod
+    def report(keys, outcomes, key_name):
+        """(index, 결과 dict, 오류)들을 요청 순서대로 정리한 항목별 결과"""
+        results = [None] * len(keys)
+        for index, result, error in outcomes:
+            entry = {key_name: keys[index], "success": error is None}
+            if error is None:
+                entry.update(result or {})
+            else:
+                entry["error"] = str(error)
+            results[index] = entry
+        succeeded = sum(1 for entry in results if entry["success"])
+        for entry in results:
+            metrics.inc('aiedap_batch_items_total', {"result": "success" if entry["success"] else "failure"})
+        return {
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results
+        }
+
+    def _get_executor(self):
+        """공유 스레드 풀 (프로세스마다 한 번, fork 이후 다시 생성)"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='batch')
+            return self._executor
@@ -0,0 +1,449 @@
+"""AIEDAP 백엔드 부하 테스트/벤치마크
+
+가짜 모델(GEMINI_BACKEND=fake)과 시드 데이터베이스를 사용해 API 키 없이
+모든 엔드포인트를 동시 클라이언트 N개로 호출하고, 엔드포인트별
+p50/p95/p99 지연 시간과 처리량을 보고합니다.
+
+사용법:
+    python benchmark.py --clients 16 --requests 200 --projects 3000
+    python benchmark.py --output result.json
+    python benchmark.py --asgi --clients 200 --only evaluate_prompt   # ASGI 모드
+    python benchmark.py --startup-runs 5 --only health                 # 시작 시간 측정
+    python benchmark.py --baseline result.json --max-regression 0.2   # 회귀 시 종료 코드 1
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import http.client
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AIEDAP 백엔드 벤치마크")
+    parser.add_argument('--clients', type=int, default=16, help="동시 클라이언트 수")
+    parser.add_argument('--requests', type=int, default=200, help="엔드포인트별 요청 수")
+    parser.add_argument('--projects', type=int, default=3000, help="시드 프로젝트 수")
+    parser.add_argument('--html-kb', type=int, default=40, help="시드/생성 HTML 크기(KB)")
+    parser.add_argument('--model-latency-ms', type=float, default=200, help="가짜 모델 지연 시간")
+    parser.add_argument('--model-error-rate', type=float, default=0.0, help="가짜 모델 오류 비율")
+    parser.add_argument('--only', help="쉼표로 구분한 실행할 시나리오 이름")
+    parser.add_argument('--db', help="데이터베이스 경로 (기본: 임시 파일)")
+    parser.add_argument('--startup-runs', type=int, default=3,
+                        help="시작 시간(가져오기, 첫 응답) 측정 횟수 (0이면 측정하지 않음)")
+    parser.add_argument('--asgi', action='store_true', help="Flask 개발 서버 대신 uvicorn(asgi:app)으로 실행")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="결과 JSON 저장 경로")
+    parser.add_argument('--baseline', help="비교할 이전 결과 JSON")
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help="허용하는 p95 증가/처리량 감소 비율 (기본 20%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help="이보다 작은 p95 차이는 회귀로 보지 않음")
+    return parser.parse_args(argv)
+
+def seed_database(db_path, projects, html_kb, seed):
+    """현실적인 크기의 프로젝트/버전 데이터 생성 (3개 중 1개는 승인되어 HTML과 버전 보유)"""
+    from database import Database
+    from model_client import FakeModelClient
+
+    rng = random.Random(seed)
+    db = Database(db_path)
+    with db.transaction():
+        for i in range(projects):
+            score = rng.randint(1, 5)
+            project = db.create_project(
+                f"학생{i % 120}",
+                f"이차함수 탐구 {i}",
+                f"이차함수 y = x^2 + {i % 17}x 의 그래프를 움직이며 꼭짓점의 변화를 관찰하는 콘텐츠를 만들어줘",
+                {"overall_score": score, "feedback": "구체적인 프롬프트입니다.", "suggestions": []}
+            )
+            if i % 3 == 0:
+                html = FakeModelClient.sample_html(html_kb, rng)
+                db.approve_project(project['id'], html)
+                db.create_version(project['id'], project['prompt'], html, project['evaluation'], 'approved')
+            elif i % 3 == 1:
+                db.reject_project(project['id'], "수학 내용과의 연관성이 부족합니다")
+    db.close()
+
+# 새 프로세스에서 app을 가져온 시간(ms)을 출력한 뒤 서버 실행
+STARTUP_SCRIPT = """
+import sys, time
+started = time.perf_counter()
+import app as backend
+print(round((time.perf_counter() - started) * 1000, 1), flush=True)
+from werkzeug.serving import make_server
+make_server('127.0.0.1', int(sys.argv[1]), backend.app, threaded=True).serve_forever()
+"""
+
+def measure_startup(db_path, runs):
+    """app 가져오기 시간과 프로세스 시작부터 첫 응답까지 시간(ms)의 중앙값
+
+    실제 배포와 같이 Gemini 백엔드로 설정하지만, SDK는 처음 호출할 때 로드되므로
+    API 키는 임의의 값을 사용합니다.
+    """
+    env = dict(os.environ, GEMINI_BACKEND='gemini', DATABASE_PATH=db_path)
+    env.setdefault('GEMINI_API_KEY', 'benchmark-startup')
+    import_ms = []
+    first_response_ms = []
+    for _ in range(runs):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, '-c', STARTUP_SCRIPT, str(port)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        try:
+            while True:
+                try:
+                    if http_request(port, 'GET', '/api/health')[0] == 200:
+                        break
+                except OSError:
+                    if process.poll() is not None:
+                        raise RuntimeError("시작 시간 측정용 서버가 종료되었습니다")
+                    time.sleep(0.005)
+            first_response_ms.append((time.perf_counter() - started) * 1000)
+            import_ms.append(float(process.stdout.readline()))
+        finally:
+            process.terminate()
+            process.wait()
+    return {
+        "import_ms": round(statistics.median(import_ms), 1),
+        "first_response_ms": round(statistics.median(first_response_ms), 1),
+    }
+
+def percentile(sorted_values, p):
+    """최근접 순위 백분위수"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+class Scenario:
+    """엔드포인트 하나에 대한 요청 생성 규칙
+
+    body가 bytes이면 NDJSON 본문으로 그대로 보내고, 그 외에는 JSON으로 보냅니다.
+    max_requests가 있으면 --requests보다 적게 호출합니다 (내보내기처럼 무거운 요청).
+    prepare(port)가 있으면 시나리오 전에 호출하며, False를 반환하면 시나리오를 건너뜁니다.
+    """
+
+    def __init__(self, name, method, path, body=None, expect=(200,), on_response=None, max_requests=None,
+                 prepare=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.expect = expect
+        self.on_response = on_response
+        self.max_requests = max_requests
+        self.prepare = prepare
+
+def http_request(port, method, path, body=None):
+    """요청을 보내고 (상태 코드, 응답 본문, 첫 바이트까지 시간, 전체 시간) 반환"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    headers = {}
+    payload = None
+    if isinstance(body, bytes):
+        payload = body
+        headers['Content-Type'] = 'application/x-ndjson'
+    elif body is not None:
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+    started = time.perf_counter()
+    try:
+        conn.request(method, path, body=payload, headers=headers)
+        response = conn.getresponse()
+        first_byte = time.perf_counter() - started
+        data = response.read()
+        return response.status, data, first_byte, time.perf_counter() - started
+    finally:
+        conn.close()
+
+def run_scenario(port, scenario, clients, requests):
+    """scenario를 clients개의 동시 클라이언트로 requests번 호출하고 통계 반환"""
+    latencies = []
+    first_bytes = []
+    errors = []
+    lock = threading.Lock()
+    if scenario.max_requests:
+        requests = min(requests, scenario.max_requests)
+
+    def call(i):
+        try:
+            path = scenario.path(i) if callable(scenario.path) else scenario.path
+            body = scenario.body(i) if callable(scenario.body) else scenario.body
+            status, data, first_byte, elapsed = http_request(port, scenario.method, path, body)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        with lock:
+            latencies.append(elapsed)
+            first_bytes.append(first_byte)
+            if status not in scenario.expect:
+                errors.append(f"HTTP {status}")
+        if scenario.on_response and status in scenario.expect:
+            scenario.on_response(i, data)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(call, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    first_bytes.sort()
+    ms = lambda seconds: round(seconds * 1000, 2)
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:3],
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+        "ttfb_p50_ms": ms(percentile(first_bytes, 50)),
+    }
+
+def import_payload(count=10):
+    """POST /api/import로 보내는 작은 내보내기 파일 (프로젝트 count개, NDJSON)"""
+    from database import Database
+    from data_transfer import encode_ndjson
+
+    records = [{"type": "meta", "format": Database.EXPORT_FORMAT, "version": Database.EXPORT_VERSION}]
+    records += [{
+        "type": "project",
+        "id": i + 1,
+        "student_name": f"가져온 학생{i}",
+        "title": f"가져온 프로젝트 {i}",
+        "prompt": "일차함수의 기울기를 조절하며 그래프 변화를 관찰하는 콘텐츠",
+        "evaluation": {"overall_score": 3},
+        "status": "pending"
+    } for i in range(count)]
+    records.append({"type": "end", "projects": count, "versions": 0})
+    return b''.join(encode_ndjson(records))
+
+def build_scenarios(projects, rng):
+    """모든 엔드포인트 시나리오 (읽기 → 쓰기 순서)"""
+    project_id = lambda i: rng.randint(1, projects)
+    created = []
+    job_ids = []
+
+    def remember_project(i, data):
+        created.append(json.loads(data)['project']['id'])
+
+    def remember_job(i, data):
+        job_ids.append(json.loads(data)['job']['id'])
+
+    def seed_job(port):
+        # --only get_job처럼 generate_content가 작업을 남기지 않았으면 하나 등록
+        if not job_ids:
+            status, data, _, _ = http_request(port, 'POST', '/api/generate-content', prompt(0))
+            if status == 202:
+                remember_job(0, data)
+        return bool(job_ids)
+
+    def seed_project(port):
+        # --only update_project처럼 create_project가 프로젝트를 남기지 않았으면 하나 생성
+        if not created:
+            status, data, _, _ = http_request(port, 'POST', '/api/projects', new_project(0))
+            if status == 200:
+                remember_project(0, data)
+        return bool(created)
+
+    def version_path(i):
+        # 시드 데이터에서 k번째 버전은 3(k-1)+1번 프로젝트의 승인 버전
+        version_id = rng.randint(1, max(1, projects // 3))
+        return f"/api/projects/{3 * (version_id - 1) + 1}/versions/{version_id}"
+
+    student = lambda i: quote(f"학생{i % 120}")
+    prompt = lambda i: {"prompt": f"이차함수 그래프의 꼭짓점을 움직여 보는 활동 {i % 50}", "student_name": f"학생{i % 120}"}
+    new_project = lambda i: {
+        "student_name": f"학생{i % 120}",
+        "title": f"벤치마크 {i}",
+        "prompt": prompt(i)['prompt'],
+        "evaluation": {"overall_score": 4}
+    }
+    search_terms = ['이차함수', '꼭짓점', '그래프', '연관성']
+    # 일괄 처리 요청 하나에 담는 항목 수
+    batch_ids = lambda i: sorted(rng.sample(range(1, projects + 1), min(10, projects)))
+    imported = import_payload()
+
+    return [
+        Scenario('health', 'GET', '/api/health'),
+        Scenario('list_projects', 'GET', '/api/projects?limit=50'),
+        Scenario('list_projects_by_student', 'GET', lambda i: f"/api/projects?student_name={student(i)}"),
+        Scenario('list_projects_with_html', 'GET', '/api/projects?limit=20&include_html=1'),
+        Scenario('list_pending', 'GET', '/api/projects/pending?limit=50'),
+        Scenario('get_project', 'GET', lambda i: f"/api/projects/{project_id(i)}", expect=(200, 404)),
+        Scenario('list_versions', 'GET', lambda i: f"/api/projects/{project_id(i)}/versions"),
+        Scenario('get_version', 'GET', version_path, expect=(200, 404)),
+        Scenario('list_students', 'GET', '/api/students'),
+        Scenario('stats', 'GET', lambda i: f"/api/stats?days={i % 30 + 1}"),
+        Scenario('search_projects', 'GET',
+                 lambda i: f"/api/projects/search?q={quote(search_terms[i % len(search_terms)])}&limit=20"),
+        Scenario('cache_stats', 'GET', '/api/evaluate-prompt/cache-stats'),
+        Scenario('draft_stats', 'GET', '/api/drafts/stats'),
+        Scenario('metrics', 'GET', '/api/metrics'),
+        Scenario('profiles', 'GET', '/api/profiles'),
+        Scenario('export', 'GET', '/api/export?gzip=1', max_requests=10),
+        Scenario('evaluate_prompt', 'POST', '/api/evaluate-prompt', prompt),
+        Scenario('evaluate_prompt_batch', 'POST', '/api/evaluate-prompt/batch',
+                 lambda i: {"prompts": [prompt(i * 10 + k) for k in range(10)]}),
+        Scenario('generate_content', 'POST', '/api/generate-content', prompt, expect=(202,), on_response=remember_job),
+        Scenario('get_job', 'GET', lambda i: f"/api/jobs/{job_ids[i % len(job_ids)]}", prepare=seed_job),
+        Scenario('generate_content_stream', 'POST', '/api/generate-content/stream', prompt),
+        Scenario('create_project', 'POST', '/api/projects', new_project, on_response=remember_project),
+        Scenario('update_project', 'PUT', lambda i: f"/api/projects/{created[i % len(created)]}",
+                 lambda i: {"title": f"수정된 제목 {i}"}, prepare=seed_project),
+        Scenario('reject_project', 'PUT', lambda i: f"/api/projects/{project_id(i)}/reject",
+                 {"rejection_reason": "다시 작성해주세요"}, expect=(200, 404)),
+        Scenario('approve_project', 'PUT', lambda i: f"/api/projects/{project_id(i)}/approve", {},
+                 expect=(202, 404)),
+        Scenario('approve_project_stream', 'POST', lambda i: f"/api/projects/{project_id(i)}/approve/stream", {}),
+        Scenario('batch_reject', 'PUT', '/api/projects/batch/reject',
+                 lambda i: {"project_ids": batch_ids(i), "rejection_reason": "다시 작성해주세요"}),
+        Scenario('batch_approve', 'PUT', '/api/projects/batch/approve',
+                 lambda i: {"project_ids": batch_ids(i)}, expect=(202,)),
+        Scenario('import', 'POST', '/api/import', imported, max_requests=50),
+        Scenario('delete_project', 'DELETE', lambda i: f"/api/projects/{created[i % len(created)]}",
+                 expect=(200, 404)),
+    ]
+
+class _Server:
+    def __init__(self, port, shutdown):
+        self.port = port
+        self.shutdown = shutdown
+
+def start_wsgi_server():
+    """Flask 앱을 임의 포트의 스레드 서버로 실행"""
+    from werkzeug.serving import make_server
+    import app as backend
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return _Server(server.server_port, server.shutdown)
+
+def start_asgi_server():
+    """asgi:app을 임의 포트의 uvicorn 서버로 실행"""
+    import uvicorn
+    import asgi
+
+    server = uvicorn.Server(uvicorn.Config(asgi.app, host='127.0.0.1', port=0, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    def shutdown():
+        server.should_exit = True
+    return _Server(port, shutdown)
+
+def compare(results, baseline, max_regression, min_delta_ms):
+    """기준 결과 대비 p95 증가 또는 처리량 감소가 허용치를 넘은 시나리오 목록"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        p95_limit = previous['p95_ms'] * (1 + max_regression)
+        if current['p95_ms'] > p95_limit and current['p95_ms'] - previous['p95_ms'] > min_delta_ms:
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - max_regression):
+            regressions.append(
+                f"{name}: 처리량 {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return regressions
+
+def compare_startup(startup, baseline, max_regression, min_delta_ms):
+    """기준 결과 대비 시작 시간 회귀 목록"""
+    if not startup or not baseline:
+        return []
+    regressions = []
+    for key, label in (('import_ms', "app 가져오기"), ('first_response_ms', "첫 응답까지")):
+        previous, current = baseline[key], startup[key]
+        if current > previous * (1 + max_regression) and current - previous > min_delta_ms:
+            regressions.append(f"시작 시간({label}): {previous}ms -> {current}ms")
+    return regressions
+
+def print_table(results):
+    columns = ('p50_ms', 'p95_ms', 'p99_ms', 'ttfb_p50_ms', 'throughput_rps', 'errors')
+    print(f"{'scenario':<28}" + ''.join(f"{c:>15}" for c in columns))
+    for name, stats in results.items():
+        print(f"{name:<28}" + ''.join(f"{stats[c]:>15}" for c in columns))
+
+def main(argv=None):
+    args = parse_args(argv)
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='aiedap-bench-'), 'bench.db')
+
+    # app을 가져오기 전에 가짜 모델과 벤치마크용 데이터베이스를 설정
+    os.environ['GEMINI_BACKEND'] = 'fake'
+    os.environ['DATABASE_PATH'] = db_path
+    os.environ['FAKE_MODEL_LATENCY_MS'] = str(args.model_latency_ms)
+    os.environ['FAKE_MODEL_ERROR_RATE'] = str(args.model_error_rate)
+    os.environ['FAKE_MODEL_HTML_KB'] = str(args.html_kb)
+    # 일괄 평가는 모델 호출 속도 제한(기본 분당 120회) 대신 서버 처리 시간을 측정 (환경 변수로 지정하면 그 값 사용)
+    os.environ.setdefault('BATCH_RATE_LIMIT_PER_MINUTE', '0')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    started = time.perf_counter()
+    seed_database(db_path, args.projects, args.html_kb, args.seed)
+    print(f"시드 데이터 {args.projects}개 생성: {time.perf_counter() - started:.1f}s ({db_path})")
+
+    server = start_asgi_server() if args.asgi else start_wsgi_server()
+
+    scenarios = build_scenarios(args.projects, random.Random(args.seed))
+    if args.only:
+        selected = set(args.only.split(','))
+        scenarios = [s for s in scenarios if s.name in selected]
+
+    results = {}
+    try:
+        for scenario in scenarios:
+            if scenario.prepare and not scenario.prepare(server.port):
+                print(f"{scenario.name}: 준비 요청이 실패해 건너뜁니다")
+                continue
+            results[scenario.name] = run_scenario(server.port, scenario, args.clients, args.requests)
+    finally:
+        server.shutdown()
+    print_table(results)
+
+    startup = None
+    if args.startup_runs > 0:
+        startup = measure_startup(db_path, args.startup_runs)
+        print(f"시작 시간: app 가져오기 {startup['import_ms']}ms, 첫 응답까지 {startup['first_response_ms']}ms")
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ('output', 'baseline', 'db')},
+        "scenarios": results,
+        "startup": startup
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['scenarios'], args.max_regression, args.min_delta_ms)
+        regressions += compare_startup(startup, baseline.get('startup'), args.max_regression, args.min_delta_ms)
+        if regressions:
+            print("성능 회귀 발견:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("기준 결과 대비 회귀 없음")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
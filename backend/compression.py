@@ -0,0 +1,72 @@
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from werkzeug.http import parse_accept_header
+from metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli가 없으면 gzip만 사용
+    brotli = None
+
+class ResponseCompressor:
+    """Accept-Encoding에 따른 응답 압축 (brotli 우선, gzip)
+
+    min_bytes 이상인 본문만 압축하며, 같은 본문은 내용 해시 기준으로 압축 결과를 메모리에
+    보관해 다시 압축하지 않습니다. 캐시 크기는 압축된 바이트 수로 제한합니다.
+    """
+
+    def __init__(self, min_bytes=None, gzip_level=None, brotli_quality=None, max_cache_bytes=None):
+        self.min_bytes = min_bytes if min_bytes is not None else int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+        self.gzip_level = gzip_level if gzip_level is not None else int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+        self.brotli_quality = brotli_quality if brotli_quality is not None else int(
+            os.getenv('COMPRESSION_BROTLI_QUALITY', 5))
+        self.max_cache_bytes = max_cache_bytes if max_cache_bytes is not None else int(
+            os.getenv('COMPRESSION_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+        self.encodings = ('br', 'gzip') if brotli else ('gzip',)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def eligible(self, body):
+        """압축 대상 크기인지 (대상이면 Vary: Accept-Encoding 필요)"""
+        return self.min_bytes > 0 and len(body) >= self.min_bytes
+
+    def negotiate(self, accept_encoding):
+        """Accept-Encoding 헤더 값에서 사용할 인코딩 선택 (없으면 None)"""
+        if not accept_encoding:
+            return None
+        return parse_accept_header(accept_encoding).best_match(self.encodings)
+
+    def compress(self, body, encoding):
+        """압축한 본문 반환 (캐시에 있으면 재사용)"""
+        key = (hashlib.sha256(body).digest(), encoding)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+        if data is not None:
+            self._count(encoding, 'hit')
+            return data
+
+        if encoding == 'br':
+            data = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            data = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        self._count(encoding, 'miss')
+
+        if len(data) <= self.max_cache_bytes:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = data
+                    self._bytes += len(data)
+                while self._bytes > self.max_cache_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return data
+
+    @staticmethod
+    def _count(encoding, result):
+        metrics.inc('aiedap_compression_total', {"encoding": encoding, "cache": result})
@@ -0,0 +1,147 @@
+"""AIEDAP 프로젝트/버전 NDJSON 내보내기/가져오기
+
+한 줄에 레코드 하나(meta, project, version, end)인 NDJSON 형식으로 데이터베이스 전체를
+내보내고 가져옵니다. 파일 크기와 관계없이 일정한 메모리로 처리하며, 파일 이름이
+.gz로 끝나거나 --gzip을 주면 gzip으로 압축합니다 (가져올 때는 자동으로 판별).
+
+사용법:
+    python data_transfer.py export -o aiedap-backup.ndjson.gz
+    python data_transfer.py import aiedap-backup.ndjson.gz              # 기존 데이터 뒤에 추가
+    python data_transfer.py import aiedap-backup.ndjson.gz --replace    # 기존 데이터를 바꿈
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+
+# 내보낼 때 이 크기만큼 모아서 한 번에 전달
+CHUNK_BYTES = 64 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+
+def encode_ndjson(records, compress=False, level=6):
+    """레코드를 NDJSON 바이트 조각으로 변환하는 제너레이터 (compress=True이면 gzip 스트림)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) if compress else None
+    buffer = []
+    size = 0
+    for record in records:
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            chunk = b''.join(buffer)
+            buffer.clear()
+            size = 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+def decode_ndjson(stream, block_size=CHUNK_BYTES):
+    """NDJSON(gzip 압축 여부 자동 판별) 스트림을 한 줄씩 해석하는 제너레이터"""
+    block = stream.read(block_size)
+    decompressor = zlib.decompressobj(31) if block[:2] == GZIP_MAGIC else None
+    pending = b''
+    number = 0
+    while block:
+        if decompressor:
+            data = decompressor.decompress(block)
+            # 여러 gzip 멤버를 이어 붙인 파일
+            while decompressor.eof and decompressor.unused_data:
+                rest = decompressor.unused_data
+                decompressor = zlib.decompressobj(31)
+                data += decompressor.decompress(rest)
+        else:
+            data = block
+        lines = (pending + data).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            number += 1
+            record = _parse_line(line, number)
+            if record is not None:
+                yield record
+        block = stream.read(block_size)
+    if decompressor and not decompressor.eof:
+        raise ValueError("gzip 스트림이 중간에 잘렸습니다")
+    record = _parse_line(pending, number + 1)
+    if record is not None:
+        yield record
+
+def _parse_line(line, number):
+    if not line.strip():
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        raise ValueError(f"{number}번째 줄을 JSON으로 해석할 수 없습니다")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AIEDAP 데이터 내보내기/가져오기")
+    parser.add_argument('--db', default=os.getenv('DATABASE_PATH', 'aiedap.db'), help="데이터베이스 경로")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="NDJSON으로 내보내기")
+    export.add_argument('-o', '--output', help="출력 파일 (기본: 표준 출력)")
+    export.add_argument('--gzip', action='store_true', help="gzip으로 압축 (.gz 파일이면 자동)")
+
+    load = commands.add_parser('import', help="NDJSON 가져오기")
+    load.add_argument('input', help="입력 파일 ('-'이면 표준 입력)")
+    load.add_argument('--replace', action='store_true', help="기존 프로젝트/버전을 지우고 원래 id로 가져오기")
+    load.add_argument('--batch-size', type=int, default=1000, help="executemany 한 번에 저장할 레코드 수")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # 앱(Gemini 서비스 등) 없이 데이터베이스만 사용
+    from database import Database
+    db = Database(args.db)
+    started = time.perf_counter()
+
+    try:
+        counts = run(db, args)
+    except ValueError as e:
+        print(f"오류: {e}", file=sys.stderr)
+        return 1
+    action = '내보내기' if args.command == 'export' else '가져오기'
+    print(f"{action} 완료: 프로젝트 {counts.get('projects', 0)}개, 버전 {counts.get('versions', 0)}개 "
+          f"({time.perf_counter() - started:.2f}초)", file=sys.stderr)
+    return 0
+
+def run(db, args):
+    """명령 실행 후 처리한 레코드 수 반환"""
+    if args.command == 'export':
+        compress = args.gzip or bool(args.output and args.output.endswith('.gz'))
+        output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        counts = {}
+        try:
+            for chunk in encode_ndjson(_remember_end(db.export_records(), counts), compress):
+                output.write(chunk)
+        finally:
+            if args.output:
+                output.close()
+        return counts
+
+    source = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    try:
+        return db.import_records(
+            decode_ndjson(source), mode='replace' if args.replace else 'append', batch_size=args.batch_size
+        )
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+
+def _remember_end(records, counts):
+    """end 레코드의 개수를 counts에 기록하며 그대로 전달"""
+    for record in records:
+        if record.get('type') == 'end':
+            counts.update(projects=record['projects'], versions=record['versions'])
+        yield record
+
+if __name__ == '__main__':
+    sys.exit(main())
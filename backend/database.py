@@ -1,131 +1,714 @@
+import os
+import base64
+import difflib
+import hashlib
 import sqlite3
 import json
+import threading
+import uuid
+import zlib
 from datetime import datetime
 from contextlib import contextmanager
+from metrics import instrument_methods
+from profiler import profiler
 
+@instrument_methods(
+    'aiedap_db',
+    exclude=('get_connection', 'transaction', 'close', 'init_db', 'export_records', 'explain_query_plan'),
+    observer=profiler.observe_query if profiler.enabled else None
+)
 class Database:
+    # API로 반환하는 프로젝트 컬럼 (html_hash, 사용하지 않는 html_content 컬럼 등 내부 컬럼 제외)
+    PROJECT_COLUMNS = (
+        'id, student_name, title, prompt, evaluation, overall_score, status, rejection_reason, '
+        'created_at, updated_at'
+    )
+    # 목록 조회 시 html_content를 제외한 요약 컬럼
+    SUMMARY_COLUMNS = PROJECT_COLUMNS + ', html_hash IS NOT NULL AS has_html'
+    # html_blobs에서 압축된 HTML을 함께 읽어오는 컬럼 (프로젝트/버전 공통)
+    HTML_DATA_COLUMN = '(SELECT data FROM html_blobs WHERE hash = html_hash) AS html_data'
+    # 단건 조회/생성/수정 시 반환하는 컬럼 (HTML이 있으면 html_content 포함)
+    PROJECT_DETAIL_COLUMNS = f'{PROJECT_COLUMNS}, {HTML_DATA_COLUMN}'
+    # API로 반환하는 작업 컬럼 (임대 시각, 중복 제거 키 제외)
+    JOB_COLUMNS = 'id, kind, payload, status, result, error, attempts, created_at, updated_at'
+    HTML_COMPRESSION_LEVEL = 6
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+    # 버전 목록에서 반환하는 메타데이터 컬럼 (프롬프트/HTML 제외)
+    VERSION_COLUMNS = (
+        "id, project_id, status, created_at, html_size, length(prompt) AS prompt_size, "
+        "CASE WHEN json_valid(evaluation) THEN json_extract(evaluation, '$.overall_score') END AS overall_score, "
+        "CASE WHEN html_delta IS NOT NULL THEN 'delta' WHEN html_hash IS NOT NULL THEN 'snapshot' END AS storage, "
+        "COALESCE(length(html_delta), (SELECT length(data) FROM html_blobs WHERE hash = html_hash)) AS stored_size"
+    )
+    # 전체 HTML을 저장하는 주기 (그 사이 버전은 직전 버전과의 차이만 저장)
+    VERSION_SNAPSHOT_INTERVAL = int(os.getenv('VERSION_SNAPSHOT_INTERVAL', 10))
+    # 프로젝트별 보관 버전 수 (0이면 무제한)
+    VERSION_RETENTION = int(os.getenv('VERSION_RETENTION', 50))
+    # 검색 관련도 가중치 (제목, 프롬프트, 피드백 순)
+    SEARCH_WEIGHTS = (10.0, 5.0, 1.0)
+    SNIPPET_TOKENS = 16
+    # 대시보드 통계 차원: project_stats.dimension -> 프로젝트 행({0}은 NEW/OLD)에서 구한 키
+    STATS_DIMENSIONS = {
+        'status': '{0}.status',
+        'student': '{0}.student_name',
+        'score': 'CAST({0}.overall_score AS INTEGER)',
+        'day': 'date({0}.created_at)',
+    }
+    DEFAULT_STATS_DAYS = 30
+    MAX_STATS_DAYS = 365
+    # 내보내기(NDJSON) 레코드 형식
+    EXPORT_FORMAT = 'aiedap-ndjson'
+    EXPORT_VERSION = 1
+
+    # 연결 생성 시 한 번만 적용되는 PRAGMA 설정
+    BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 64 * 1024 * 1024))
+    CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 16 * 1024))
+
     def __init__(self, db_path='aiedap.db'):
         self.db_path = db_path
+        # 스레드(또는 gunicorn 워커)마다 하나의 연결을 재사용
+        self._local = threading.local()
         self.init_db()
 
+    def _connect(self):
+        """새 연결을 열고 PRAGMA 설정 적용"""
+        conn = sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA busy_timeout = {self.BUSY_TIMEOUT_MS}')
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA mmap_size = {self.MMAP_SIZE}')
+        conn.execute(f'PRAGMA cache_size = -{self.CACHE_SIZE_KB}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        if profiler.enabled:
+            # 느린 쿼리의 SQL을 확인할 수 있도록 실행한 문장(매개변수 포함) 수집
+            conn.set_trace_callback(profiler.record_statement)
+        return conn
+
+    def _pooled_connection(self):
+        """현재 스레드의 연결 반환 (fork 이후에는 새로 연결)"""
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is None or local.pid != os.getpid():
+            conn = self._connect()
+            local.conn = conn
+            local.pid = os.getpid()
+            local.depth = 0
+        return conn
+
     @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """스레드별 풀 연결 사용 (중첩 시 가장 바깥 블록에서만 커밋)"""
+        conn = self._pooled_connection()
+        local = self._local
+        local.depth += 1
         try:
             yield conn
-            conn.commit()
+            if local.depth == 1:
+                conn.commit()
         except Exception:
-            conn.rollback()
+            if local.depth == 1:
+                conn.rollback()
             raise
         finally:
+            local.depth -= 1
+
+    @contextmanager
+    def transaction(self):
+        """쓰기 트랜잭션 (BEGIN IMMEDIATE로 시작, 중첩 시 바깥 트랜잭션에 합류)"""
+        with self.get_connection() as conn:
+            if self._local.depth == 1 and not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            yield conn
+
+    def close(self):
+        """현재 스레드의 연결 닫기"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
             conn.close()
+            self._local.conn = None
+
+    # 스키마 마이그레이션 (PRAGMA user_version = 적용한 개수). 순서를 바꾸지 말고 뒤에만 추가
+    MIGRATIONS = (
+        '_migration_base_schema',
+        '_migration_html_blobs',
+        '_migration_jobs',
+        '_migration_idempotency_keys',
+        '_migration_evaluation_cache',
+        '_migration_change_counter',
+        '_migration_search_index',
+        '_migration_version_deltas',
+        '_migration_list_indexes',
+        '_migration_html_drafts',
+        '_migration_dashboard_stats',
+    )
 
     def init_db(self):
-        """데이터베이스 초기화 및 테이블 생성"""
+        """아직 적용하지 않은 스키마 마이그레이션 실행
+
+        최신 스키마이면 PRAGMA user_version 조회 한 번으로 끝납니다. 여러 워커가 동시에
+        시작해도 쓰기 잠금을 잡은 뒤 버전을 다시 확인하므로 한 번만 적용됩니다.
+        """
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # 프로젝트 테이블
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS projects (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    student_name TEXT NOT NULL,
-                    title TEXT NOT NULL,
-                    prompt TEXT NOT NULL,
-                    evaluation TEXT,
-                    html_content TEXT,
-                    status TEXT DEFAULT 'pending',
-                    rejection_reason TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < len(self.MIGRATIONS):
+            with self.transaction() as conn:
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                for number, name in enumerate(self.MIGRATIONS[version:], version + 1):
+                    getattr(self, name)(conn)
+                    conn.execute(f'PRAGMA user_version = {number}')
+
+        with self.get_connection() as conn:
+            self.fts_enabled = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'projects_fts'"
+            ).fetchone() is not None
+
+    # 아래 마이그레이션은 user_version이 없던 기존 데이터베이스에도 적용되므로 모두 재실행해도 안전해야 함
+
+    def _migration_base_schema(self, conn):
+        """프로젝트/버전 테이블"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS projects (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_name TEXT NOT NULL,
+                title TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                evaluation TEXT,
+                html_content TEXT,
+                status TEXT DEFAULT 'pending',
+                rejection_reason TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS versions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_id INTEGER NOT NULL,
+                prompt TEXT NOT NULL,
+                html_content TEXT,
+                evaluation TEXT,
+                status TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (project_id) REFERENCES projects(id)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_project_id ON versions(project_id)')
+
+    def _migration_html_blobs(self, conn):
+        """생성된 HTML 저장소 (내용 해시 기준, zlib 압축)로 기존 HTML 이전"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS html_blobs (
+                hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        for table in ('projects', 'versions'):
+            self._ensure_column(conn, table, 'html_hash', 'TEXT')
+        self._migrate_inline_html(conn)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_projects_html_hash ON projects(html_hash)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_versions_html_hash ON versions(html_hash)')
+
+    def _migration_jobs(self, conn):
+        """백그라운드 작업 테이블 (생성/승인 작업 상태 저장)"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_expires_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._ensure_column(conn, 'jobs', 'dedupe_key', 'TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_dedupe_key ON jobs(dedupe_key)')
+
+    def _migration_idempotency_keys(self, conn):
+        """Idempotency-Key 헤더로 재시도된 요청의 응답 저장"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                status_code INTEGER,
+                response TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (scope, key)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_created ON idempotency_keys(created_at)')
+
+    def _migration_evaluation_cache(self, conn):
+        """프롬프트 평가 캐시 (정규화된 프롬프트, 모델, 템플릿 버전의 해시 기준)"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS evaluation_cache (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                model TEXT,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_evaluation_cache_last_used ON evaluation_cache(last_used_at)')
+
+    def _migration_change_counter(self, conn):
+        """변경 카운터: 프로젝트/버전이 바뀔 때마다 증가 (읽기 응답의 ETag와 캐시 무효화에 사용)"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('change_counter', 0)")
+        for table in ('projects', 'versions'):
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_change
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE meta SET value = value + 1 WHERE key = 'change_counter';
+                    END
+                ''')
+
+    def _migration_search_index(self, conn):
+        """전문 검색 인덱스 (trigram 토크나이저로 한국어도 부분 일치 검색)"""
+        self._init_search_index(conn)
+
+    def _migration_version_deltas(self, conn):
+        """버전 HTML 차분 저장 (base_version_id 버전에 html_delta를 적용해 복원)"""
+        self._ensure_column(conn, 'versions', 'html_delta', 'BLOB')
+        self._ensure_column(conn, 'versions', 'base_version_id', 'INTEGER')
+        self._ensure_column(conn, 'versions', 'delta_depth', 'INTEGER NOT NULL DEFAULT 0')
+        self._ensure_column(conn, 'versions', 'html_size', 'INTEGER')
+        conn.execute('''
+            UPDATE versions SET html_size = (SELECT size FROM html_blobs WHERE hash = versions.html_hash)
+            WHERE html_size IS NULL AND html_hash IS NOT NULL
+        ''')
+
+    def _migration_list_indexes(self, conn):
+        """목록 정렬 (created_at, id)을 인덱스로 처리"""
+        conn.execute('DROP INDEX IF EXISTS idx_student_name')
+        conn.execute('DROP INDEX IF EXISTS idx_status')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_projects_created ON projects(created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_projects_status_created ON projects(status, created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_projects_student_created ON projects(student_name, created_at)')
+
+    def _migration_html_drafts(self, conn):
+        """승인 전에 미리 생성한 HTML 초안 (프롬프트 해시당 진행 중/사용 가능한 초안은 하나)"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS html_drafts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                prompt_hash TEXT NOT NULL,
+                project_id INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                html_hash TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_html_drafts_live ON html_drafts(prompt_hash)
+            WHERE status IN ('queued', 'ready')
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_html_drafts_project ON html_drafts(project_id, status)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_html_drafts_created ON html_drafts(created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_html_drafts_html_hash ON html_drafts(html_hash)')
+
+    def _migration_dashboard_stats(self, conn):
+        """평가 점수 생성 컬럼과 트리거로 유지하는 대시보드 통계 테이블"""
+        columns = [row['name'] for row in conn.execute('PRAGMA table_xinfo(projects)')]
+        if 'overall_score' not in columns:
+            # VIRTUAL 생성 컬럼은 저장 공간 없이 인덱스로만 값을 보관
+            conn.execute('''
+                ALTER TABLE projects ADD COLUMN overall_score REAL GENERATED ALWAYS AS (
+                    CASE WHEN json_valid(evaluation) THEN json_extract(evaluation, '$.overall_score') END
+                ) VIRTUAL
             ''')
-            
-            # 버전 히스토리 테이블
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS versions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    project_id INTEGER NOT NULL,
-                    prompt TEXT NOT NULL,
-                    html_content TEXT,
-                    evaluation TEXT,
-                    status TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (project_id) REFERENCES projects(id)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_projects_overall_score ON projects(overall_score)')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_projects_student_score ON projects(student_name, overall_score)
+        ''')
+
+        # 차원(status/student/score/day)과 키별 프로젝트 수, 점수가 있는 프로젝트 수, 점수 합계
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS project_stats (
+                dimension TEXT NOT NULL,
+                key NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                scored INTEGER NOT NULL DEFAULT 0,
+                score_sum REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (dimension, key)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('DELETE FROM project_stats')
+        conn.execute('''
+            INSERT INTO project_stats (dimension, key, count, scored, score_sum)
+            SELECT dimension, key, COUNT(*), COUNT(overall_score), COALESCE(SUM(overall_score), 0)
+            FROM ({}) WHERE key IS NOT NULL
+            GROUP BY dimension, key
+        '''.format(' UNION ALL '.join(
+            f"SELECT '{dimension}' AS dimension, {key.format('projects')} AS key, overall_score FROM projects"
+            for dimension, key in self.STATS_DIMENSIONS.items()
+        )))
+
+        changed = ' OR '.join(
+            f'OLD.{column} IS NOT NEW.{column}' for column in ('status', 'student_name', 'evaluation', 'created_at')
+        )
+        triggers = {
+            'insert': ('AFTER INSERT ON projects', self._stats_statements('NEW', 1)),
+            'delete': ('AFTER DELETE ON projects', self._stats_statements('OLD', -1)),
+            'update': (
+                f'AFTER UPDATE OF status, student_name, evaluation, created_at ON projects WHEN {changed}',
+                self._stats_statements('OLD', -1) + self._stats_statements('NEW', 1)
+            ),
+        }
+        for event, (timing, statements) in triggers.items():
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_projects_stats_{event}
+                {timing}
+                BEGIN
+                    {' '.join(statements)}
+                END
+            ''')
+
+    def _stats_statements(self, row, sign):
+        """프로젝트 행(NEW/OLD) 하나를 project_stats에 더하거나(sign=1) 빼는(sign=-1) 트리거 문장"""
+        statements = []
+        for dimension, key in self.STATS_DIMENSIONS.items():
+            key = key.format(row)
+            statements.append(f'''
+                INSERT INTO project_stats (dimension, key, count, scored, score_sum)
+                SELECT '{dimension}', {key}, {sign}, {sign} * ({row}.overall_score IS NOT NULL),
+                       {sign} * COALESCE({row}.overall_score, 0)
+                WHERE {key} IS NOT NULL
+                ON CONFLICT (dimension, key) DO UPDATE SET
+                    count = count + excluded.count,
+                    scored = scored + excluded.scored,
+                    score_sum = score_sum + excluded.score_sum;
+            ''')
+            if sign < 0:
+                statements.append(
+                    f"DELETE FROM project_stats WHERE dimension = '{dimension}' AND key = {key} AND count <= 0;"
                 )
+        return statements
+
+    def _init_search_index(self, conn):
+        """projects_fts 테이블과 동기화 트리거 생성 (FTS5를 사용할 수 없으면 False)"""
+        feedback = "CASE WHEN json_valid({0}.evaluation) THEN json_extract({0}.evaluation, '$.feedback') END"
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'projects_fts'"
+        ).fetchone()
+        try:
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts
+                USING fts5(title, prompt, feedback, tokenize = 'trigram')
             ''')
-            
-            # 인덱스 생성
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_student_name ON projects(student_name)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_status ON projects(status)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_project_id ON versions(project_id)')
+        except sqlite3.OperationalError:
+            return False
+
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_projects_fts_insert AFTER INSERT ON projects
+            BEGIN
+                INSERT INTO projects_fts (rowid, title, prompt, feedback)
+                VALUES (new.id, new.title, new.prompt, {feedback.format('new')});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_projects_fts_update
+            AFTER UPDATE OF title, prompt, evaluation ON projects
+            BEGIN
+                DELETE FROM projects_fts WHERE rowid = old.id;
+                INSERT INTO projects_fts (rowid, title, prompt, feedback)
+                VALUES (new.id, new.title, new.prompt, {feedback.format('new')});
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_projects_fts_delete AFTER DELETE ON projects
+            BEGIN
+                DELETE FROM projects_fts WHERE rowid = old.id;
+            END
+        ''')
+        if not exists:
+            # 기존 프로젝트 색인
+            conn.execute(f'''
+                INSERT INTO projects_fts (rowid, title, prompt, feedback)
+                SELECT id, title, prompt, {feedback.format('projects')} FROM projects
+            ''')
+        return True
+
+    def _ensure_column(self, conn, table, column, declaration):
+        """기존 데이터베이스에 없는 컬럼 추가"""
+        columns = [row['name'] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+
+    def _migrate_inline_html(self, conn):
+        """기존 행의 html_content를 html_blobs로 이전"""
+        for table in ('projects', 'versions'):
+            rows = conn.execute(
+                f'SELECT id, html_content FROM {table} WHERE html_content IS NOT NULL'
+            ).fetchall()
+            for row in rows:
+                conn.execute(
+                    f'UPDATE {table} SET html_hash = ?, html_content = NULL WHERE id = ?',
+                    (self._store_html(conn, row['html_content']), row['id'])
+                )
+
+    def _store_html(self, conn, html_content):
+        """HTML을 압축해 html_blobs에 저장하고 해시 반환 (동일한 내용은 한 번만 저장)"""
+        if html_content is None:
+            return None
+        raw = html_content.encode('utf-8')
+        html_hash = hashlib.sha256(raw).hexdigest()
+        exists = conn.execute('SELECT 1 FROM html_blobs WHERE hash = ?', (html_hash,)).fetchone()
+        if not exists:
+            conn.execute(
+                'INSERT INTO html_blobs (hash, data, size) VALUES (?, ?, ?)',
+                (html_hash, zlib.compress(raw, self.HTML_COMPRESSION_LEVEL), len(raw))
+            )
+        return html_hash
+
+    def _html_blob(self, html_content):
+        """html_blobs에 저장할 (해시, 압축 데이터, 크기)"""
+        raw = html_content.encode('utf-8')
+        return hashlib.sha256(raw).hexdigest(), zlib.compress(raw, self.HTML_COMPRESSION_LEVEL), len(raw)
+
+    def _release_html(self, conn, hashes):
+        """더 이상 참조되지 않는 HTML 삭제"""
+        for html_hash in set(hashes) - {None}:
+            conn.execute('''
+                DELETE FROM html_blobs
+                WHERE hash = ?
+                  AND NOT EXISTS (SELECT 1 FROM projects WHERE html_hash = ?)
+                  AND NOT EXISTS (SELECT 1 FROM versions WHERE html_hash = ?)
+                  AND NOT EXISTS (SELECT 1 FROM html_drafts WHERE html_hash = ?)
+            ''', (html_hash, html_hash, html_hash, html_hash))
 
     def create_project(self, student_name, title, prompt, evaluation=None):
         """프로젝트 생성"""
-        with self.get_connection() as conn:
+        with self.transaction() as conn:
             cursor = conn.cursor()
             evaluation_json = json.dumps(evaluation, ensure_ascii=False) if evaluation else None
             
-            cursor.execute('''
+            cursor.execute(f'''
                 INSERT INTO projects (student_name, title, prompt, evaluation, status)
                 VALUES (?, ?, ?, ?, ?)
+                RETURNING {self.PROJECT_DETAIL_COLUMNS}
             ''', (student_name, title, prompt, evaluation_json, 'pending'))
             
-            project_id = cursor.lastrowid
-            return self.get_project(project_id)
+            return self._row_to_dict(cursor.fetchone())
 
     def get_project(self, project_id):
         """프로젝트 조회"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM projects WHERE id = ?', (project_id,))
+            cursor.execute(
+                f'SELECT {self.PROJECT_DETAIL_COLUMNS} FROM projects WHERE id = ?', (project_id,)
+            )
             row = cursor.fetchone()
             return self._row_to_dict(row) if row else None
 
-    def get_pending_projects(self):
-        """승인 대기 중인 프로젝트 조회"""
+    def get_projects_by_ids(self, project_ids):
+        """여러 프로젝트를 쿼리 한 번으로 요약 조회 ({id: 프로젝트}, 없는 id는 제외)"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM projects 
-                WHERE status = 'pending' 
-                ORDER BY created_at DESC
-            ''')
-            rows = cursor.fetchall()
-            return [self._row_to_dict(row) for row in rows]
+            rows = conn.execute(f'''
+                SELECT {self.SUMMARY_COLUMNS} FROM projects
+                WHERE id IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(list(project_ids)),)).fetchall()
+            return {row['id']: self._row_to_dict(row) for row in rows}
 
-    def get_all_projects(self, student_name=None):
+    def list_projects(self, status=None, student_name=None, limit=None, cursor=None, include_html=False):
+        """프로젝트 목록을 (created_at, id) 기준 키셋 페이지네이션으로 조회
+
+        (projects, next_cursor)를 반환하며, 마지막 페이지이면 next_cursor는 None입니다.
+        """
+        limit = min(max(int(limit or self.DEFAULT_PAGE_SIZE), 1), self.MAX_PAGE_SIZE)
+        columns = self.PROJECT_DETAIL_COLUMNS if include_html else self.SUMMARY_COLUMNS
+
+        conditions = []
+        params = []
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        if student_name:
+            conditions.append('student_name = ?')
+            params.append(student_name)
+        if cursor:
+            conditions.append('(created_at, id) < (?, ?)')
+            params.extend(self._decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        with self.get_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {columns} FROM projects
+                {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', (*params, limit + 1)).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        return [self._row_to_dict(row) for row in rows], next_cursor
+
+    def get_pending_projects(self, limit=None, cursor=None, include_html=False):
+        """승인 대기 중인 프로젝트 조회"""
+        return self.list_projects('pending', None, limit, cursor, include_html)
+
+    def get_all_projects(self, student_name=None, limit=None, cursor=None, include_html=False):
         """모든 프로젝트 조회 (선택적으로 학생별 필터링)"""
+        return self.list_projects(None, student_name, limit, cursor, include_html)
+
+    def search_projects(self, query, status=None, student_name=None, limit=None, offset=0):
+        """제목/프롬프트/평가 피드백 전문 검색 (관련도순)
+
+        공백으로 구분한 모든 단어를 포함하는 프로젝트를 찾아 (projects, next_offset)을 반환합니다.
+        trigram 인덱스는 3글자 이상의 단어만 찾을 수 있으므로 더 짧은 단어는 인덱스로 찾은
+        행에 LIKE 조건으로 적용하고, 모든 단어가 짧거나 FTS5를 사용할 수 없으면
+        LIKE 검색(최신순)으로 대체합니다.
+        """
+        terms = (query or '').split()
+        if not terms:
+            return [], None
+        limit = min(max(int(limit or self.DEFAULT_PAGE_SIZE), 1), self.MAX_PAGE_SIZE)
+        offset = max(int(offset or 0), 0)
+
+        conditions = []
+        params = []
+        if status:
+            conditions.append('p.status = ?')
+            params.append(status)
+        if student_name:
+            conditions.append('p.student_name = ?')
+            params.append(student_name)
+        columns = ', '.join(f'p.{column.strip()}' for column in self.SUMMARY_COLUMNS.split(','))
+
+        like = "LIKE ? ESCAPE '\\'"
+        long_terms = [term for term in terms if len(term) >= 3] if self.fts_enabled else []
+        short_terms = [term for term in terms if term not in long_terms]
+
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            if student_name:
-                cursor.execute('''
-                    SELECT * FROM projects 
-                    WHERE student_name = ? 
-                    ORDER BY created_at DESC
-                ''', (student_name,))
+            if long_terms:
+                match = ' '.join('"' + term.replace('"', '""') + '"' for term in long_terms)
+                # 필터가 있을 때만 projects와 조인
+                source = 'projects_fts JOIN projects p ON p.id = projects_fts.rowid' if conditions else 'projects_fts'
+                # 3글자 미만 단어는 인덱스로 찾은 행에 대해서만 LIKE로 확인
+                for term in short_terms:
+                    conditions.append(
+                        f'(projects_fts.title {like} OR projects_fts.prompt {like} OR projects_fts.feedback {like})'
+                    )
+                    params.extend([self._like_pattern(term)] * 3)
+                where = ''.join(f' AND {condition}' for condition in conditions)
+                # 관련도순으로 현재 페이지의 id만 고른 뒤 해당 행에 대해서만 스니펫 생성
+                ids = [row['rowid'] for row in conn.execute(f'''
+                    SELECT projects_fts.rowid FROM {source}
+                    WHERE projects_fts MATCH ?{where}
+                    ORDER BY bm25(projects_fts, ?, ?, ?)
+                    LIMIT ? OFFSET ?
+                ''', (match, *params, *self.SEARCH_WEIGHTS, limit + 1, offset))]
+                page = ids[:limit]
+                rows = conn.execute(f'''
+                    SELECT {columns},
+                           snippet(projects_fts, -1, '<mark>', '</mark>', '…', ?) AS snippet
+                    FROM projects_fts
+                    JOIN projects p ON p.id = projects_fts.rowid
+                    WHERE projects_fts MATCH ? AND projects_fts.rowid IN ({','.join('?' * len(page))})
+                ''', (self.SNIPPET_TOKENS, match, *page)).fetchall() if page else []
+                order = {project_id: i for i, project_id in enumerate(page)}
+                rows.sort(key=lambda row: order[row['id']])
+                projects = [self._row_to_dict(row) for row in rows]
+                has_more = len(ids) > limit
             else:
-                cursor.execute('''
-                    SELECT * FROM projects 
-                    ORDER BY created_at DESC
-                ''')
-            rows = cursor.fetchall()
-            return [self._row_to_dict(row) for row in rows]
+                for term in short_terms:
+                    conditions.append(
+                        f"(p.title {like} OR p.prompt {like} OR "
+                        f"json_extract(p.evaluation, '$.feedback') {like})"
+                    )
+                    params.extend([self._like_pattern(term)] * 3)
+                rows = conn.execute(f'''
+                    SELECT {columns} FROM projects p
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY p.created_at DESC, p.id DESC
+                    LIMIT ? OFFSET ?
+                ''', (*params, limit + 1, offset)).fetchall()
+                has_more = len(rows) > limit
+                projects = [self._row_to_dict(row) for row in rows[:limit]]
+                for project in projects:
+                    project['snippet'] = self._like_snippet(project, terms)
+
+        return projects, offset + limit if has_more else None
+
+    @staticmethod
+    def _like_pattern(term):
+        """LIKE 부분 일치 패턴 (%, _ 이스케이프)"""
+        return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+    def _like_snippet(self, project, terms):
+        """LIKE 검색 결과의 스니펫 (첫 일치 위치 주변)"""
+        feedback = (project.get('evaluation') or {}).get('feedback') or ''
+        for text in (project['title'], project['prompt'], feedback):
+            lowered = text.lower()
+            for term in terms:
+                index = lowered.find(term.lower())
+                if index < 0:
+                    continue
+                start = max(0, index - 30)
+                end = min(len(text), index + len(term) + 30)
+                return (
+                    ('…' if start else '') + text[start:index] + '<mark>' + text[index:index + len(term)]
+                    + '</mark>' + text[index + len(term):end] + ('…' if end < len(text) else '')
+                )
+        return None
+
+    @staticmethod
+    def _encode_cursor(created_at, project_id):
+        """페이지 커서 인코딩"""
+        raw = json.dumps([created_at, project_id]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        """페이지 커서 디코딩 (형식이 잘못되면 ValueError)"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            created_at, project_id = json.loads(raw)
+            return str(created_at), int(project_id)
+        except (ValueError, TypeError) as e:
+            raise ValueError("잘못된 페이지 커서입니다") from e
 
     def update_project(self, project_id, **updates):
-        """프로젝트 업데이트"""
-        with self.get_connection() as conn:
+        """프로젝트 업데이트 (존재하지 않으면 None 반환)"""
+        with self.transaction() as conn:
             cursor = conn.cursor()
             
             # 업데이트할 필드 구성
             set_clauses = []
             values = []
             
+            old_hash = None
             for key, value in updates.items():
                 if key == 'evaluation' and isinstance(value, dict):
                     set_clauses.append(f'{key} = ?')
                     values.append(json.dumps(value, ensure_ascii=False))
+                elif key == 'html_content':
+                    # HTML은 html_blobs에 저장하고 해시만 참조
+                    row = cursor.execute(
+                        'SELECT html_hash FROM projects WHERE id = ?', (project_id,)
+                    ).fetchone()
+                    old_hash = row['html_hash'] if row else None
+                    set_clauses.append('html_hash = ?')
+                    values.append(self._store_html(conn, value))
                 else:
                     set_clauses.append(f'{key} = ?')
                     values.append(value)
@@ -137,9 +720,12 @@ class Database:
                 UPDATE projects 
                 SET {', '.join(set_clauses)}
                 WHERE id = ?
+                RETURNING {self.PROJECT_DETAIL_COLUMNS}
             ''', values)
+            row = cursor.fetchone()
+            self._release_html(conn, [old_hash])
             
-            return self.get_project(project_id)
+            return self._row_to_dict(row)
 
     def approve_project(self, project_id, html_content=None):
         """프로젝트 승인"""
@@ -155,49 +741,453 @@ class Database:
             updates['rejection_reason'] = rejection_reason
         return self.update_project(project_id, **updates)
 
+    def reject_projects(self, project_ids, rejection_reason=None):
+        """여러 프로젝트를 UPDATE 한 번으로 거부 (거부된 프로젝트 id 목록 반환, 없는 id는 제외)"""
+        with self.transaction() as conn:
+            rows = conn.execute('''
+                UPDATE projects
+                SET status = 'rejected',
+                    rejection_reason = COALESCE(NULLIF(?, ''), rejection_reason),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id IN (SELECT value FROM json_each(?))
+                RETURNING id
+            ''', (rejection_reason, json.dumps(list(project_ids)))).fetchall()
+            return [row['id'] for row in rows]
+
     def create_version(self, project_id, prompt, html_content=None, evaluation=None, status=None):
-        """버전 히스토리 생성"""
-        with self.get_connection() as conn:
+        """버전 히스토리 생성 (HTML은 주기적인 전체 저장과 직전 버전과의 차분으로 저장)"""
+        with self.transaction() as conn:
             cursor = conn.cursor()
             evaluation_json = json.dumps(evaluation, ensure_ascii=False) if evaluation else None
-            
-            cursor.execute('''
-                INSERT INTO versions (project_id, prompt, html_content, evaluation, status)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (project_id, prompt, html_content, evaluation_json, status))
-            
-            version_id = cursor.lastrowid
-            return self.get_version(version_id)
+
+            html_hash = html_delta = base_version_id = None
+            delta_depth = 0
+            if html_content is not None:
+                previous = conn.execute('''
+                    SELECT id, delta_depth FROM versions
+                    WHERE project_id = ? AND html_size IS NOT NULL
+                    ORDER BY id DESC LIMIT 1
+                ''', (project_id,)).fetchone()
+                if previous and previous['delta_depth'] + 1 < self.VERSION_SNAPSHOT_INTERVAL:
+                    html_delta = self._version_delta(self._version_html(conn, previous['id']), html_content)
+                    if html_delta is not None:
+                        base_version_id = previous['id']
+                        delta_depth = previous['delta_depth'] + 1
+                if html_delta is None:
+                    html_hash = self._store_html(conn, html_content)
+
+            cursor.execute(f'''
+                INSERT INTO versions (project_id, prompt, html_hash, html_delta, base_version_id,
+                                      delta_depth, html_size, evaluation, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING {self.VERSION_COLUMNS}
+            ''', (project_id, prompt, html_hash, html_delta, base_version_id, delta_depth,
+                  len(html_content.encode('utf-8')) if html_content is not None else None,
+                  evaluation_json, status))
+            version = self._row_to_dict(cursor.fetchone())
+
+            if self.VERSION_RETENTION > 0:
+                self.compact_versions(project_id, self.VERSION_RETENTION)
+            return version
 
     def get_version(self, version_id):
-        """버전 조회"""
+        """버전 조회 (프롬프트, 평가, 복원한 HTML 포함)"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM versions WHERE id = ?', (version_id,))
-            row = cursor.fetchone()
-            return self._row_to_dict(row) if row else None
+            row = conn.execute(
+                f'SELECT {self.VERSION_COLUMNS}, prompt, evaluation FROM versions WHERE id = ?', (version_id,)
+            ).fetchone()
+            if not row:
+                return None
+            version = self._row_to_dict(row)
+            version['html_content'] = self._version_html(conn, version_id)
+            return version
 
     def get_versions_by_project(self, project_id):
-        """프로젝트의 버전 히스토리 조회"""
+        """프로젝트의 버전 히스토리 조회 (메타데이터만, 최신순)"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM versions 
-                WHERE project_id = ? 
-                ORDER BY created_at DESC
+            cursor.execute(f'''
+                SELECT {self.VERSION_COLUMNS} FROM versions
+                WHERE project_id = ?
+                ORDER BY id DESC
             ''', (project_id,))
             rows = cursor.fetchall()
             return [self._row_to_dict(row) for row in rows]
 
+    def compact_versions(self, project_id, keep):
+        """최신 keep개를 제외한 버전 삭제 (삭제되는 버전을 기준으로 하는 차분은 전체 저장으로 전환)
+
+        삭제한 버전 수를 반환합니다.
+        """
+        with self.transaction() as conn:
+            oldest = conn.execute('''
+                SELECT id FROM versions WHERE project_id = ?
+                ORDER BY id DESC LIMIT 1 OFFSET ?
+            ''', (project_id, keep - 1)).fetchone()
+            if not oldest:
+                return 0
+            orphans = conn.execute('''
+                SELECT id FROM versions
+                WHERE project_id = ? AND id >= ? AND base_version_id < ?
+            ''', (project_id, oldest['id'], oldest['id'])).fetchall()
+            for row in orphans:
+                conn.execute('''
+                    UPDATE versions SET html_hash = ?, html_delta = NULL, base_version_id = NULL, delta_depth = 0
+                    WHERE id = ?
+                ''', (self._store_html(conn, self._version_html(conn, row['id'])), row['id']))
+            hashes = [row['html_hash'] for row in conn.execute(
+                'DELETE FROM versions WHERE project_id = ? AND id < ? RETURNING html_hash',
+                (project_id, oldest['id'])
+            ).fetchall()]
+            self._release_html(conn, hashes)
+            return len(hashes)
+
+    def _version_html(self, conn, version_id):
+        """전체 저장된 버전부터 차분을 차례로 적용해 HTML 복원"""
+        chain = conn.execute(f'''
+            WITH RECURSIVE chain (id, base_version_id, html_delta, html_hash, depth) AS (
+                SELECT id, base_version_id, html_delta, html_hash, 0 FROM versions WHERE id = ?
+                UNION ALL
+                SELECT v.id, v.base_version_id, v.html_delta, v.html_hash, chain.depth + 1
+                FROM versions v JOIN chain ON v.id = chain.base_version_id
+                WHERE chain.html_delta IS NOT NULL
+            )
+            SELECT html_delta, {self.HTML_DATA_COLUMN} FROM chain ORDER BY depth DESC
+        ''', (version_id,)).fetchall()
+        if not chain or chain[0]['html_data'] is None:
+            return None
+        html_content = zlib.decompress(chain[0]['html_data']).decode('utf-8')
+        for row in chain[1:]:
+            html_content = self._apply_delta(html_content, row['html_delta'])
+        return html_content
+
+    def _version_delta(self, base, html_content):
+        """직전 버전 HTML과의 차분 (차분이 전체 압축본보다 크면 None: 전체 저장)"""
+        html_delta = self._encode_delta(base, html_content)
+        full_size = len(zlib.compress(html_content.encode('utf-8'), self.HTML_COMPRESSION_LEVEL))
+        return html_delta if len(html_delta) < full_size else None
+
+    @classmethod
+    def _encode_delta(cls, base, target):
+        """줄 단위 차분 (기준 줄 범위 [i1, i2] 복사 또는 문자열 삽입 목록, zlib 압축)"""
+        base_lines = base.splitlines(keepends=True)
+        target_lines = target.splitlines(keepends=True)
+        # 공통 앞/뒤 줄은 비교에서 제외 (수정은 보통 일부분이라 비교 비용이 크게 줄어듦)
+        limit = min(len(base_lines), len(target_lines))
+        prefix = 0
+        while prefix < limit and base_lines[prefix] == target_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and base_lines[-1 - suffix] == target_lines[-1 - suffix]:
+            suffix += 1
+
+        ops = [[0, prefix]] if prefix else []
+        matcher = difflib.SequenceMatcher(
+            None,
+            base_lines[prefix:len(base_lines) - suffix],
+            target_lines[prefix:len(target_lines) - suffix],
+            autojunk=False
+        )
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                ops.append([prefix + i1, prefix + i2])
+            elif j2 > j1:
+                ops.append(''.join(target_lines[prefix + j1:prefix + j2]))
+        if suffix:
+            ops.append([len(base_lines) - suffix, len(base_lines)])
+        raw = json.dumps(ops, ensure_ascii=False).encode('utf-8')
+        return zlib.compress(raw, cls.HTML_COMPRESSION_LEVEL)
+
+    @staticmethod
+    def _apply_delta(base, delta):
+        """_encode_delta로 만든 차분을 적용"""
+        base_lines = base.splitlines(keepends=True)
+        parts = []
+        for op in json.loads(zlib.decompress(delta)):
+            parts.append(op if isinstance(op, str) else ''.join(base_lines[op[0]:op[1]]))
+        return ''.join(parts)
+
     def delete_project(self, project_id):
-        """프로젝트 및 관련 버전 삭제"""
-        with self.get_connection() as conn:
+        """프로젝트 및 관련 버전 삭제 (삭제된 프로젝트가 없으면 False)"""
+        with self.transaction() as conn:
             cursor = conn.cursor()
+            hashes = [row['html_hash'] for row in cursor.execute('''
+                SELECT html_hash FROM projects WHERE id = ?
+                UNION SELECT html_hash FROM versions WHERE project_id = ?
+            ''', (project_id, project_id))]
+            hashes.extend(self._discard_drafts(conn, project_id))
             # 관련 버전 먼저 삭제
             cursor.execute('DELETE FROM versions WHERE project_id = ?', (project_id,))
             # 프로젝트 삭제
             cursor.execute('DELETE FROM projects WHERE id = ?', (project_id,))
-            return True
+            deleted = cursor.rowcount > 0
+            # 참조가 없어진 HTML 정리
+            self._release_html(conn, hashes)
+            return deleted
+
+    def export_records(self, batch_size=500):
+        """프로젝트와 버전을 내보내기 레코드(dict)로 하나씩 반환하는 제너레이터
+
+        meta 레코드, 프로젝트(id순), 버전(프로젝트/id순), 개수를 담은 end 레코드 순서입니다.
+        별도 연결의 읽기 트랜잭션 하나에서 batch_size 행씩 읽으므로 내보내는 동안의 쓰기와
+        무관한 스냅샷을 일정한 메모리로 내보냅니다. 버전 HTML은 차분을 적용해 복원합니다.
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN')
+            yield {
+                "type": "meta",
+                "format": self.EXPORT_FORMAT,
+                "version": self.EXPORT_VERSION,
+                "schema_version": conn.execute('PRAGMA user_version').fetchone()[0],
+                "exported_at": datetime.utcnow().isoformat(timespec='seconds') + 'Z'
+            }
+
+            projects = 0
+            for row in self._iter_rows(conn, f'''
+                SELECT id, student_name, title, prompt, evaluation, status, rejection_reason,
+                       created_at, updated_at, {self.HTML_DATA_COLUMN}
+                FROM projects ORDER BY id
+            ''', batch_size):
+                project = self._export_fields(row)
+                project['html_content'] = self._decompress(row['html_data'])
+                projects += 1
+                yield {"type": "project", **project}
+
+            versions = 0
+            # 차분의 기준은 같은 프로젝트의 직전 HTML 버전이므로 마지막 HTML만 유지
+            last_id = last_html = None
+            for row in self._iter_rows(conn, f'''
+                SELECT id, project_id, prompt, evaluation, status, created_at,
+                       html_delta, base_version_id, {self.HTML_DATA_COLUMN}
+                FROM versions ORDER BY project_id, id
+            ''', batch_size):
+                if row['html_delta'] is not None:
+                    base = last_html if row['base_version_id'] == last_id else self._version_html(
+                        conn, row['base_version_id'])
+                    html_content = self._apply_delta(base, row['html_delta'])
+                else:
+                    html_content = self._decompress(row['html_data'])
+                if html_content is not None:
+                    last_id, last_html = row['id'], html_content
+                version = self._export_fields(row)
+                version['html_content'] = html_content
+                versions += 1
+                yield {"type": "version", **version}
+
+            yield {"type": "end", "projects": projects, "versions": versions}
+        finally:
+            conn.rollback()
+            conn.close()
+
+    @staticmethod
+    def _iter_rows(conn, sql, batch_size):
+        cursor = conn.execute(sql)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    @staticmethod
+    def _export_fields(row):
+        """내보내기 레코드 필드 (압축/차분 저장 컬럼 제외, 평가는 JSON 객체로)"""
+        fields = {
+            key: row[key] for key in row.keys()
+            if key not in ('html_data', 'html_delta', 'base_version_id')
+        }
+        if fields.get('evaluation'):
+            try:
+                fields['evaluation'] = json.loads(fields['evaluation'])
+            except ValueError:
+                pass
+        return fields
+
+    @staticmethod
+    def _decompress(html_data):
+        return zlib.decompress(html_data).decode('utf-8') if html_data is not None else None
+
+    def import_records(self, records, mode='append', batch_size=1000):
+        """export_records 형식의 레코드를 하나의 트랜잭션으로 가져오기
+
+        mode='append'는 기존 데이터 뒤에 id를 옮겨 추가하고, mode='replace'는 기존 프로젝트와
+        버전을 지운 뒤 원래 id로 가져옵니다. batch_size 레코드마다 executemany로 저장하며,
+        end 레코드가 없거나 개수가 맞지 않으면(파일이 잘린 경우) 전체를 취소합니다.
+        가져온 {"projects": n, "versions": m}을 반환합니다.
+        """
+        if mode not in ('append', 'replace'):
+            raise ValueError(f"알 수 없는 가져오기 방식입니다: {mode}")
+        records = iter(records)
+        meta = next(records, None)
+        if not isinstance(meta, dict) or meta.get('type') != 'meta' or meta.get('format') != self.EXPORT_FORMAT:
+            raise ValueError("AIEDAP 내보내기 파일이 아닙니다")
+        if meta.get('version') != self.EXPORT_VERSION:
+            raise ValueError(f"지원하지 않는 내보내기 버전입니다: {meta.get('version')}")
+
+        with self.transaction() as conn:
+            if mode == 'replace':
+                project_offset = version_offset = 0
+                conn.execute('DELETE FROM versions')
+                conn.execute('DELETE FROM projects')
+                conn.execute("DELETE FROM html_drafts WHERE status IN ('queued', 'ready')")
+                conn.execute('''
+                    DELETE FROM html_blobs
+                    WHERE hash NOT IN (SELECT html_hash FROM html_drafts WHERE html_hash IS NOT NULL)
+                ''')
+            else:
+                # 삭제된 id도 다시 쓰지 않도록 AUTOINCREMENT 시퀀스 기준으로 옮김
+                project_offset, version_offset = (
+                    conn.execute('''
+                        SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),
+                                   COALESCE((SELECT MAX(id) FROM {0}), 0))
+                    '''.format(table), (table,)).fetchone()[0]
+                    for table in ('projects', 'versions')
+                )
+
+            blobs = {}
+            projects = []
+            versions = []
+            counts = {"projects": 0, "versions": 0}
+            # 같은 프로젝트의 직전 HTML 버전 (project_id, version_id, html, delta_depth)
+            previous = None
+
+            def flush():
+                conn.executemany(
+                    'INSERT OR IGNORE INTO html_blobs (hash, data, size) VALUES (?, ?, ?)', blobs.values()
+                )
+                conn.executemany('''
+                    INSERT INTO projects (id, student_name, title, prompt, evaluation, html_hash, status,
+                                          rejection_reason, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', projects)
+                conn.executemany('''
+                    INSERT INTO versions (id, project_id, prompt, evaluation, status, created_at,
+                                          html_hash, html_delta, base_version_id, delta_depth, html_size)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', versions)
+                blobs.clear()
+                projects.clear()
+                versions.clear()
+
+            end = None
+            for number, record in enumerate(records, 2):
+                kind = record.get('type') if isinstance(record, dict) else None
+                try:
+                    if kind == 'project':
+                        html_hash = None
+                        if record.get('html_content') is not None:
+                            blob = self._html_blob(record['html_content'])
+                            blobs[blob[0]] = blob
+                            html_hash = blob[0]
+                        projects.append((
+                            record['id'] + project_offset, record['student_name'], record['title'],
+                            record['prompt'], self._import_json(record.get('evaluation')), html_hash,
+                            record.get('status') or 'pending', record.get('rejection_reason'),
+                            record.get('created_at'), record.get('updated_at')
+                        ))
+                        counts['projects'] += 1
+                    elif kind == 'version':
+                        version_id = record['id'] + version_offset
+                        project_id = record['project_id'] + project_offset
+                        html_content = record.get('html_content')
+                        html_hash = html_delta = base_version_id = html_size = None
+                        delta_depth = 0
+                        if html_content is not None:
+                            if (previous and previous[0] == project_id
+                                    and previous[3] + 1 < self.VERSION_SNAPSHOT_INTERVAL):
+                                html_delta = self._version_delta(previous[2], html_content)
+                            if html_delta is not None:
+                                base_version_id, delta_depth = previous[1], previous[3] + 1
+                            else:
+                                blob = self._html_blob(html_content)
+                                blobs[blob[0]] = blob
+                                html_hash = blob[0]
+                            html_size = len(html_content.encode('utf-8'))
+                            previous = (project_id, version_id, html_content, delta_depth)
+                        versions.append((
+                            version_id, project_id, record['prompt'], self._import_json(record.get('evaluation')),
+                            record.get('status'), record.get('created_at'),
+                            html_hash, html_delta, base_version_id, delta_depth, html_size
+                        ))
+                        counts['versions'] += 1
+                    elif kind == 'end':
+                        end = record
+                        break
+                    else:
+                        raise ValueError(f"알 수 없는 레코드입니다: {kind}")
+                except (KeyError, TypeError) as e:
+                    raise ValueError(f"{number}번째 레코드 형식이 잘못되었습니다: {e!r}")
+                if len(projects) + len(versions) >= batch_size:
+                    flush()
+            flush()
+
+            if end is None:
+                raise ValueError("내보내기 파일이 중간에 잘렸습니다 (end 레코드 없음)")
+            if (end.get('projects'), end.get('versions')) != (counts['projects'], counts['versions']):
+                raise ValueError("내보내기 파일의 레코드 수가 맞지 않습니다")
+            return counts
+
+    @staticmethod
+    def _import_json(value):
+        """가져온 평가 값을 저장 형식(JSON 문자열)으로"""
+        if value is None or isinstance(value, str):
+            return value
+        return json.dumps(value, ensure_ascii=False)
+
+    def get_stats(self, days=None):
+        """대시보드 통계 (상태별 수, 학생별 평균 점수, 점수 분포, 최근 days일 일별 제출 수)
+
+        트리거로 유지하는 project_stats만 읽으므로 프로젝트 수와 관계없이 일정한 시간에 응답합니다.
+        """
+        days = min(max(int(days or self.DEFAULT_STATS_DAYS), 1), self.MAX_STATS_DAYS)
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT dimension, key, count, scored, score_sum FROM project_stats
+                WHERE dimension IN ('status', 'student', 'score')
+                ORDER BY dimension, key
+            ''').fetchall()
+            daily = conn.execute('''
+                SELECT key, count FROM project_stats
+                WHERE dimension = 'day' AND key >= date('now', ?)
+                ORDER BY key
+            ''', (f'-{days - 1} days',)).fetchall()
+
+        def average(score_sum, scored):
+            return round(score_sum / scored, 2) if scored else None
+
+        by_status = {row['key']: row['count'] for row in rows if row['dimension'] == 'status'}
+        status_rows = [row for row in rows if row['dimension'] == 'status']
+        scored = sum(row['scored'] for row in status_rows)
+        return {
+            "total": sum(by_status.values()),
+            "by_status": by_status,
+            "scored": scored,
+            "average_score": average(sum(row['score_sum'] for row in status_rows), scored),
+            "score_distribution": {
+                str(row['key']): row['count'] for row in rows if row['dimension'] == 'score'
+            },
+            "students": [
+                {
+                    "student_name": row['key'],
+                    "projects": row['count'],
+                    "scored": row['scored'],
+                    "average_score": average(row['score_sum'], row['scored'])
+                }
+                for row in rows if row['dimension'] == 'student'
+            ],
+            "daily_submissions": [{"date": row['key'], "count": row['count']} for row in daily],
+        }
+
+    def get_recent_prompts(self, student_name, limit=20):
+        """학생의 최근 프로젝트 프롬프트와 평가 (최신순)"""
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT id, prompt, evaluation FROM projects
+                WHERE student_name = ?
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', (student_name, limit)).fetchall()
+            return [self._row_to_dict(row) for row in rows]
 
     def get_all_students(self):
         """모든 학생 이름 조회 (중복 제거)"""
@@ -211,6 +1201,300 @@ class Database:
             rows = cursor.fetchall()
             return [row['student_name'] for row in rows]
 
+    def get_change_counter(self):
+        """프로젝트/버전 데이터의 변경 카운터 (쓰기마다 단조 증가)"""
+        with self.get_connection() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'change_counter'").fetchone()
+            return row['value'] if row else 0
+
+    def create_job(self, kind, payload, dedupe_key=None):
+        """작업 등록 (queued 상태)
+
+        dedupe_key가 같은 작업이 대기 중이거나 실행 중이면 새로 만들지 않고 그 작업을 반환합니다.
+        """
+        with self.transaction() as conn:
+            if dedupe_key:
+                row = conn.execute(f'''
+                    SELECT {self.JOB_COLUMNS} FROM jobs
+                    WHERE dedupe_key = ? AND status IN ('queued', 'running')
+                ''', (dedupe_key,)).fetchone()
+                if row:
+                    return self._row_to_dict(row)
+            row = conn.execute(f'''
+                INSERT INTO jobs (id, kind, payload, dedupe_key)
+                VALUES (?, ?, ?, ?)
+                RETURNING {self.JOB_COLUMNS}
+            ''', (uuid.uuid4().hex, kind, json.dumps(payload, ensure_ascii=False), dedupe_key)).fetchone()
+            return self._row_to_dict(row)
+
+    def get_job(self, job_id):
+        """작업 조회"""
+        with self.get_connection() as conn:
+            row = conn.execute(f'SELECT {self.JOB_COLUMNS} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            return self._row_to_dict(row) if row else None
+
+    def get_active_approve_jobs(self, project_ids):
+        """대기 중이거나 실행 중인 승인 작업(approve_project, batch_approve)이 있는 프로젝트
+
+        {프로젝트 id: 가장 먼저 등록된 작업 id}를 반환합니다.
+        """
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT project_id, id FROM (
+                    SELECT json_extract(payload, '$.project_id') AS project_id, id, rowid AS job_order
+                    FROM jobs
+                    WHERE kind = 'approve_project' AND status IN ('queued', 'running')
+                    UNION ALL
+                    SELECT ids.value, jobs.id, jobs.rowid
+                    FROM jobs, json_each(jobs.payload, '$.project_ids') AS ids
+                    WHERE jobs.kind = 'batch_approve' AND jobs.status IN ('queued', 'running')
+                )
+                WHERE project_id IN (SELECT value FROM json_each(?))
+                ORDER BY job_order DESC
+            ''', (json.dumps(list(project_ids)),)).fetchall()
+            # 나중에 등록된 작업부터 덮어써 가장 먼저 등록된 작업이 남도록 함
+            return {row['project_id']: row['id'] for row in rows}
+
+    def claim_next_job(self, lease_seconds):
+        """가장 오래된 대기 작업을 running으로 전환하고 반환 (없으면 None)"""
+        with self.transaction() as conn:
+            row = conn.execute(f'''
+                UPDATE jobs
+                SET status = 'running',
+                    attempts = attempts + 1,
+                    lease_expires_at = datetime('now', ?),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE status = 'queued'
+                    ORDER BY created_at, rowid
+                    LIMIT 1
+                )
+                RETURNING {self.JOB_COLUMNS}
+            ''', (f'+{int(lease_seconds)} seconds',)).fetchone()
+            return self._row_to_dict(row) if row else None
+
+    def renew_job_leases(self, job_ids, lease_seconds):
+        """실행 중인 작업의 임대 시간 연장"""
+        if not job_ids:
+            return
+        with self.transaction() as conn:
+            conn.executemany('''
+                UPDATE jobs SET lease_expires_at = datetime('now', ?)
+                WHERE id = ? AND status = 'running'
+            ''', [(f'+{int(lease_seconds)} seconds', job_id) for job_id in job_ids])
+
+    def finish_job(self, job_id, result=None, error=None):
+        """작업 완료 처리 (error가 있으면 failed)"""
+        with self.transaction() as conn:
+            row = conn.execute(f'''
+                UPDATE jobs
+                SET status = ?, result = ?, error = ?,
+                    lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                RETURNING {self.JOB_COLUMNS}
+            ''', (
+                'failed' if error else 'succeeded',
+                json.dumps(result, ensure_ascii=False) if result is not None else None,
+                error,
+                job_id
+            )).fetchone()
+            return self._row_to_dict(row) if row else None
+
+    def requeue_expired_jobs(self, max_attempts):
+        """임대가 만료된 running 작업(프로세스 중단 등)을 다시 대기열로 이동
+
+        시도 횟수가 max_attempts에 도달한 작업은 failed로 처리합니다.
+        """
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                UPDATE jobs
+                SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                    error = CASE WHEN attempts >= ? THEN '작업이 반복적으로 중단되었습니다' ELSE error END,
+                    lease_expires_at = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'running' AND lease_expires_at < datetime('now')
+            ''', (max_attempts, max_attempts))
+            return cursor.rowcount
+
+    def purge_finished_jobs(self, retention_hours):
+        """보관 기간이 지난 완료/실패 작업 삭제"""
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                DELETE FROM jobs
+                WHERE status IN ('succeeded', 'failed')
+                  AND updated_at < datetime('now', ?)
+            ''', (f'-{int(retention_hours)} hours',))
+            return cursor.rowcount
+
+    def reserve_draft(self, prompt_hash, project_id, job_key, max_active, daily_quota,
+                      ttl_hours=24, history_days=7):
+        """HTML 초안 생성 예약
+
+        예약했으면 'scheduled'를, 같은 프롬프트의 초안이 이미 있으면 'exists'를, 동시 생성 수나
+        최근 24시간 생성 수가 한도에 도달했으면 'busy'/'quota'를 반환합니다. 예약 전에 작업이
+        사라진 초안은 failed로, 기한이 지난 초안은 wasted로 정리합니다. job_key는 초안을
+        생성하는 작업의 dedupe_key 접두사입니다.
+        """
+        with self.transaction() as conn:
+            conn.execute('''
+                UPDATE html_drafts SET status = 'failed', updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'queued' AND NOT EXISTS (
+                    SELECT 1 FROM jobs
+                    WHERE dedupe_key = ? || html_drafts.prompt_hash AND status IN ('queued', 'running')
+                )
+            ''', (job_key,))
+            expired = f"status = 'ready' AND created_at < datetime('now', '-{int(ttl_hours)} hours')"
+            hashes = [row['html_hash'] for row in conn.execute(f'SELECT html_hash FROM html_drafts WHERE {expired}')]
+            if hashes:
+                conn.execute(f'''
+                    UPDATE html_drafts SET status = 'wasted', html_hash = NULL, updated_at = CURRENT_TIMESTAMP
+                    WHERE {expired}
+                ''')
+                self._release_html(conn, hashes)
+            conn.execute('''
+                DELETE FROM html_drafts
+                WHERE status NOT IN ('queued', 'ready') AND created_at < datetime('now', ?)
+            ''', (f'-{int(history_days)} days',))
+
+            row = conn.execute('''
+                SELECT
+                    EXISTS (SELECT 1 FROM html_drafts WHERE prompt_hash = ? AND status IN ('queued', 'ready')) AS live,
+                    (SELECT COUNT(*) FROM html_drafts WHERE status = 'queued') AS active,
+                    (SELECT COUNT(*) FROM html_drafts WHERE created_at >= datetime('now', '-1 day')) AS recent
+            ''', (prompt_hash,)).fetchone()
+            if row['live']:
+                return 'exists'
+            if row['active'] >= max_active:
+                return 'busy'
+            if row['recent'] >= daily_quota:
+                return 'quota'
+            conn.execute(
+                'INSERT INTO html_drafts (prompt_hash, project_id) VALUES (?, ?)', (prompt_hash, project_id)
+            )
+            return 'scheduled'
+
+    def complete_draft(self, prompt_hash, html_content):
+        """생성한 초안 저장 ('ready', 생성 중에 취소되었으면 'wasted', 예약이 없으면 None 반환)"""
+        with self.transaction() as conn:
+            row = conn.execute('''
+                SELECT id, status FROM html_drafts
+                WHERE prompt_hash = ? AND status IN ('queued', 'cancelled')
+                ORDER BY id DESC LIMIT 1
+            ''', (prompt_hash,)).fetchone()
+            if not row:
+                return None
+            if row['status'] == 'cancelled':
+                status, html_hash = 'wasted', None
+            else:
+                status, html_hash = 'ready', self._store_html(conn, html_content)
+            conn.execute('''
+                UPDATE html_drafts SET status = ?, html_hash = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (status, html_hash, row['id']))
+            return status
+
+    def finish_draft(self, prompt_hash, status):
+        """생성하지 않고 끝난 예약 정리 (status: 'failed' 또는 'cancelled')"""
+        with self.transaction() as conn:
+            conn.execute('''
+                UPDATE html_drafts SET status = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE prompt_hash = ? AND status = 'queued'
+            ''', (status, prompt_hash))
+
+    def get_draft_html(self, prompt_hash):
+        """사용 가능한 초안의 HTML (없으면 None)"""
+        with self.get_connection() as conn:
+            row = conn.execute(f'''
+                SELECT {self.HTML_DATA_COLUMN} FROM html_drafts
+                WHERE prompt_hash = ? AND status = 'ready'
+            ''', (prompt_hash,)).fetchone()
+            if not row or row['html_data'] is None:
+                return None
+            return zlib.decompress(row['html_data']).decode('utf-8')
+
+    def use_draft(self, prompt_hash):
+        """초안을 사용 처리 (HTML은 승인된 프로젝트가 같은 해시로 참조하므로 지우지 않음)"""
+        with self.transaction() as conn:
+            conn.execute('''
+                UPDATE html_drafts SET status = 'used', html_hash = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE prompt_hash = ? AND status = 'ready'
+            ''', (prompt_hash,))
+
+    def discard_drafts(self, project_id, keep_hash=None):
+        """프로젝트의 진행 중/사용 가능한 초안 폐기 (keep_hash 초안 제외, 폐기한 수 반환)"""
+        with self.transaction() as conn:
+            hashes = self._discard_drafts(conn, project_id, keep_hash)
+            self._release_html(conn, hashes)
+            return len(hashes)
+
+    def _discard_drafts(self, conn, project_id, keep_hash=None):
+        """생성된 초안은 wasted, 생성 중인 초안은 cancelled로 바꾸고 폐기한 초안의 HTML 해시 목록 반환"""
+        live = "project_id = ? AND status IN ('queued', 'ready') AND prompt_hash IS NOT ?"
+        hashes = [row['html_hash'] for row in conn.execute(
+            f'SELECT html_hash FROM html_drafts WHERE {live}', (project_id, keep_hash)
+        )]
+        if hashes:
+            conn.execute(f'''
+                UPDATE html_drafts
+                SET status = CASE status WHEN 'ready' THEN 'wasted' ELSE 'cancelled' END,
+                    html_hash = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE {live}
+            ''', (project_id, keep_hash))
+        return hashes
+
+    def get_draft_stats(self):
+        """상태별 초안 수 (보관 기간 내)"""
+        with self.get_connection() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) AS count FROM html_drafts GROUP BY status').fetchall()
+            return {row['status']: row['count'] for row in rows}
+
+    def reserve_idempotency_key(self, scope, key, ttl_hours=24):
+        """Idempotency-Key 선점
+
+        처음 보는 키이면 None을 반환하고 처리 중으로 기록합니다.
+        이미 있는 키이면 저장된 (status_code, response)를 반환하며, 아직 처리 중이면 status_code는 None입니다.
+        """
+        with self.transaction() as conn:
+            conn.execute(
+                "DELETE FROM idempotency_keys WHERE created_at < datetime('now', ?)",
+                (f'-{int(ttl_hours)} hours',)
+            )
+            row = conn.execute(
+                'SELECT status_code, response FROM idempotency_keys WHERE scope = ? AND key = ?',
+                (scope, key)
+            ).fetchone()
+            if row:
+                return row['status_code'], row['response']
+            conn.execute('INSERT INTO idempotency_keys (scope, key) VALUES (?, ?)', (scope, key))
+            return None
+
+    def complete_idempotency_key(self, scope, key, status_code, response):
+        """처리 결과 저장 (이후 같은 키의 요청에는 이 응답을 재사용)"""
+        with self.transaction() as conn:
+            conn.execute(
+                'UPDATE idempotency_keys SET status_code = ?, response = ? WHERE scope = ? AND key = ?',
+                (status_code, response, scope, key)
+            )
+
+    def release_idempotency_key(self, scope, key):
+        """처리 실패 시 선점 해제 (같은 키로 다시 시도 가능)"""
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM idempotency_keys WHERE scope = ? AND key = ?', (scope, key))
+
+    def explain_query_plan(self, sql):
+        """SQL의 EXPLAIN QUERY PLAN 결과를 들여쓴 줄 목록으로 반환 (느린 쿼리 기록용)"""
+        with self.get_connection() as conn:
+            rows = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+        depth = {0: 0}
+        plan = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, 0) + 1
+            plan.append('  ' * (depth[node_id] - 1) + detail)
+        return plan
+
+    @profiler.timed('decode')
     def _row_to_dict(self, row):
         """Row 객체를 딕셔너리로 변환"""
         if not row:
@@ -219,11 +1503,18 @@ class Database:
         result = dict(row)
 
         # JSON 필드 파싱
-        if result.get('evaluation'):
-            try:
-                result['evaluation'] = json.loads(result['evaluation'])
-            except:
-                pass
+        for field in ('evaluation', 'payload', 'result'):
+            if result.get(field):
+                try:
+                    result[field] = json.loads(result[field])
+                except:
+                    pass
+
+        # 압축된 HTML은 조회한 경우에만 해제
+        if 'html_data' in result:
+            html_data = result.pop('html_data')
+            if html_data is not None:
+                result['html_content'] = zlib.decompress(html_data).decode('utf-8')
 
         # 날짜 문자열 변환
         if result.get('created_at'):
@@ -231,5 +1522,8 @@ class Database:
         if result.get('updated_at'):
             result['updatedAt'] = result['updated_at']
 
+        if 'has_html' in result:
+            result['has_html'] = bool(result['has_html'])
+
         return result
 
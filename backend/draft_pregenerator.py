@@ -0,0 +1,146 @@
+import os
+import json
+import hashlib
+import logging
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class DraftPregenerator:
+    """평가 점수가 높은 대기 프로젝트의 HTML을 승인 전에 미리 생성
+
+    프로젝트가 생성되면 백그라운드 작업으로 HTML 초안을 만들어 프롬프트 해시 기준으로
+    저장하고, 승인할 때 프롬프트가 그대로이면 모델을 호출하지 않고 초안을 사용합니다.
+    동시에 생성하는 초안 수와 최근 24시간 생성 수를 제한하며, 사용되지 않은 초안
+    (프롬프트 변경, 거부, 삭제, 기한 만료)은 낭비로 집계합니다.
+    """
+
+    JOB_KIND = 'pregenerate'
+
+    def __init__(self, db, gemini_service, job_queue, enabled=None, min_score=None,
+                 max_concurrency=None, daily_quota=None, ttl_hours=None, history_days=None):
+        self.db = db
+        self.gemini_service = gemini_service
+        self.job_queue = job_queue
+        self.enabled = (os.getenv('PREGENERATE_ENABLED', '0') == '1') if enabled is None else enabled
+        self.min_score = min_score if min_score is not None else float(os.getenv('PREGENERATE_MIN_SCORE', 4))
+        self.max_concurrency = max_concurrency if max_concurrency is not None else int(
+            os.getenv('PREGENERATE_MAX_CONCURRENCY', 1))
+        self.daily_quota = daily_quota if daily_quota is not None else int(
+            os.getenv('PREGENERATE_DAILY_QUOTA', 100))
+        self.ttl_hours = ttl_hours if ttl_hours is not None else int(os.getenv('PREGENERATE_TTL_HOURS', 24))
+        self.history_days = history_days if history_days is not None else int(
+            os.getenv('PREGENERATE_HISTORY_DAYS', 7))
+
+    @staticmethod
+    def prompt_hash(prompt, student_name=''):
+        """초안 키 (생성에 쓰는 프롬프트와 학생 이름의 해시)"""
+        raw = json.dumps([prompt or '', student_name or ''], ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @property
+    def job_key(self):
+        """초안 생성 작업의 dedupe_key 접두사"""
+        return f'{self.JOB_KIND}:'
+
+    def schedule(self, project):
+        """새 프로젝트의 평가 점수가 기준 이상이고 예산이 남아 있으면 초안 생성 작업 등록
+
+        등록 결과('scheduled', 'exists', 'busy', 'quota')를 반환하며, 대상이 아니면 None을 반환합니다.
+        """
+        if not self.enabled or not project:
+            return None
+        evaluation = project.get('evaluation')
+        score = evaluation.get('overall_score') if isinstance(evaluation, dict) else None
+        if not isinstance(score, (int, float)) or score < self.min_score:
+            return None
+
+        key = self.prompt_hash(project['prompt'], project['student_name'])
+        # 예약과 작업 등록을 하나의 트랜잭션으로 처리 (작업 없는 예약이 남지 않도록)
+        with self.db.transaction():
+            result = self.db.reserve_draft(
+                key, project['id'], self.job_key, self.max_concurrency, self.daily_quota,
+                self.ttl_hours, self.history_days
+            )
+            if result == 'scheduled':
+                self.job_queue.enqueue(self.JOB_KIND, {
+                    "project_id": project['id'],
+                    "prompt_hash": key
+                }, dedupe_key=self.job_key + key)
+        self._count(result)
+        return result
+
+    def run(self, payload):
+        """초안 생성 작업 (프로젝트가 이미 처리되었거나 프롬프트가 바뀌었으면 생성하지 않음)"""
+        key = payload['prompt_hash']
+        project = self.db.get_project(payload['project_id'])
+        if (not project or project['status'] != 'pending'
+                or self.prompt_hash(project['prompt'], project['student_name']) != key):
+            self.db.finish_draft(key, 'cancelled')
+            self._count('cancelled')
+            return {"project_id": payload['project_id'], "status": "cancelled"}
+
+        try:
+            html_content = self.gemini_service.generate_html_content(project['prompt'], project['student_name'])
+        except Exception:
+            self.db.finish_draft(key, 'failed')
+            self._count('failed')
+            raise
+
+        status = self.db.complete_draft(key, html_content)
+        if status:
+            self._count(status)
+        return {"project_id": payload['project_id'], "status": status}
+
+    def lookup(self, project_id, prompt, student_name):
+        """승인에 사용할 초안 조회 ((prompt_hash, html) 또는 (None, None))
+
+        프롬프트가 바뀌어 사용할 수 없게 된 이 프로젝트의 다른 초안은 폐기합니다.
+        """
+        if not self.enabled:
+            return None, None
+        key = self.prompt_hash(prompt, student_name)
+        html_content = self.db.get_draft_html(key)
+        wasted = self.db.discard_drafts(project_id, keep_hash=key if html_content is not None else None)
+        if wasted:
+            self._count('discarded', wasted)
+        self._count('hit' if html_content is not None else 'miss')
+        return (key, html_content) if html_content is not None else (None, None)
+
+    def discard(self, project_id):
+        """거부/수정된 프로젝트의 초안 폐기"""
+        wasted = self.db.discard_drafts(project_id)
+        if wasted:
+            self._count('discarded', wasted)
+        return wasted
+
+    def stats(self):
+        """초안 상태별 수(보관 기간 내)와 승인 시 초안 사용률(프로세스 단위)"""
+        counts = self.db.get_draft_stats()
+        generated = counts.get('used', 0) + counts.get('wasted', 0)
+        counters = metrics.snapshot()["counters"]
+        hits, misses = (
+            counters.get(('aiedap_pregenerate_total', (('result', result),)), 0) for result in ('hit', 'miss')
+        )
+        return {
+            "enabled": self.enabled,
+            "min_score": self.min_score,
+            "max_concurrency": self.max_concurrency,
+            "daily_quota": self.daily_quota,
+            "drafts": {
+                status: counts.get(status, 0)
+                for status in ('queued', 'ready', 'used', 'wasted', 'cancelled', 'failed')
+            },
+            # 생성을 마친 초안 중 승인에 사용된 비율
+            "hit_rate": round(counts.get('used', 0) / generated, 4) if generated else 0.0,
+            "wasted": counts.get('wasted', 0),
+            "approvals": {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0
+            }
+        }
+
+    @staticmethod
+    def _count(result, amount=1):
+        metrics.inc('aiedap_pregenerate_total', {"result": result}, amount)
@@ -0,0 +1,98 @@
+import os
+import re
+import json
+import time
+import hashlib
+import unicodedata
+from metrics import metrics
+
+class EvaluationCache:
+    """프롬프트 평가 결과 캐시
+
+    정규화된 프롬프트, 모델 이름, 평가 템플릿 버전의 해시를 키로 SQLite에 저장합니다.
+    TTL이 지난 항목은 사용하지 않으며, 최대 개수를 넘으면 가장 오래 사용되지 않은 항목부터 삭제합니다.
+    """
+
+    def __init__(self, db, ttl_seconds=None, max_entries=None):
+        self.db = db
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(
+            os.getenv('EVALUATION_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv('EVALUATION_CACHE_MAX_ENTRIES', 10000))
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @staticmethod
+    def normalize_prompt(prompt):
+        """유니코드 정규화 및 공백 정리"""
+        prompt = unicodedata.normalize('NFKC', prompt or '')
+        return re.sub(r'\s+', ' ', prompt).strip()
+
+    def make_key(self, prompt, model_name, template_version):
+        """캐시 키 생성"""
+        raw = json.dumps(
+            [self.normalize_prompt(prompt), model_name, template_version],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """캐시된 평가 결과 조회 (없거나 만료되면 None)"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self.db.get_connection() as conn:
+            row = conn.execute(
+                'SELECT result FROM evaluation_cache WHERE key = ? AND created_at > ?',
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    'UPDATE evaluation_cache SET last_used_at = ?, hits = hits + 1 WHERE key = ?',
+                    (now, key)
+                )
+        self._count('hit' if row else 'miss')
+        return json.loads(row['result']) if row else None
+
+    def put(self, key, result, model_name=None):
+        """평가 결과 저장 후 만료/초과 항목 정리"""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self.db.get_connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO evaluation_cache (key, result, model, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (key, json.dumps(result, ensure_ascii=False), model_name, now, now))
+            conn.execute(
+                'DELETE FROM evaluation_cache WHERE created_at <= ?', (now - self.ttl_seconds,)
+            )
+            conn.execute('''
+                DELETE FROM evaluation_cache WHERE key IN (
+                    SELECT key FROM evaluation_cache
+                    ORDER BY last_used_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+        self._count('store')
+
+    def record_bypass(self):
+        """강제 재평가로 캐시를 건너뛴 경우 기록"""
+        self._count('bypass')
+
+    def stats(self):
+        """적중/미스 카운터 (프로세스 단위)"""
+        counters = metrics.snapshot()["counters"]
+        names = {"hit": "hits", "miss": "misses", "bypass": "bypasses", "store": "stores"}
+        stats = {
+            plural: counters.get(('aiedap_evaluation_cache_total', (('result', result),)), 0)
+            for result, plural in names.items()
+        }
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _count(self, result):
+        metrics.inc('aiedap_evaluation_cache_total', {"result": result})
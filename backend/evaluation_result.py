@@ -0,0 +1,115 @@
+import json
+
+# 평가 기준별 점수 키 (응답 스키마와 검증에 공통으로 사용)
+SCORE_KEYS = ('relevance', 'clarity', 'educational_value', 'feasibility')
+MIN_SCORE = 1
+MAX_SCORE = 5
+MAX_SUGGESTIONS = 5
+MAX_FEEDBACK_CHARS = 1000
+
+def _score_schema(description):
+    return {"type": "integer", "description": f"{description} ({MIN_SCORE}-{MAX_SCORE}점 정수)"}
+
+# 평가 응답 JSON 스키마 (generation_config의 response_schema, OpenAPI 부분 집합)
+EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "overall_score": _score_schema("종합 점수"),
+        "scores": {
+            "type": "object",
+            "properties": {
+                "relevance": _score_schema("수학 학습 내용과의 연관성"),
+                "clarity": _score_schema("프롬프트의 명확성과 구체성"),
+                "educational_value": _score_schema("교육적 가치"),
+                "feasibility": _score_schema("실현 가능성"),
+            },
+            "required": list(SCORE_KEYS),
+        },
+        "feedback": {"type": "string", "description": "간단한 피드백 메시지"},
+        "suggestions": {
+            "type": "array",
+            "items": {"type": "string"},
+            "max_items": MAX_SUGGESTIONS,
+            "description": "개선 제안",
+        },
+    },
+    "required": ["overall_score", "scores", "feedback", "suggestions"],
+}
+
+class EvaluationParseError(ValueError):
+    """모델 응답이 평가 스키마에 맞지 않음 (errors: 문제 목록)"""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+class EvaluationResult:
+    """스키마를 검증한 모델 평가 결과"""
+
+    __slots__ = ('overall_score', 'scores', 'feedback', 'suggestions')
+
+    def __init__(self, overall_score, scores, feedback, suggestions):
+        self.overall_score = overall_score
+        self.scores = scores
+        self.feedback = feedback
+        self.suggestions = suggestions
+
+    @classmethod
+    def from_json(cls, text):
+        """모델 응답 JSON을 검증해 생성 (맞지 않으면 EvaluationParseError)"""
+        try:
+            data = json.loads(text)
+        except (TypeError, ValueError) as e:
+            raise EvaluationParseError([f"JSON으로 해석할 수 없습니다: {e}"])
+        if not isinstance(data, dict):
+            raise EvaluationParseError(["최상위 값이 JSON 객체가 아닙니다"])
+
+        errors = []
+        overall_score = _score(data.get('overall_score'), 'overall_score', errors)
+        raw_scores = data.get('scores')
+        if isinstance(raw_scores, dict):
+            scores = {key: _score(raw_scores.get(key), f'scores.{key}', errors) for key in SCORE_KEYS}
+        else:
+            errors.append("scores가 객체가 아닙니다")
+            scores = None
+
+        feedback = data.get('feedback')
+        if not isinstance(feedback, str) or not feedback.strip():
+            errors.append("feedback이 비어 있거나 문자열이 아닙니다")
+        suggestions = data.get('suggestions')
+        if not isinstance(suggestions, list) or not all(isinstance(item, str) for item in suggestions):
+            errors.append("suggestions가 문자열 배열이 아닙니다")
+
+        if errors:
+            raise EvaluationParseError(errors)
+        return cls(
+            overall_score,
+            scores,
+            feedback.strip()[:MAX_FEEDBACK_CHARS],
+            [item.strip() for item in suggestions if item.strip()][:MAX_SUGGESTIONS]
+        )
+
+    @property
+    def is_appropriate(self):
+        """적절성 판단 (overall_score 3 이상이면 적절)"""
+        return self.overall_score >= 3
+
+    def to_dict(self):
+        """API 응답/캐시에 사용하는 평가 dict"""
+        return {
+            "overall_score": self.overall_score,
+            "scores": dict(self.scores),
+            "feedback": self.feedback,
+            "suggestions": list(self.suggestions),
+            "is_appropriate": self.is_appropriate
+        }
+
+def _score(value, name, errors):
+    """1-5 정수 점수 검증 (정수로 떨어지는 실수는 허용)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not float(value).is_integer():
+        errors.append(f"{name}이(가) 정수가 아닙니다")
+        return None
+    if not MIN_SCORE <= value <= MAX_SCORE:
+        errors.append(f"{name}이(가) {MIN_SCORE}-{MAX_SCORE} 범위를 벗어났습니다")
+        return None
+    return int(value)
@@ -1,23 +1,265 @@
 import os
-import google.generativeai as genai
+import asyncio
+import json
+import time
+import hashlib
+import threading
 from dotenv import load_dotenv
+from model_client import GenerateResult, ResponseTruncatedError, create_model_client
+from metrics import metrics
+from profiler import profiler
+from html_minifier import HtmlMinifier
+from token_budget import TokenBudget
+from evaluation_result import EVALUATION_SCHEMA
+from singleflight import AsyncSingleFlight, SingleFlight
+from resilience import CircuitBreaker, CircuitOpenError, is_retryable, retry_call, retry_call_async
 
 load_dotenv()
 
+class ModelResponse:
+    """모델 응답 텍스트와 응답을 처리한 경로 (primary/fallback 모델)"""
+
+    def __init__(self, text, model, path, attempts=1, latency_ms=0, prompt_tokens=None, output_tokens=None):
+        self.text = text
+        self.model = model
+        self.path = path
+        self.attempts = attempts
+        self.latency_ms = latency_ms
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+
+    def served_by(self):
+        return {
+            "path": self.path,
+            "model": self.model,
+            "attempts": self.attempts,
+            "latency_ms": self.latency_ms
+        }
+
 class GeminiService:
-    def __init__(self):
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY 환경 변수가 설정되지 않았습니다.")
-        
-        genai.configure(api_key=api_key)
-        # Gemini 3 Pro Preview 모델 사용
-        self.model = genai.GenerativeModel('gemini-3-pro-preview')
+    MODEL_NAME = 'gemini-3-pro-preview'
+    # 기본 모델이 지연 예산을 넘기거나 장애일 때 사용하는 빠른 모델
+    FALLBACK_MODEL_NAME = 'gemini-2.5-flash'
+    # 평가 프롬프트 템플릿이 바뀌면 올려서 평가 캐시를 무효화
+    EVALUATION_TEMPLATE_VERSION = 4
+    # 스키마에 맞지 않는 평가 응답을 고쳐 달라고 다시 요청할 때 함께 보내는 이전 응답의 최대 토큰 수
+    REPAIR_MAX_RESPONSE_TOKENS = 512
 
-    def generate_html_content(self, prompt, student_name=""):
-        """프롬프트를 기반으로 HTML 콘텐츠 생성"""
-        system_prompt = f"""당신은 수학 교육용 인터랙티브 콘텐츠를 만드는 전문가입니다.
-학생 '{student_name}'이 제시한 프롬프트를 바탕으로 HTML 기반의 교육용 콘텐츠를 만들어주세요.
+    def __init__(self, client=None):
+        # 모델 호출 클라이언트 (기본: GEMINI_BACKEND에 따라 실제 Gemini 또는 로컬 가짜 모델)
+        # 전달하지 않으면 처음 호출할 때 생성해 SDK 로딩을 서버 시작 이후로 미룸
+        self._client = client
+        self._client_lock = threading.Lock()
+
+        # 기본 모델: Gemini 3 Pro Preview, 대체 모델은 비워 두면 사용하지 않음
+        self.model_name = os.getenv('GEMINI_MODEL', self.MODEL_NAME)
+        self.fallback_model_name = os.getenv('GEMINI_FALLBACK_MODEL', self.FALLBACK_MODEL_NAME) or None
+        model_names = [self.model_name]
+        if self.fallback_model_name and self.fallback_model_name != self.model_name:
+            model_names.append(self.fallback_model_name)
+        else:
+            self.fallback_model_name = None
+
+        # 작업별 기본 모델 지연 예산(초)과 재시도/차단 설정
+        self.timeouts = {
+            'evaluate': float(os.getenv('GEMINI_EVALUATE_TIMEOUT', 30)),
+            'generate': float(os.getenv('GEMINI_GENERATE_TIMEOUT', 120)),
+        }
+        self.fallback_timeout = float(os.getenv('GEMINI_FALLBACK_TIMEOUT', 60))
+        self.max_retries = int(os.getenv('GEMINI_MAX_RETRIES', 2))
+        self.breakers = {
+            name: CircuitBreaker(
+                name,
+                failure_threshold=int(os.getenv('GEMINI_BREAKER_THRESHOLD', 5)),
+                reset_timeout=float(os.getenv('GEMINI_BREAKER_RESET_SECONDS', 30))
+            )
+            for name in model_names
+        }
+
+        # 동일한 요청이 동시에 들어오면 API 호출 한 번으로 합침
+        self._inflight = SingleFlight()
+        self._inflight_async = AsyncSingleFlight()
+
+        # ASGI 모드에서 동시에 진행하는 모델 호출 수 상한 (이벤트 루프에서 처음 사용할 때 생성)
+        self.max_concurrency = int(os.getenv('GEMINI_MAX_CONCURRENCY', 256))
+        self._semaphore = None
+
+        # 생성된 HTML 후처리 (주석/공백 제거)
+        self.html_minifier = HtmlMinifier()
+
+        # 입력/출력 토큰 한도
+        self.token_budget = TokenBudget()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = create_model_client()
+        return self._client
+
+    async def _client_async(self):
+        """client의 비동기 버전 (처음 생성할 때 이벤트 루프를 막지 않도록 스레드에서 생성)"""
+        if self._client is None:
+            await asyncio.to_thread(lambda: self.client)
+        return self._client
+
+    def _model_tiers(self, operation):
+        """(모델 이름, 경로, 지연 예산) 목록: 기본 모델 다음 대체 모델"""
+        tiers = [(self.model_name, 'primary', self.timeouts[operation])]
+        if self.fallback_model_name:
+            tiers.append((self.fallback_model_name, 'fallback', self.fallback_timeout))
+        return tiers
+
+    def _inflight_key(self, operation, contents, generation_config):
+        return hashlib.sha256(json.dumps(
+            [operation, self.model_name, contents, generation_config],
+            ensure_ascii=False, sort_keys=True
+        ).encode('utf-8')).hexdigest()
+
+    def _generate_text(self, operation, contents, generation_config=None):
+        """모델 호출 후 ModelResponse 반환 (같은 요청의 동시 호출은 결과 공유)"""
+        key = self._inflight_key(operation, contents, generation_config)
+        return self._inflight.do(key, self._call_with_fallback, operation, contents, generation_config)
+
+    async def _generate_text_async(self, operation, contents, generation_config=None):
+        """_generate_text의 비동기 버전"""
+        key = self._inflight_key(operation, contents, generation_config)
+        return await self._inflight_async.do(
+            key, self._call_with_fallback_async, operation, contents, generation_config)
+
+    def _call_with_fallback(self, operation, contents, generation_config=None):
+        """지연 예산 안에서 재시도하고, 실패하거나 차단된 경우 다음 모델로 전환"""
+        last_error = None
+        for name, path, budget in self._model_tiers(operation):
+            blocked = self._check_breaker(operation, name)
+            if blocked:
+                last_error = blocked
+                continue
+
+            started = time.monotonic()
+            try:
+                result, attempts = retry_call(
+                    lambda timeout: self._call_model(
+                        name, contents, generation_config, timeout, self.SYSTEM_INSTRUCTIONS[operation]),
+                    deadline=started + budget,
+                    max_retries=self.max_retries
+                )
+            except Exception as e:
+                last_error = self._call_failed(operation, name, started, contents, e)
+                continue
+            except BaseException:
+                # 취소 등으로 결과 없이 중단되면 시험 호출 자리만 반환
+                self.breakers[name].release()
+                raise
+            return self._call_succeeded(operation, name, path, started, contents, result, attempts)
+        raise last_error
+
+    async def _call_with_fallback_async(self, operation, contents, generation_config=None):
+        """_call_with_fallback의 비동기 버전"""
+        last_error = None
+        for name, path, budget in self._model_tiers(operation):
+            blocked = self._check_breaker(operation, name)
+            if blocked:
+                last_error = blocked
+                continue
+
+            started = time.monotonic()
+            try:
+                result, attempts = await retry_call_async(
+                    lambda timeout: self._call_model_async(
+                        name, contents, generation_config, timeout, self.SYSTEM_INSTRUCTIONS[operation]),
+                    deadline=started + budget,
+                    max_retries=self.max_retries
+                )
+            except Exception as e:
+                last_error = self._call_failed(operation, name, started, contents, e)
+                continue
+            except BaseException:
+                # 취소 등으로 결과 없이 중단되면 시험 호출 자리만 반환
+                self.breakers[name].release()
+                raise
+            return self._call_succeeded(operation, name, path, started, contents, result, attempts)
+        raise last_error
+
+    def _check_breaker(self, operation, model_name):
+        """서킷 브레이커가 열려 있으면 CircuitOpenError 반환 (호출 가능하면 None)"""
+        try:
+            self.breakers[model_name].allow()
+        except CircuitOpenError as e:
+            metrics.inc('aiedap_gemini_requests_total',
+                        {"operation": operation, "model": model_name, "outcome": "circuit_open"})
+            return e
+        return None
+
+    def _call_failed(self, operation, model_name, started, contents, error):
+        """실패한 호출 기록 후 예외 반환"""
+        self._record_result(self.breakers[model_name], error)
+        # 출력 토큰 한도로 잘린 응답은 따로 집계 (저장하지 않고 실패 처리)
+        outcome = 'max_tokens' if isinstance(error, ResponseTruncatedError) else 'error'
+        self._record_call(operation, model_name, outcome, started, contents)
+        return error
+
+    def _call_succeeded(self, operation, model_name, path, started, contents, result, attempts=1):
+        """성공한 호출 기록 후 ModelResponse 반환"""
+        self.breakers[model_name].record_success()
+        self._record_call(operation, model_name, path, started, contents, result)
+        latency_ms = round((time.monotonic() - started) * 1000)
+        return ModelResponse(
+            result.text, model_name, path, attempts, latency_ms,
+            result.prompt_tokens, result.output_tokens
+        )
+
+    @profiler.timed('gemini')
+    def _call_model(self, model_name, contents, generation_config=None, timeout=None, system_instruction=None):
+        return self.client.generate(model_name, contents, generation_config, timeout, system_instruction)
+
+    async def _call_model_async(self, model_name, contents, generation_config=None, timeout=None,
+                                system_instruction=None):
+        async with self._upstream_slot(timeout) as remaining:
+            client = await self._client_async()
+            return await client.generate_async(model_name, contents, generation_config, remaining, system_instruction)
+
+    def _upstream_slot(self, timeout=None):
+        """동시 모델 호출 수 제한 (timeout 안에 자리가 나지 않으면 TimeoutError)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return _SemaphoreSlot(self._semaphore, timeout)
+
+    @staticmethod
+    def _record_call(operation, model_name, outcome, started, contents, result=None):
+        """호출 시간, 요청/응답 크기, 토큰 사용량 기록"""
+        metrics.inc('aiedap_gemini_requests_total',
+                    {"operation": operation, "model": model_name, "outcome": outcome})
+        metrics.observe('aiedap_gemini_request_duration_seconds', time.monotonic() - started,
+                        {"operation": operation, "model": model_name})
+        metrics.observe('aiedap_gemini_prompt_chars', len(contents), {"operation": operation})
+        if result is None:
+            return
+        metrics.observe('aiedap_gemini_response_chars', len(result.text), {"operation": operation})
+        for kind, tokens in (('prompt', result.prompt_tokens), ('output', result.output_tokens)):
+            if tokens:
+                metrics.inc('aiedap_gemini_tokens_total', {"operation": operation, "type": kind}, tokens)
+                metrics.observe('aiedap_gemini_call_tokens', tokens, {"operation": operation, "type": kind})
+
+    @staticmethod
+    def _record_result(breaker, error):
+        """일시적 오류만 서킷 브레이커 실패로 집계 (요청 자체의 오류는 정상 응답으로 간주)"""
+        if is_retryable(error):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    # HTML 생성 시 사용하는 설정
+    HTML_GENERATION_CONFIG = {
+        "temperature": 0.7,
+        "top_p": 0.95,
+        "top_k": 40,
+    }
+
+    # 요청마다 바뀌지 않는 지침은 system instruction으로 분리하고, 요청에는 학생별 내용만 보냄
+    HTML_SYSTEM_INSTRUCTION = """당신은 수학 교육용 인터랙티브 콘텐츠를 만드는 전문가입니다.
+학생이 제시한 프롬프트를 바탕으로 HTML 기반의 교육용 콘텐츠를 만들어주세요.
 
 요구사항:
 1. 완전한 HTML 문서 형태로 작성 (DOCTYPE, html, head, body 포함)
@@ -27,59 +269,289 @@ class GeminiService:
 5. 반응형 디자인 적용
 6. 아름답고 현대적인 UI/UX
 
-프롬프트: {prompt}
-
 HTML 코드만 반환하세요. 설명이나 마크다운 코드 블록 없이 순수 HTML만 제공해주세요."""
 
+    EVALUATION_SYSTEM_INSTRUCTION = """당신은 수학 교육 전문가입니다. 학생이 제시한 프롬프트가 수학 학습 내용을 바탕으로 한 적절한 콘텐츠 제작 요청인지 평가해주세요.
+
+평가 기준:
+1. 수학 학습 내용과의 연관성 (1-5점)
+2. 프롬프트의 명확성과 구체성 (1-5점)
+3. 교육적 가치 (1-5점)
+4. 실현 가능성 (1-5점)
+
+지정된 JSON 스키마에 맞춰 종합 점수(overall_score), 기준별 점수(scores), 간단한 피드백(feedback),
+개선 제안(suggestions)을 응답해주세요. 모든 점수는 1-5점 정수입니다."""
+
+    # 평가 응답을 스키마에 맞는 JSON으로 제한 (정규식으로 응답에서 JSON을 찾지 않음)
+    EVALUATION_GENERATION_CONFIG = {
+        "response_mime_type": "application/json",
+        "response_schema": EVALUATION_SCHEMA,
+    }
+
+    # 작업별 system instruction
+    SYSTEM_INSTRUCTIONS = {
+        'generate': HTML_SYSTEM_INSTRUCTION,
+        'evaluate': EVALUATION_SYSTEM_INSTRUCTION,
+    }
+
+    def _fit_prompt(self, operation, prompt, build):
+        """build(prompt)로 요청 내용 구성 (system instruction과 합친 추정 토큰 수가 입력 한도를 넘으면 프롬프트를 잘라냄)"""
+        contents = build(prompt)
+        limit = self.token_budget.max_input_tokens
+        if limit <= 0:
+            return contents
+        estimate = self.token_budget.estimate
+        overflow = estimate(self.SYSTEM_INSTRUCTIONS[operation]) + estimate(contents) - limit
+        if overflow <= 0:
+            return contents
+        metrics.inc('aiedap_gemini_truncated_total', {"operation": operation})
+        return build(self.token_budget.truncate(prompt, max(0, estimate(prompt) - overflow)))
+
+    def _build_html_prompt(self, prompt, student_name=""):
+        """HTML 생성 요청 내용 (학생 이름과 프롬프트)"""
+        return self._fit_prompt(
+            'generate', prompt,
+            lambda text: f"학생: {student_name}\n프롬프트: {text}" if student_name else f"프롬프트: {text}"
+        )
+
+    def _html_generation_config(self):
+        return self.token_budget.output_config('generate', self.HTML_GENERATION_CONFIG)
+
+    def generate_html_content(self, prompt, student_name=""):
+        """프롬프트를 기반으로 HTML 콘텐츠 생성"""
         try:
-            response = self.model.generate_content(
-                system_prompt,
-                generation_config={
-                    "temperature": 0.7,
-                    "top_p": 0.95,
-                    "top_k": 40,
-                }
+            response = self._generate_text(
+                'generate',
+                self._build_html_prompt(prompt, student_name),
+                self._html_generation_config()
             )
-            html_content = response.text.strip()
             
-            # 마크다운 코드 블록 제거 (있는 경우)
-            if html_content.startswith('```'):
-                lines = html_content.split('\n')
-                html_content = '\n'.join(lines[1:-1]) if lines[-1].startswith('```') else '\n'.join(lines[1:])
-            
-            return html_content
+            # 마크다운 코드 블록 제거 (있는 경우) 후 최소화
+            stripper = MarkdownFenceStripper()
+            return self.html_minifier.minify(stripper.feed(response.text) + stripper.finish())
         except Exception as e:
             raise Exception(f"콘텐츠 생성 중 오류 발생: {str(e)}")
 
-    def evaluate_prompt(self, prompt, student_name=""):
-        """프롬프트 평가 (내부 메서드)"""
-        evaluation_prompt = f"""당신은 수학 교육 전문가입니다. 학생이 제시한 프롬프트가 수학 학습 내용을 바탕으로 한 적절한 콘텐츠 제작 요청인지 평가해주세요.
+    def stream_html_content(self, prompt, student_name=""):
+        """HTML 콘텐츠를 생성되는 대로 조각 단위로 반환 (제너레이터)
 
-평가 기준:
-1. 수학 학습 내용과의 연관성 (1-5점)
-2. 프롬프트의 명확성과 구체성 (1-5점)
-3. 교육적 가치 (1-5점)
-4. 실현 가능성 (1-5점)
+        첫 조각을 받기 전에 실패하면 대체 모델로 전환하고, 이후의 실패는 그대로 전달합니다.
+        """
+        contents = self._build_html_prompt(prompt, student_name)
+        last_error = None
+        for name, path, budget in self._model_tiers('generate'):
+            blocked = self._check_breaker('stream', name)
+            if blocked:
+                last_error = blocked
+                continue
+
+            started = False
+            started_at = time.monotonic()
+            received = []
+            try:
+                chunks = self.client.stream(
+                    name, contents, self._html_generation_config(), budget, self.HTML_SYSTEM_INSTRUCTION)
+                
+                stripper = MarkdownFenceStripper()
+                for chunk in chunks:
+                    started = True
+                    received.append(chunk)
+                    text = stripper.feed(chunk)
+                    if text:
+                        yield text
+                text = stripper.finish()
+                if text:
+                    yield text
+                self._call_succeeded('stream', name, path, started_at, contents, GenerateResult(''.join(received)))
+                return
+            except Exception as e:
+                last_error = self._call_failed('stream', name, started_at, contents, e)
+                if started:
+                    break
+            except BaseException:
+                # 클라이언트 연결 종료(GeneratorExit)나 취소로 중단되면 시험 호출 자리만 반환
+                self.breakers[name].release()
+                raise
+        raise Exception(f"콘텐츠 생성 중 오류 발생: {str(last_error)}")
+
+    async def stream_html_content_async(self, prompt, student_name=""):
+        """stream_html_content의 비동기 버전 (스트림이 끝날 때까지 동시 호출 자리 하나 사용)"""
+        contents = self._build_html_prompt(prompt, student_name)
+        last_error = None
+        for name, path, budget in self._model_tiers('generate'):
+            blocked = self._check_breaker('stream', name)
+            if blocked:
+                last_error = blocked
+                continue
+
+            started = False
+            started_at = time.monotonic()
+            received = []
+            try:
+                async with self._upstream_slot(budget) as remaining:
+                    client = await self._client_async()
+                    stripper = MarkdownFenceStripper()
+                    async for chunk in client.stream_async(
+                            name, contents, self._html_generation_config(), remaining,
+                            self.HTML_SYSTEM_INSTRUCTION):
+                        started = True
+                        received.append(chunk)
+                        text = stripper.feed(chunk)
+                        if text:
+                            yield text
+                    text = stripper.finish()
+                    if text:
+                        yield text
+                self._call_succeeded('stream', name, path, started_at, contents, GenerateResult(''.join(received)))
+                return
+            except Exception as e:
+                last_error = self._call_failed('stream', name, started_at, contents, e)
+                if started:
+                    break
+            except BaseException:
+                # 클라이언트 연결 종료(GeneratorExit)나 취소로 중단되면 시험 호출 자리만 반환
+                self.breakers[name].release()
+                raise
+        raise Exception(f"콘텐츠 생성 중 오류 발생: {str(last_error)}")
+
+    def _build_evaluation_prompt(self, prompt):
+        """평가 요청 내용
 
-학생 이름: {student_name}
-프롬프트: {prompt}
-
-다음 형식으로 JSON 응답해주세요:
-{{
-    "overall_score": 점수(1-5),
-    "scores": {{
-        "relevance": 점수,
-        "clarity": 점수,
-        "educational_value": 점수,
-        "feasibility": 점수
-    }},
-    "feedback": "간단한 피드백 메시지",
-    "suggestions": ["개선 제안 1", "개선 제안 2"]
-}}"""
+        평가 결과가 학생 이름과 무관하도록 이름은 프롬프트에 넣지 않습니다 (평가 캐시 키에서 제외).
+        """
+        return self._fit_prompt('evaluate', prompt, lambda text: f"프롬프트: {text}")
+
+    def _build_repair_prompt(self, prompt, invalid_text, errors):
+        """스키마에 맞지 않은 평가 응답을 고쳐 달라는 요청 내용 (문제 목록과 이전 응답 포함)"""
+        previous = self.token_budget.truncate(invalid_text or '', self.REPAIR_MAX_RESPONSE_TOKENS)
+        problems = '\n'.join(f"- {error}" for error in errors)
+        return self._fit_prompt('evaluate', prompt, lambda text: (
+            f"프롬프트: {text}\n\n"
+            f"이전 응답이 평가 스키마에 맞지 않았습니다.\n문제:\n{problems}\n\n이전 응답:\n{previous}\n\n"
+            "문제를 고쳐 스키마에 맞는 JSON만 다시 응답해주세요."
+        ))
+
+    def _evaluation_config(self):
+        return self.token_budget.output_config('evaluate', self.EVALUATION_GENERATION_CONFIG)
+
+    def evaluate_prompt(self, prompt, student_name=""):
+        """프롬프트 평가 (내부 메서드, ModelResponse 반환)"""
+        try:
+            return self._generate_text('evaluate', self._build_evaluation_prompt(prompt), self._evaluation_config())
+        except Exception as e:
+            raise Exception(f"평가 중 오류 발생: {str(e)}")
 
+    async def evaluate_prompt_async(self, prompt, student_name=""):
+        """evaluate_prompt의 비동기 버전"""
         try:
-            response = self.model.generate_content(evaluation_prompt)
-            return response.text
+            return await self._generate_text_async(
+                'evaluate', self._build_evaluation_prompt(prompt), self._evaluation_config())
         except Exception as e:
             raise Exception(f"평가 중 오류 발생: {str(e)}")
 
+    def repair_evaluation(self, prompt, invalid_text, errors):
+        """스키마에 맞지 않은 평가 응답을 한 번 다시 요청 (ModelResponse 반환)"""
+        try:
+            return self._generate_text(
+                'evaluate', self._build_repair_prompt(prompt, invalid_text, errors), self._evaluation_config())
+        except Exception as e:
+            raise Exception(f"평가 응답 복구 중 오류 발생: {str(e)}")
+
+    async def repair_evaluation_async(self, prompt, invalid_text, errors):
+        """repair_evaluation의 비동기 버전"""
+        try:
+            return await self._generate_text_async(
+                'evaluate', self._build_repair_prompt(prompt, invalid_text, errors), self._evaluation_config())
+        except Exception as e:
+            raise Exception(f"평가 응답 복구 중 오류 발생: {str(e)}")
+
+
+class _SemaphoreSlot:
+    """세마포어 자리를 timeout 안에 얻고 남은 시간을 반환하는 비동기 컨텍스트 매니저"""
+
+    def __init__(self, semaphore, timeout=None):
+        self.semaphore = semaphore
+        self.timeout = timeout
+
+    async def __aenter__(self):
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("동시 모델 호출 수 제한으로 대기 시간을 초과했습니다")
+        if self.timeout is None:
+            return None
+        return max(0.001, self.timeout - (time.monotonic() - started))
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+        return False
+
+class MarkdownFenceStripper:
+    """응답 앞뒤의 마크다운 코드 블록 표시(```)를 스트리밍 중에 점진적으로 제거
+
+    전체 응답을 받은 뒤 처리하는 방식(앞뒤 공백을 제거하고, ```로 시작하면 첫 줄과
+    ```로 시작하는 마지막 줄을 제거)과 조각을 나누는 위치에 관계없이 같은 결과를 냅니다.
+    feed()는 확정된 부분만 반환하고, 끝 공백과 닫는 코드 블록일 수 있는 마지막 줄은
+    다음 조각이나 finish()까지 보류합니다.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._fenced = False
+        # 보류 중인 텍스트가 새 줄의 시작인지 (False이면 이미 내보낸 줄의 뒷부분)
+        self._line_start = True
+        self._buffer = ''
+
+    def feed(self, text):
+        """새 조각을 추가하고 내보낼 수 있는 부분 반환"""
+        self._buffer += text
+        if not self._started:
+            head = self._buffer.lstrip()
+            # 여는 코드 블록인지 판단할 수 있을 때까지 대기
+            if len(head) < 3 and '```'.startswith(head):
+                return ''
+            if head.startswith('```'):
+                # 여는 코드 블록 줄(```html 등)이 끝날 때까지 대기
+                if '\n' not in head:
+                    return ''
+                self._fenced = True
+                head = head.split('\n', 1)[1]
+            self._started = True
+            self._buffer = head
+
+        content = self._buffer.rstrip()
+        if not content:
+            return ''
+        if self._fenced and self._may_close(content):
+            # 마지막 줄은 닫는 코드 블록일 수 있으므로 그 앞의 줄바꿈부터 보류
+            ready = content[:content.rfind('\n')] if '\n' in content else ''
+        else:
+            ready = content
+        if not ready:
+            return ''
+        self._buffer = self._buffer[len(ready):]
+        self._line_start = False
+        return ready
+
+    def finish(self):
+        """남은 내용을 정리해 반환 (닫는 코드 블록과 끝 공백 제거)"""
+        buffer, self._buffer = self._buffer, ''
+        if not self._started:
+            head = buffer.strip()
+            # 코드 블록 줄 하나뿐이면 빈 결과
+            return '' if head.startswith('```') else head
+        content = buffer.rstrip()
+        if self._fenced and content and self._is_line_start(content) and \
+                content.rsplit('\n', 1)[-1].startswith('```'):
+            return content[:content.rfind('\n')] if '\n' in content else ''
+        return content
+
+    def _is_line_start(self, content):
+        """content의 마지막 줄이 새 줄로 시작하는지"""
+        return '\n' in content or self._line_start
+
+    def _may_close(self, content):
+        """content의 마지막 줄이 닫는 코드 블록(```...)이거나 그렇게 될 수 있는지"""
+        last = content.rsplit('\n', 1)[-1]
+        return self._is_line_start(content) and (last.startswith('```') or '```'.startswith(last))
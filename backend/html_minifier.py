@@ -0,0 +1,47 @@
+import os
+import re
+
+# 내용을 그대로 보존하는 요소 (공백이 의미를 갖거나 HTML이 아닌 내용)
+PRESERVED_ELEMENTS = re.compile(
+    r'(<(script|style|pre|textarea)\b(?:[^>"\']|"[^"]*"|\'[^\']*\')*>.*?</\2\s*>)', re.IGNORECASE | re.DOTALL
+)
+# 조건부 주석(<!--[if ...]>)은 남기고 일반 주석만 제거
+COMMENT = re.compile(r'<!--(?!\[if|<!|>).*?-->', re.DOTALL)
+# 따옴표 안의 >는 태그의 끝으로 보지 않음 (예: title="a > b")
+TAG = re.compile(r'(<(?:[^>"\']|"[^"]*"|\'[^\']*\')*>)')
+WHITESPACE = re.compile(r'\s+')
+
+class HtmlMinifier:
+    """생성된 HTML의 주석과 불필요한 공백 제거
+
+    script/style/pre/textarea 내용과 태그(속성값 포함)는 그대로 두고, 태그 사이 텍스트의
+    연속된 공백만 하나로 줄입니다. 줄바꿈이 포함된 공백은 줄바꿈 하나로 남겨 버전 차분이
+    줄 단위로 계속 동작하도록 합니다.
+    """
+
+    def __init__(self, enabled=None):
+        self.enabled = (os.getenv('HTML_MINIFY', '1') != '0') if enabled is None else enabled
+
+    def minify(self, html):
+        """최소화한 HTML 반환 (비활성화되었거나 HTML이 없으면 그대로 반환)"""
+        if not self.enabled or not html:
+            return html
+        parts = PRESERVED_ELEMENTS.split(html)
+        result = []
+        # split 결과: [일반, 보존 요소, 요소 이름, 일반, ...]
+        for index in range(0, len(parts), 3):
+            result.append(self._minify_markup(parts[index]))
+            if index + 1 < len(parts):
+                result.append(parts[index + 1])
+        return ''.join(result).strip()
+
+    def _minify_markup(self, markup):
+        markup = COMMENT.sub('', markup)
+        pieces = TAG.split(markup)
+        # 홀수 번째는 태그: 속성값의 공백이 바뀌지 않도록 그대로 둠
+        for index in range(0, len(pieces), 2):
+            pieces[index] = WHITESPACE.sub(_collapse, pieces[index])
+        return ''.join(pieces)
+
+def _collapse(match):
+    return '\n' if '\n' in match.group(0) else ' '
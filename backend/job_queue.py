@@ -0,0 +1,103 @@
+import os
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class JobQueue:
+    """SQLite에 상태를 저장하는 백그라운드 작업 큐
+
+    작업 상태는 jobs 테이블에 기록되므로 재시작 후에도 유지됩니다.
+    실행 중인 작업은 임대(lease)를 주기적으로 연장하며, 프로세스가 중단되어
+    임대가 만료된 작업은 다시 대기열로 돌아갑니다.
+    """
+
+    def __init__(self, db, max_workers=None, lease_seconds=None, max_attempts=None,
+                 poll_interval=1.0, retention_hours=None):
+        self.db = db
+        self.max_workers = max_workers or int(os.getenv('JOB_WORKERS', 2))
+        self.lease_seconds = lease_seconds or int(os.getenv('JOB_LEASE_SECONDS', 60))
+        self.max_attempts = max_attempts or int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+        self.retention_hours = retention_hours or int(os.getenv('JOB_RETENTION_HOURS', 24))
+        self.poll_interval = poll_interval
+        self.handlers = {}
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = set()
+        self._pid = None
+        self._executor = None
+        self._slots = None
+        self._last_purge = 0.0
+
+    def register(self, kind, handler):
+        """작업 종류별 처리 함수 등록 (handler(payload) -> result dict)"""
+        self.handlers[kind] = handler
+
+    def enqueue(self, kind, payload, dedupe_key=None):
+        """작업 등록 후 즉시 반환 (같은 dedupe_key의 작업이 진행 중이면 그 작업 반환)"""
+        if kind not in self.handlers:
+            raise ValueError(f"알 수 없는 작업 종류입니다: {kind}")
+        job = self.db.create_job(kind, payload, dedupe_key)
+        self.start()
+        self._wakeup.set()
+        return job
+
+    def get(self, job_id):
+        """작업 상태 조회"""
+        return self.db.get_job(job_id)
+
+    def start(self):
+        """디스패처 스레드 시작 (프로세스마다 한 번, fork 이후 재시작)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._running = set()
+            self._slots = threading.Semaphore(self.max_workers)
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            threading.Thread(target=self._dispatch_loop, name='job-dispatcher', daemon=True).start()
+
+    def _dispatch_loop(self):
+        """대기 작업을 빈 슬롯만큼 가져와 실행"""
+        while True:
+            try:
+                self._maintain()
+                while self._slots.acquire(blocking=False):
+                    job = self.db.claim_next_job(self.lease_seconds)
+                    if not job:
+                        self._slots.release()
+                        break
+                    self._running.add(job['id'])
+                    try:
+                        self._executor.submit(self._run, job)
+                    except RuntimeError:
+                        # 인터프리터 종료 중: 임대가 만료되면 다른 프로세스가 다시 처리
+                        return
+            except Exception:
+                logger.exception("작업 디스패치 중 오류 발생")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _maintain(self):
+        """임대 연장, 만료 작업 재등록, 오래된 작업 정리"""
+        self.db.renew_job_leases(list(self._running), self.lease_seconds)
+        self.db.requeue_expired_jobs(self.max_attempts)
+        if time.monotonic() - self._last_purge > 3600:
+            self.db.purge_finished_jobs(self.retention_hours)
+            self._last_purge = time.monotonic()
+
+    def _run(self, job):
+        """작업 실행 및 결과 저장"""
+        try:
+            result = self.handlers[job['kind']](job['payload'])
+            self.db.finish_job(job['id'], result=result)
+        except Exception as e:
+            logger.exception("작업 실패: %s", job['id'])
+            self.db.finish_job(job['id'], error=str(e))
+        finally:
+            self._running.discard(job['id'])
+            self._slots.release()
+            self._wakeup.set()
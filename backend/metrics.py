@@ -0,0 +1,281 @@
+import os
+import json
+import glob
+import time
+import bisect
+import threading
+from functools import wraps
+
+# 지연 시간(초) 히스토그램 기본 구간
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# 크기(문자/토큰/행 수) 히스토그램 기본 구간
+SIZE_BUCKETS = (10, 100, 1000, 5000, 10000, 50000, 100000, 500000)
+
+class MetricsRegistry:
+    """Prometheus 텍스트 형식으로 노출하는 지표 저장소
+
+    지표는 스레드별 샤드에 기록되므로 요청 처리 중에는 락을 잡지 않습니다.
+    METRICS_DIR이 설정되면 프로세스마다 스냅샷을 파일로 기록하고, 노출 시
+    모든 프로세스(gunicorn 워커)의 값을 합산합니다.
+    """
+
+    def __init__(self, multiprocess_dir=None, flush_interval=5.0):
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_interval = flush_interval
+        self._descriptions = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = self._new_shard()
+        self._flusher_pid = None
+
+    @staticmethod
+    def _new_shard():
+        return {"counters": {}, "histograms": {}}
+
+    def describe(self, name, metric_type, help_text, buckets=None):
+        """지표 종류와 설명 등록"""
+        self._descriptions[name] = (metric_type, help_text, tuple(buckets or LATENCY_BUCKETS))
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = self._new_shard()
+            with self._lock:
+                self._retire_dead_threads()
+                self._shards.append((threading.current_thread(), shard))
+            self._ensure_flusher()
+        return shard
+
+    def inc(self, name, labels=None, value=1):
+        """카운터 증가"""
+        counters = self._shard()["counters"]
+        key = (name, _label_key(labels))
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        """히스토그램에 값 기록"""
+        histograms = self._shard()["histograms"]
+        key = (name, _label_key(labels))
+        data = histograms.get(key)
+        buckets = self._descriptions.get(name, (None, None, LATENCY_BUCKETS))[2]
+        if data is None:
+            # 구간별 개수 + [합계, 개수]
+            data = histograms[key] = [0] * (len(buckets) + 3)
+        data[bisect.bisect_left(buckets, value)] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def time(self, name, labels=None):
+        """with 블록의 실행 시간을 히스토그램에 기록"""
+        return _Timer(self, name, labels)
+
+    def _retire_dead_threads(self):
+        """종료된 스레드의 샤드를 합쳐 정리 (락을 잡은 상태에서 호출)"""
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                _merge(self._retired, shard)
+        self._shards = alive
+
+    def snapshot(self):
+        """현재 프로세스의 지표 합계"""
+        total = self._new_shard()
+        with self._lock:
+            self._retire_dead_threads()
+            _merge(total, self._retired)
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            _merge(total, {
+                "counters": shard["counters"].copy(),
+                "histograms": {k: list(v) for k, v in shard["histograms"].copy().items()}
+            })
+        return total
+
+    def _ensure_flusher(self):
+        """멀티 프로세스 모드에서 주기적으로 스냅샷을 파일에 기록하는 스레드 시작"""
+        if not self.multiprocess_dir or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+
+        def flush_loop():
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        threading.Thread(target=flush_loop, name='metrics-flush', daemon=True).start()
+
+    def flush(self):
+        """현재 프로세스 스냅샷을 METRICS_DIR/metrics-<pid>.json에 기록"""
+        if not self.multiprocess_dir:
+            return
+        snapshot = self.snapshot()
+        data = {
+            "counters": [[name, labels, value] for (name, labels), value in snapshot["counters"].items()],
+            "histograms": [[name, labels, value] for (name, labels), value in snapshot["histograms"].items()],
+        }
+        path = os.path.join(self.multiprocess_dir, f"metrics-{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        """모든 프로세스의 지표 합계 (멀티 프로세스 모드가 아니면 현재 프로세스만)"""
+        if not self.multiprocess_dir:
+            return self.snapshot()
+        self.flush()
+        total = self._new_shard()
+        for path in glob.glob(os.path.join(self.multiprocess_dir, 'metrics-*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            _merge(total, {
+                "counters": {(n, _label_key(dict(l))): v for n, l, v in data["counters"]},
+                "histograms": {(n, _label_key(dict(l))): v for n, l, v in data["histograms"]},
+            })
+        return total
+
+    def render(self):
+        """Prometheus 텍스트 형식으로 변환"""
+        data = self.collect()
+        series = {}
+        for (name, labels), value in data["counters"].items():
+            series.setdefault(name, []).append((labels, value))
+        for (name, labels), value in data["histograms"].items():
+            series.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(series):
+            metric_type, help_text, buckets = self._descriptions.get(
+                name, ('histogram' if (name, series[name][0][0]) in data["histograms"] else 'counter',
+                       '', LATENCY_BUCKETS))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in sorted(series[name], key=lambda item: item[0]):
+                if metric_type != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ['+Inf'], value[:-2]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-2])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+        return '\n'.join(lines) + '\n'
+
+class _Timer:
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, self.labels)
+        return False
+
+def _label_key(labels):
+    return tuple(sorted((str(k), str(v)) for k, v in (labels or {}).items()))
+
+def _merge(target, source):
+    for key, value in source["counters"].items():
+        target["counters"][key] = target["counters"].get(key, 0) + value
+    for key, value in source["histograms"].items():
+        existing = target["histograms"].get(key)
+        if existing is None:
+            target["histograms"][key] = list(value)
+        else:
+            for i, v in enumerate(value):
+                existing[i] += v
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{k}="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for k, v in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+def instrument_methods(prefix, exclude=(), observer=None):
+    """클래스의 공개 메서드 실행 시간과 반환 행 수를 기록하는 클래스 데코레이터
+
+    observer가 있으면 메서드를 observer(인스턴스, 메서드 이름)가 반환하는 컨텍스트 매니저 안에서 실행합니다.
+    """
+    def decorate(cls):
+        for attr, method in list(vars(cls).items()):
+            if attr.startswith('_') or attr in exclude or not callable(method):
+                continue
+            setattr(cls, attr, _instrument(prefix, attr, method, observer))
+        return cls
+    return decorate
+
+def _instrument(prefix, name, method, observer=None):
+    labels = {"method": name}
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        if observer:
+            with observer(args[0], name):
+                result = method(*args, **kwargs)
+        else:
+            result = method(*args, **kwargs)
+        metrics.observe(f"{prefix}_query_duration_seconds", time.perf_counter() - started, labels)
+        metrics.inc(f"{prefix}_rows_total", labels, _row_count(result))
+        return result
+    return wrapper
+
+def _row_count(result):
+    """반환값의 행 수 (목록, (목록, 커서) 튜플, 단일 행)"""
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, bool) or result is None:
+        return int(bool(result))
+    if isinstance(result, int):
+        return result
+    return 1
+
+metrics = MetricsRegistry(os.getenv('METRICS_DIR') or None)
+
+metrics.describe('aiedap_http_requests_total', 'counter', "라우트/상태 코드별 요청 수")
+metrics.describe('aiedap_http_request_duration_seconds', 'histogram', "라우트별 응답 시간")
+metrics.describe('aiedap_gemini_requests_total', 'counter', "Gemini 호출 수 (작업/모델/결과별)")
+metrics.describe('aiedap_gemini_request_duration_seconds', 'histogram', "Gemini 호출 시간 (작업별)")
+metrics.describe('aiedap_gemini_prompt_chars', 'histogram', "Gemini 요청 프롬프트 길이(문자)", SIZE_BUCKETS)
+metrics.describe('aiedap_gemini_response_chars', 'histogram', "Gemini 응답 길이(문자)", SIZE_BUCKETS)
+metrics.describe('aiedap_gemini_tokens_total', 'counter', "Gemini 토큰 사용량 (입력/출력)")
+metrics.describe('aiedap_db_query_duration_seconds', 'histogram', "Database 메서드별 실행 시간")
+metrics.describe('aiedap_db_rows_total', 'counter', "Database 메서드별 반환/변경 행 수")
+metrics.describe('aiedap_evaluation_cache_total', 'counter', "평가 캐시 조회 결과 (hit/miss/bypass/store)")
+metrics.describe('aiedap_prescreen_total', 'counter', "프롬프트 사전 검사 결과 (규칙별, escalated는 모델 평가로 넘김)")
+metrics.describe('aiedap_pregenerate_total', 'counter', "HTML 초안 미리 생성 결과 (예약/생성/승인 시 사용 여부/폐기)")
+metrics.describe('aiedap_compression_total', 'counter', "응답 압축 (인코딩별, 압축 결과 캐시 hit/miss)")
+metrics.describe('aiedap_batch_items_total', 'counter', "일괄 처리 항목 결과 (success/failure)")
+metrics.describe('aiedap_batch_commits_total', 'counter', "일괄 승인에서 묶어서 커밋한 트랜잭션 그룹 수")
+metrics.describe('aiedap_batch_throttled_seconds_total', 'counter', "일괄 처리 중 호출 속도 제한으로 기다린 시간(초)")
+metrics.describe('aiedap_gemini_call_tokens', 'histogram', "Gemini 호출 한 번의 토큰 사용량 (입력/출력)", SIZE_BUCKETS)
+metrics.describe('aiedap_gemini_truncated_total', 'counter', "입력 토큰 한도를 넘어 프롬프트를 잘라낸 호출 수")
+metrics.describe('aiedap_evaluation_parse_total', 'counter', "평가 응답 스키마 검증 결과 (첫 응답/복구 요청별 valid/invalid/error)")
+metrics.describe('aiedap_profile_traces_total', 'counter', "저장한 프로파일 추적 기록 수 (요청/느린 쿼리, cProfile 포함 여부)")
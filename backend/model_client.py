@@ -0,0 +1,293 @@
+import os
+import asyncio
+import json
+import random
+import time
+
+class GenerateResult:
+    """모델 응답 텍스트와 토큰 사용량 (알 수 없으면 None)"""
+
+    def __init__(self, text, prompt_tokens=None, output_tokens=None):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+
+class ResponseTruncatedError(Exception):
+    """응답이 max_output_tokens 한도에 걸려 중간에 끊김 (finish_reason MAX_TOKENS)
+
+    잘린 HTML/평가를 저장하지 않도록 실패로 처리하며, 같은 요청을 재시도해도 같은 결과이므로
+    일시적 오류로 보지 않습니다.
+    """
+
+    def __init__(self, model_name):
+        super().__init__(f"{model_name} 응답이 최대 출력 토큰 수에 도달해 잘렸습니다")
+        self.model_name = model_name
+
+class ModelClient:
+    """GeminiService가 사용하는 모델 호출 인터페이스
+
+    generate()는 GenerateResult를, stream()은 텍스트 조각을 순서대로 반환합니다.
+    system_instruction은 요청마다 바뀌지 않는 작업별 지침으로, contents와 따로 전달합니다.
+    timeout(초)을 넘기면 TimeoutError 또는 code 속성이 있는 예외를 발생시켜야 합니다.
+    generate_async()/stream_async()는 ASGI 모드에서 사용하며, 기본 구현은
+    동기 메서드를 스레드에서 실행합니다.
+    """
+
+    name = 'base'
+
+    def generate(self, model_name, contents, generation_config=None, timeout=None, system_instruction=None):
+        raise NotImplementedError
+
+    def stream(self, model_name, contents, generation_config=None, timeout=None, system_instruction=None):
+        raise NotImplementedError
+
+    async def generate_async(self, model_name, contents, generation_config=None, timeout=None,
+                             system_instruction=None):
+        return await asyncio.to_thread(
+            self.generate, model_name, contents, generation_config, timeout, system_instruction)
+
+    async def stream_async(self, model_name, contents, generation_config=None, timeout=None,
+                           system_instruction=None):
+        chunks = self.stream(model_name, contents, generation_config, timeout, system_instruction)
+        done = object()
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+
+class GeminiModelClient(ModelClient):
+    """google-generativeai SDK를 사용하는 실제 클라이언트"""
+
+    name = 'gemini'
+
+    def __init__(self, api_key=None):
+        api_key = api_key or os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY 환경 변수가 설정되지 않았습니다.")
+        # SDK는 가져오는 데 오래 걸리므로 클라이언트를 처음 만들 때 가져옴
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self._models = {}
+
+    def _model(self, model_name, system_instruction=None):
+        """(모델, system instruction)별로 한 번 만든 GenerativeModel 재사용"""
+        key = (model_name, system_instruction)
+        if key not in self._models:
+            self._models[key] = self._genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        return self._models[key]
+
+    def generate(self, model_name, contents, generation_config=None, timeout=None, system_instruction=None):
+        response = self._model(model_name, system_instruction).generate_content(
+            contents,
+            generation_config=generation_config,
+            request_options={"timeout": timeout} if timeout else None
+        )
+        return self._result(model_name, response)
+
+    @staticmethod
+    def _check_finished(model_name, response):
+        """응답(또는 스트림 조각)이 출력 토큰 한도로 끊겼으면 ResponseTruncatedError"""
+        for candidate in getattr(response, 'candidates', None) or ():
+            reason = getattr(candidate, 'finish_reason', None)
+            # SDK 버전에 따라 enum 또는 정수 (MAX_TOKENS = 2)
+            if getattr(reason, 'name', reason) in ('MAX_TOKENS', 2):
+                raise ResponseTruncatedError(model_name)
+
+    @classmethod
+    def _result(cls, model_name, response):
+        # 한도에 걸리면 text가 없거나(생각 토큰으로 모두 사용) 일부만 있으므로 먼저 확인
+        cls._check_finished(model_name, response)
+        usage = getattr(response, 'usage_metadata', None)
+        return GenerateResult(
+            response.text,
+            getattr(usage, 'prompt_token_count', None),
+            getattr(usage, 'candidates_token_count', None)
+        )
+
+    def stream(self, model_name, contents, generation_config=None, timeout=None, system_instruction=None):
+        response = self._model(model_name, system_instruction).generate_content(
+            contents,
+            generation_config=generation_config,
+            stream=True,
+            request_options={"timeout": timeout} if timeout else None
+        )
+        for chunk in response:
+            self._check_finished(model_name, chunk)
+            yield chunk.text
+
+    async def generate_async(self, model_name, contents, generation_config=None, timeout=None,
+                             system_instruction=None):
+        response = await self._model(model_name, system_instruction).generate_content_async(
+            contents,
+            generation_config=generation_config,
+            request_options={"timeout": timeout} if timeout else None
+        )
+        return self._result(model_name, response)
+
+    async def stream_async(self, model_name, contents, generation_config=None, timeout=None,
+                           system_instruction=None):
+        response = await self._model(model_name, system_instruction).generate_content_async(
+            contents,
+            generation_config=generation_config,
+            stream=True,
+            request_options={"timeout": timeout} if timeout else None
+        )
+        async for chunk in response:
+            self._check_finished(model_name, chunk)
+            yield chunk.text
+
+class FakeModelError(Exception):
+    """가짜 모델이 주입한 오류 (code는 HTTP 상태 코드)"""
+
+    def __init__(self, code):
+        super().__init__(f"가짜 모델 오류 ({code})")
+        self.code = code
+
+class FakeModelClient(ModelClient):
+    """API 키 없이 사용하는 로컬 가짜 모델 (벤치마크/개발용)
+
+    지연 시간, 스트리밍 조각 크기, 오류 비율, 잘못된 평가 JSON 비율을 설정할 수 있으며,
+    평가 요청에는 평가 JSON을, 그 외 요청에는 HTML 문서를 반환합니다.
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency_ms=None, jitter_ms=None, error_rate=None, error_code=None,
+                 html_kb=None, chunk_count=None, invalid_rate=None, seed=None):
+        self.latency_ms = float(latency_ms if latency_ms is not None else os.getenv('FAKE_MODEL_LATENCY_MS', 200))
+        self.jitter_ms = float(jitter_ms if jitter_ms is not None else os.getenv('FAKE_MODEL_JITTER_MS', 50))
+        self.error_rate = float(error_rate if error_rate is not None else os.getenv('FAKE_MODEL_ERROR_RATE', 0))
+        self.error_code = int(error_code if error_code is not None else os.getenv('FAKE_MODEL_ERROR_CODE', 503))
+        self.html_kb = int(html_kb if html_kb is not None else os.getenv('FAKE_MODEL_HTML_KB', 30))
+        self.chunk_count = int(chunk_count if chunk_count is not None else os.getenv('FAKE_MODEL_CHUNKS', 20))
+        # 평가 응답 중 스키마에 맞지 않는(중간에 잘린) JSON을 반환하는 비율
+        self.invalid_rate = float(invalid_rate if invalid_rate is not None else os.getenv('FAKE_MODEL_INVALID_RATE', 0))
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def _sleep(self, seconds, timeout):
+        """지연 시뮬레이션 (timeout을 넘기면 TimeoutError)"""
+        if timeout is not None and seconds > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("가짜 모델 응답 시간 초과")
+        time.sleep(seconds)
+
+    async def _sleep_async(self, seconds, timeout):
+        if timeout is not None and seconds > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError("가짜 모델 응답 시간 초과")
+        await asyncio.sleep(seconds)
+
+    def _latency(self):
+        return max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def _maybe_fail(self):
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise FakeModelError(self.error_code)
+
+    def _respond(self, contents, generation_config=None, system_instruction=None):
+        """요청 종류에 맞는 가짜 응답 생성"""
+        text = contents if isinstance(contents, str) else json.dumps(contents, ensure_ascii=False)
+        text += system_instruction or ''
+        if '"overall_score"' in text or 'overall_score' in json.dumps(generation_config or {}):
+            score = self._random.randint(2, 5)
+            evaluation = json.dumps({
+                "overall_score": score,
+                "scores": {
+                    "relevance": score,
+                    "clarity": score,
+                    "educational_value": score,
+                    "feasibility": score
+                },
+                "feedback": "가짜 모델 평가입니다.",
+                "suggestions": ["그래프의 범위를 지정해보세요."]
+            }, ensure_ascii=False)
+            if self.invalid_rate and self._random.random() < self.invalid_rate:
+                return evaluation[:len(evaluation) // 2]
+            return evaluation
+        return self.sample_html(self.html_kb, self._random)
+
+    @staticmethod
+    def sample_html(html_kb, rng=random):
+        """크기가 html_kb 정도인 교육용 HTML 문서 생성"""
+        token = rng.randrange(1 << 30)
+        row = f'<div class="step" data-id="{token}"><span>x = {token % 97}</span> <em>y = x^2</em></div>\n'
+        body = row * max(1, html_kb * 1024 // len(row))
+        return (
+            '<!DOCTYPE html>\n<html lang="ko">\n<head>\n<meta charset="utf-8">\n'
+            '<title>이차함수 탐구</title>\n<style>\n  .step { margin: 4px; }\n</style>\n</head>\n'
+            f'<body>\n<!-- 생성된 콘텐츠 -->\n{body}'
+            '<script>\n  document.querySelectorAll(".step").forEach(function (el) {\n'
+            '    el.addEventListener("click", function () { el.classList.toggle("on"); });\n  });\n'
+            '</script>\n</body>\n</html>'
+        )
+
+    def generate(self, model_name, contents, generation_config=None, timeout=None, system_instruction=None):
+        self.calls += 1
+        self._sleep(self._latency(), timeout)
+        self._maybe_fail()
+        return self._result(model_name, contents, generation_config, system_instruction)
+
+    async def generate_async(self, model_name, contents, generation_config=None, timeout=None,
+                             system_instruction=None):
+        self.calls += 1
+        await self._sleep_async(self._latency(), timeout)
+        self._maybe_fail()
+        return self._result(model_name, contents, generation_config, system_instruction)
+
+    def _result(self, model_name, contents, generation_config, system_instruction=None):
+        text = self._respond(contents, generation_config, system_instruction)
+        self._check_limit(model_name, text, generation_config)
+        # 토큰 수는 대략 4자당 1토큰으로 추정
+        prompt_chars = len(str(contents)) + len(system_instruction or '')
+        return GenerateResult(text, prompt_chars // 4 + 1, len(text) // 4 + 1)
+
+    @staticmethod
+    def _check_limit(model_name, text, generation_config):
+        """응답이 max_output_tokens를 넘으면 실제 모델처럼 MAX_TOKENS로 실패"""
+        limit = (generation_config or {}).get('max_output_tokens')
+        if limit and len(text) // 4 + 1 > limit:
+            raise ResponseTruncatedError(model_name)
+
+    def _chunks(self, contents, generation_config, system_instruction=None):
+        """(조각, 조각당 지연 시간) 목록"""
+        text = self._respond(contents, generation_config, system_instruction)
+        size = max(1, len(text) // self.chunk_count + 1)
+        delay = self._latency() / self.chunk_count
+        return [text[i:i + size] for i in range(0, len(text), size)], delay
+
+    def stream(self, model_name, contents, generation_config=None, timeout=None, system_instruction=None):
+        self.calls += 1
+        chunks, delay = self._chunks(contents, generation_config, system_instruction)
+        started = time.monotonic()
+        for chunk in chunks:
+            remaining = None if timeout is None else timeout - (time.monotonic() - started)
+            self._sleep(delay, remaining)
+            self._maybe_fail()
+            yield chunk
+        # 실제 모델과 같이 마지막 조각의 finish_reason으로 한도 초과를 알림
+        self._check_limit(model_name, ''.join(chunks), generation_config)
+
+    async def stream_async(self, model_name, contents, generation_config=None, timeout=None,
+                           system_instruction=None):
+        self.calls += 1
+        chunks, delay = self._chunks(contents, generation_config, system_instruction)
+        started = time.monotonic()
+        for chunk in chunks:
+            remaining = None if timeout is None else timeout - (time.monotonic() - started)
+            await self._sleep_async(delay, remaining)
+            self._maybe_fail()
+            yield chunk
+        # 실제 모델과 같이 마지막 조각의 finish_reason으로 한도 초과를 알림
+        self._check_limit(model_name, ''.join(chunks), generation_config)
+
+def create_model_client():
+    """GEMINI_BACKEND 환경 변수에 따라 클라이언트 생성 (gemini 또는 fake)"""
+    backend = os.getenv('GEMINI_BACKEND', 'gemini').lower()
+    if backend == 'fake':
+        return FakeModelClient()
+    if backend != 'gemini':
+        raise ValueError(f"알 수 없는 GEMINI_BACKEND입니다: {backend}")
+    return GeminiModelClient()
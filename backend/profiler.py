@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import uuid
+import pstats
+import random
+import cProfile
+import logging
+import threading
+from functools import wraps
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 쿼리 계획을 확인할 SQL 문 (BEGIN/COMMIT/PRAGMA 등은 제외)
+EXPLAINABLE_PREFIXES = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+# 느린 쿼리 하나에 기록하는 최대 SQL 문 수와 SQL 길이
+MAX_STATEMENTS = 20
+MAX_SQL_CHARS = 2000
+# cProfile 요약에 포함하는 함수 수 (누적 시간 순)
+TOP_FUNCTIONS = 15
+
+class Profiler:
+    """요청 단위 프로파일링 (PROFILE_ENABLED=1일 때만 동작)
+
+    - 요청마다 단계별 시간(db, decode, gemini, serialize, compress, other)을 측정하고,
+      PROFILE_SLOW_REQUEST_MS 이상 걸린 요청은 추적 기록(JSON)을 남깁니다.
+    - X-Profile: 1 헤더가 있거나 PROFILE_SAMPLE_RATE 비율로 뽑힌 요청은 cProfile로 실행하고
+      결과를 .prof 파일(pstats 형식)로 저장합니다.
+    - Database 메서드가 PROFILE_SLOW_QUERY_MS 이상 걸리면 실행한 SQL과 EXPLAIN QUERY PLAN을
+      요청 추적 기록에 포함합니다 (요청 밖의 작업 스레드에서는 따로 기록).
+    - 기록은 PROFILE_DIR에 저장하고 파일 수가 PROFILE_MAX_FILES를 넘으면 오래된 것부터 지웁니다.
+
+    단계 시간은 겹치지 않도록 측정합니다 (db 안의 decode 시간은 db에 포함하지 않음).
+    Flask 라우트만 측정하며, 스트리밍 응답은 헤더를 보낼 때까지의 시간입니다.
+    """
+
+    HEADER = 'X-Profile'
+
+    def __init__(self, enabled=None, sample_rate=None, slow_request_ms=None, slow_query_ms=None,
+                 output_dir=None, max_files=None):
+        self.enabled = (os.getenv('PROFILE_ENABLED', '0') == '1') if enabled is None else enabled
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+        self.slow_request_ms = slow_request_ms if slow_request_ms is not None else float(
+            os.getenv('PROFILE_SLOW_REQUEST_MS', 1000))
+        self.slow_query_ms = slow_query_ms if slow_query_ms is not None else float(
+            os.getenv('PROFILE_SLOW_QUERY_MS', 100))
+        self.output_dir = output_dir or os.getenv('PROFILE_DIR', 'profiles')
+        self.max_files = max_files if max_files is not None else int(os.getenv('PROFILE_MAX_FILES', 200))
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    # 단계별 시간 측정
+
+    def phase(self, name):
+        """with 블록의 시간을 현재 요청의 name 단계로 기록 (추적 중인 요청이 없으면 아무것도 하지 않음)"""
+        return _Phase(self, name)
+
+    def timed(self, name):
+        """함수 실행 시간을 name 단계로 기록하는 데코레이터 (비활성화 상태면 함수를 그대로 반환)"""
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _Phase(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def _enter(self, name):
+        trace = getattr(self._local, 'trace', None)
+        if trace is None:
+            return None
+        now = time.perf_counter()
+        if trace.stack:
+            parent = trace.stack[-1]
+            trace.phases[parent] = trace.phases.get(parent, 0.0) + now - trace.mark
+        trace.stack.append(name)
+        trace.mark = now
+        return trace
+
+    @staticmethod
+    def _exit(trace):
+        now = time.perf_counter()
+        name = trace.stack.pop()
+        trace.phases[name] = trace.phases.get(name, 0.0) + now - trace.mark
+        trace.mark = now
+
+    # 요청 추적
+
+    def start_request(self, header_value=None):
+        """요청 시작 (헤더나 표본 추출로 선택되면 cProfile 시작)"""
+        if not self.enabled:
+            return
+        trace = _Trace()
+        if header_value == '1' or (self.sample_rate > 0 and random.random() < self.sample_rate):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                trace.profile = profile
+            except ValueError:
+                # 다른 프로파일러가 실행 중 (Python 3.12 이상은 동시에 하나만 가능)
+                pass
+        self._local.trace = trace
+
+    def finish_request(self, method, path, route, status):
+        """요청 종료 (느린 요청이거나 cProfile로 실행했거나 느린 쿼리가 있으면 기록, 기록 이름 반환)"""
+        trace = getattr(self._local, 'trace', None)
+        if trace is None:
+            return None
+        self._local.trace = None
+        if trace.profile:
+            trace.profile.disable()
+        duration = time.perf_counter() - trace.started
+        if not (trace.profile or trace.queries or duration * 1000 >= self.slow_request_ms):
+            return None
+
+        phases = {name: round(seconds * 1000, 3) for name, seconds in trace.phases.items()}
+        phases['other'] = round(max(0.0, duration * 1000 - sum(phases.values())), 3)
+        record = {
+            "kind": "request",
+            "method": method,
+            "path": path,
+            "route": route,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "phases": phases,
+            "slow_queries": trace.queries
+        }
+        if trace.profile:
+            record["top_functions"] = _top_functions(trace.profile)
+        name = self._write(record, trace.profile)
+        if duration * 1000 >= self.slow_request_ms:
+            logger.warning("느린 요청 %s %s %.1fms %s", method, path, duration * 1000, phases)
+        return name
+
+    def abandon_request(self):
+        """finish_request 없이 끝난 요청 정리 (처리되지 않은 예외 등)"""
+        trace = getattr(self._local, 'trace', None)
+        self._local.trace = None
+        if trace is not None and trace.profile:
+            trace.profile.disable()
+
+    # 느린 쿼리
+
+    def observe_query(self, db, method):
+        """Database 메서드 실행을 db 단계로 기록하고 느리면 SQL과 쿼리 계획 수집 (instrument_methods의 observer)"""
+        return _QueryObservation(self, db, method)
+
+    def record_statement(self, sql):
+        """sqlite3 trace callback: 관찰 중인 Database 메서드가 실행한 SQL 수집"""
+        statements = getattr(self._local, 'statements', None)
+        if statements is not None and len(statements) < MAX_STATEMENTS and sql not in statements:
+            statements.append(sql)
+
+    def _slow_query(self, db, method, seconds, statements):
+        """느린 Database 메서드의 SQL과 EXPLAIN QUERY PLAN 기록"""
+        query = {
+            "method": method,
+            "duration_ms": round(seconds * 1000, 3),
+            "statements": [
+                {"sql": sql[:MAX_SQL_CHARS], "plan": self._explain(db, sql)}
+                for sql in statements if not sql.startswith('--')
+            ]
+        }
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace.queries.append(query)
+        else:
+            self._write({"kind": "query", **query})
+
+    @staticmethod
+    def _explain(db, sql):
+        if not sql.lstrip().upper().startswith(EXPLAINABLE_PREFIXES):
+            return None
+        try:
+            return db.explain_query_plan(sql)
+        except Exception as e:
+            return f"EXPLAIN 실패: {e}"
+
+    # 기록 파일
+
+    def _write(self, record, profile=None):
+        """추적 기록(JSON)과 cProfile 결과(.prof)를 저장하고 오래된 파일 정리 (기록 이름 반환)"""
+        now = time.time()
+        # 이름 순서가 기록 시각 순서가 되도록 시각으로 시작
+        name = (time.strftime('%Y%m%d-%H%M%S', time.localtime(now))
+                + f"-{int(now * 1000) % 1000:03d}-{uuid.uuid4().hex[:6]}")
+        record = {"name": name, "recorded_at": round(now, 3), **record}
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            if profile:
+                profile.dump_stats(os.path.join(self.output_dir, name + '.prof'))
+                record["profile"] = name + '.prof'
+            with open(os.path.join(self.output_dir, name + '.json'), 'w', encoding='utf-8') as f:
+                json.dump(record, f, ensure_ascii=False)
+            self._rotate()
+        except OSError as e:
+            logger.warning("프로파일 기록 실패: %s", e)
+            return None
+        metrics.inc('aiedap_profile_traces_total', {"kind": record["kind"], "profiled": bool(profile)})
+        return name
+
+    def _rotate(self):
+        """파일 수가 max_files를 넘으면 이름(기록 시각) 순으로 오래된 것부터 삭제"""
+        with self._write_lock:
+            names = sorted(entry.name for entry in os.scandir(self.output_dir)
+                           if entry.name.endswith(('.json', '.prof')))
+            for name in names[:max(0, len(names) - self.max_files)]:
+                try:
+                    os.remove(os.path.join(self.output_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    def recent(self, limit=20, kind=None):
+        """최근 추적 기록 목록 (최신순)"""
+        try:
+            names = sorted((name for name in os.listdir(self.output_dir) if name.endswith('.json')), reverse=True)
+        except FileNotFoundError:
+            return []
+        records = []
+        for name in names:
+            try:
+                with open(os.path.join(self.output_dir, name), encoding='utf-8') as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                # 정리 중 삭제되었거나 쓰는 중인 파일
+                continue
+            if kind and record.get('kind') != kind:
+                continue
+            records.append(record)
+            if len(records) >= limit:
+                break
+        return records
+
+class _Trace:
+    __slots__ = ('started', 'mark', 'phases', 'stack', 'queries', 'profile')
+
+    def __init__(self):
+        self.started = self.mark = time.perf_counter()
+        self.phases = {}
+        self.stack = []
+        self.queries = []
+        self.profile = None
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'trace')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.trace = None
+
+    def __enter__(self):
+        self.trace = self.profiler._enter(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace is not None:
+            self.profiler._exit(self.trace)
+        return False
+
+class _QueryObservation:
+    """가장 바깥 Database 메서드 호출 동안 실행한 SQL을 모으고 느리면 기록"""
+
+    __slots__ = ('profiler', 'db', 'method', 'phase', 'started', 'outermost')
+
+    def __init__(self, profiler, db, method):
+        self.profiler = profiler
+        self.db = db
+        self.method = method
+        self.phase = _Phase(profiler, 'db')
+
+    def __enter__(self):
+        local = self.profiler._local
+        self.outermost = getattr(local, 'statements', None) is None
+        if self.outermost:
+            local.statements = []
+        self.started = time.perf_counter()
+        self.phase.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self.phase.__exit__(*exc)
+        if not self.outermost:
+            return False
+        local = self.profiler._local
+        statements, local.statements = local.statements, None
+        seconds = time.perf_counter() - self.started
+        if seconds * 1000 >= self.profiler.slow_query_ms:
+            self.profiler._slow_query(self.db, self.method, seconds, statements)
+        return False
+
+def _top_functions(profile):
+    """cProfile 결과에서 누적 시간이 큰 함수 목록"""
+    stats = pstats.Stats(profile).stats
+    ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    return [
+        {
+            # 같은 이름의 모듈(flask/app.py와 app.py 등)을 구분하도록 상위 디렉터리까지 표시
+            "function": f"{os.path.join(os.path.basename(os.path.dirname(filename)), os.path.basename(filename))}"
+                        f":{line}({name})",
+            "calls": calls,
+            "total_ms": round(total * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3)
+        }
+        for (filename, line, name), (_, calls, total, cumulative, _) in ranked
+    ]
+
+profiler = Profiler()
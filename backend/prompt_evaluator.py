@@ -1,68 +1,183 @@
-import json
-import re
+import asyncio
+from evaluation_result import EvaluationParseError, EvaluationResult
+from metrics import metrics
 
 class PromptEvaluator:
-    def __init__(self, gemini_service):
+    def __init__(self, gemini_service, cache=None, prescreen=None):
         self.gemini_service = gemini_service
+        self.cache = cache
+        # 명확한 경우 모델 호출 없이 평가하는 로컬 사전 검사 (PromptPrescreen)
+        self.prescreen = prescreen
+
+    def evaluate(self, prompt, student_name="", force=False, throttle=None):
+        """프롬프트를 평가하고 구조화된 결과 반환
+
+        사전 검사로 판단할 수 있거나 같은 프롬프트의 평가 결과가 캐시에 있으면 API를 호출하지 않습니다.
+        force=True이면 캐시와 중복 검사를 건너뛰고 다시 평가합니다.
+        throttle이 있으면 API를 호출하기 직전에 호출합니다 (일괄 평가의 호출 속도 제한).
+        """
+        cache_key, cached = self._before_model(prompt, student_name, force)
+        if cached:
+            return cached
 
-    def evaluate(self, prompt, student_name=""):
-        """프롬프트를 평가하고 구조화된 결과 반환"""
         try:
-            raw_response = self.gemini_service.evaluate_prompt(prompt, student_name)
-            
-            # JSON 추출 시도
-            evaluation = self._parse_evaluation_response(raw_response)
-            
-            # 기본값 설정
-            default_evaluation = {
-                "overall_score": 3,
-                "scores": {
-                    "relevance": 3,
-                    "clarity": 3,
-                    "educational_value": 3,
-                    "feasibility": 3
-                },
-                "feedback": "프롬프트를 평가했습니다.",
-                "suggestions": ["더 구체적인 설명을 추가해보세요."],
-                "is_appropriate": True
-            }
-            
-            # 파싱된 결과와 기본값 병합
-            if evaluation:
-                default_evaluation.update(evaluation)
-            
-            # 적절성 판단 (overall_score 3 이상이면 적절)
-            default_evaluation["is_appropriate"] = default_evaluation.get("overall_score", 3) >= 3
-            
-            return default_evaluation
-            
+            if throttle:
+                throttle()
+            response = self.gemini_service.evaluate_prompt(prompt, student_name)
+            result, errors = self._parse(response, 'first')
+            repaired = result is None
+            if repaired:
+                # 스키마에 맞지 않으면 문제를 알려주고 한 번만 다시 요청
+                if throttle:
+                    throttle()
+                response = self._repair(prompt, response, errors)
+                result, errors = self._parse(response, 'repair')
+            evaluation = self._build_evaluation(response, result, errors, repaired)
+            self._store_cache(cache_key, evaluation, response)
+            return evaluation
         except Exception as e:
-            # 오류 발생 시 기본 평가 반환
-            return {
-                "overall_score": 3,
-                "scores": {
-                    "relevance": 3,
-                    "clarity": 3,
-                    "educational_value": 3,
-                    "feasibility": 3
-                },
-                "feedback": f"평가 중 오류가 발생했습니다: {str(e)}",
-                "suggestions": ["프롬프트를 다시 확인해주세요."],
-                "is_appropriate": True
+            return self._error_evaluation(e)
+
+    async def evaluate_async(self, prompt, student_name="", force=False, executor=None):
+        """evaluate의 비동기 버전 (사전 검사와 캐시 조회/저장은 executor에서 실행)"""
+        loop = asyncio.get_running_loop()
+        cache_key, cached = await loop.run_in_executor(
+            executor, self._before_model, prompt, student_name, force)
+        if cached:
+            return cached
+
+        try:
+            response = await self.gemini_service.evaluate_prompt_async(prompt, student_name)
+            result, errors = self._parse(response, 'first')
+            repaired = result is None
+            if repaired:
+                response = await self._repair_async(prompt, response, errors)
+                result, errors = self._parse(response, 'repair')
+            evaluation = self._build_evaluation(response, result, errors, repaired)
+            await loop.run_in_executor(executor, self._store_cache, cache_key, evaluation, response)
+            return evaluation
+        except Exception as e:
+            return self._error_evaluation(e)
+
+    def _before_model(self, prompt, student_name="", force=False):
+        """사전 검사 후 캐시 조회 ((캐시 키, 즉시 반환할 평가) 반환)"""
+        if self.prescreen:
+            screened = self.prescreen.screen(prompt, student_name, force)
+            if screened:
+                return None, screened
+        return self._lookup_cache(prompt, force)
+
+    def _lookup_cache(self, prompt, force=False):
+        """(캐시 키, 캐시된 평가) 반환 (캐시를 사용하지 않으면 키는 None)"""
+        if not (self.cache and self.cache.enabled):
+            return None, None
+        cache_key = self.cache.make_key(
+            prompt,
+            self.gemini_service.model_name,
+            self.gemini_service.EVALUATION_TEMPLATE_VERSION
+        )
+        if force:
+            self.cache.record_bypass()
+            return cache_key, None
+        cached = self.cache.get(cache_key)
+        if cached:
+            cached["served_by"] = {
+                "path": "cache",
+                "model": cached.get("served_by", {}).get("model")
             }
+        return cache_key, cached
 
-    def _parse_evaluation_response(self, response_text):
-        """Gemini 응답에서 JSON 추출"""
+    def _store_cache(self, cache_key, evaluation, response):
+        """기본 모델이 정상적으로 평가한 결과만 캐시"""
+        if cache_key and evaluation["served_by"]["path"] == 'primary':
+            self.cache.put(cache_key, evaluation, self.gemini_service.model_name)
+
+    def _parse(self, response, attempt):
+        """응답을 평가 스키마로 검증 ((EvaluationResult, None) 또는 (None, 문제 목록)), 결과는 지표로 기록"""
+        try:
+            result = EvaluationResult.from_json(response.text)
+        except EvaluationParseError as e:
+            self._count(attempt, 'invalid')
+            return None, e.errors
+        self._count(attempt, 'valid')
+        return result, None
+
+    def _repair(self, prompt, response, errors):
+        """복구 요청 (호출 자체가 실패하면 지표에 기록하고 예외 전달)"""
+        try:
+            return self.gemini_service.repair_evaluation(prompt, response.text, errors)
+        except Exception:
+            self._count('repair', 'error')
+            raise
+
+    async def _repair_async(self, prompt, response, errors):
+        """_repair의 비동기 버전"""
         try:
-            # JSON 코드 블록 찾기
-            json_match = re.search(r'\{[\s\S]*\}', response_text)
-            if json_match:
-                json_str = json_match.group(0)
-                return json.loads(json_str)
-            
-            # 직접 JSON 파싱 시도
-            return json.loads(response_text)
-        except:
-            # 파싱 실패 시 None 반환
-            return None
+            return await self.gemini_service.repair_evaluation_async(prompt, response.text, errors)
+        except Exception:
+            self._count('repair', 'error')
+            raise
+
+    def _build_evaluation(self, response, result, errors=None, repaired=False):
+        """검증한 평가 결과에 응답을 처리한 경로를 붙여 반환 (복구도 실패하면 기본 평가)"""
+        if result is None:
+            return self._default_evaluation(
+                "프롬프트를 평가했습니다.",
+                ["더 구체적인 설명을 추가해보세요."],
+                {"path": "default", "model": response.model,
+                 "reason": "응답을 해석하지 못했습니다: " + '; '.join(errors or [])}
+            )
+        evaluation = result.to_dict()
+        evaluation["served_by"] = response.served_by()
+        if repaired:
+            evaluation["served_by"]["repaired"] = True
+        return evaluation
+
+    @classmethod
+    def _error_evaluation(cls, error):
+        """오류 발생 시 기본 평가"""
+        return cls._default_evaluation(
+            f"평가 중 오류가 발생했습니다: {str(error)}",
+            ["프롬프트를 다시 확인해주세요."],
+            {"path": "default", "model": None, "reason": str(error)}
+        )
+
+    @staticmethod
+    def _default_evaluation(feedback, suggestions, served_by):
+        """모델 평가를 사용할 수 없을 때의 기본 평가 (모든 점수 3)"""
+        return {
+            "overall_score": 3,
+            "scores": {
+                "relevance": 3,
+                "clarity": 3,
+                "educational_value": 3,
+                "feasibility": 3
+            },
+            "feedback": feedback,
+            "suggestions": suggestions,
+            "is_appropriate": True,
+            "served_by": served_by
+        }
+
+    def parse_stats(self):
+        """평가 응답 검증 실패율과 복구 성공률 (프로세스 단위)"""
+        counters = metrics.snapshot()["counters"]
+        counts = {
+            (attempt, result): counters.get(
+                ('aiedap_evaluation_parse_total', (('attempt', attempt), ('result', result))), 0)
+            for attempt in ('first', 'repair') for result in ('valid', 'invalid', 'error')
+        }
+        first = counts[('first', 'valid')] + counts[('first', 'invalid')]
+        repairs = sum(counts[('repair', result)] for result in ('valid', 'invalid', 'error'))
+        return {
+            "responses": first,
+            "invalid": counts[('first', 'invalid')],
+            "invalid_rate": round(counts[('first', 'invalid')] / first, 4) if first else 0.0,
+            "repairs": repairs,
+            "repaired": counts[('repair', 'valid')],
+            "repair_rate": round(counts[('repair', 'valid')] / repairs, 4) if repairs else 0.0
+        }
 
+    @staticmethod
+    def _count(attempt, result):
+        metrics.inc('aiedap_evaluation_parse_total', {"attempt": attempt, "result": result})
@@ -0,0 +1,192 @@
+import os
+import re
+import unicodedata
+from metrics import metrics
+
+# 교육과정 영역별 수학 용어 (한 글자 용어는 다른 단어와 겹치므로 제외)
+MATH_LEXICON = {
+    "수와 연산": (
+        "자연수", "정수", "유리수", "무리수", "실수", "분수", "소수", "약수", "배수", "소인수",
+        "덧셈", "뺄셈", "곱셈", "나눗셈", "사칙연산", "계산", "연산", "비율", "비례", "백분율",
+        "제곱", "제곱근", "거듭제곱", "어림", "자릿값",
+    ),
+    "문자와 식": (
+        "방정식", "부등식", "일차식", "이차식", "다항식", "인수분해", "미지수", "등식", "항등식",
+        "연립", "식의 값", "전개",
+    ),
+    "함수": (
+        "함수", "그래프", "좌표", "기울기", "절편", "꼭짓점", "포물선", "대칭", "평행이동",
+        "지수", "로그", "삼각함수", "사인", "코사인", "탄젠트", "정의역", "치역",
+    ),
+    "기하": (
+        "도형", "삼각형", "사각형", "다각형", "평행사변형", "사다리꼴", "마름모", "넓이", "둘레",
+        "부피", "겉넓이", "각도", "직각", "평행선", "수직", "합동", "닮음", "피타고라스", "작도",
+        "입체", "정육면체", "직육면체", "원기둥", "원뿔", "원주율", "반지름", "지름", "벡터",
+        "대각선", "꼭지점", "전개도", "회전체",
+    ),
+    "확률과 통계": (
+        "확률", "통계", "평균", "분산", "표준편차", "중앙값", "최빈값", "도수", "히스토그램",
+        "경우의 수", "순열", "조합", "상대도수", "산점도", "상관관계", "자료",
+    ),
+    "해석": (
+        "수열", "등차", "등비", "급수", "극한", "미분", "적분", "도함수", "접선", "증가", "감소",
+        "극대", "극소",
+    ),
+    "영문": (
+        "math", "function", "graph", "equation", "fraction", "geometry", "triangle", "probability",
+        "statistics", "algebra", "calculus", "vector", "matrix", "integral", "derivative",
+    ),
+}
+MATH_SYMBOLS = re.compile(r'[0-9=+\-*/^²³√π∑∫<>≤≥%]|\b[xyz]\b')
+# 중복 프롬프트에 다시 사용하는 평가의 served_by.path (PromptEvaluator가 캐시에 저장하는 기준과 동일,
+# 오류/대체 모델/사전 검사 결과는 제외)
+REUSABLE_PATHS = ('primary', 'cache')
+
+class PromptPrescreen:
+    """모델을 호출하기 전에 명확한 경우를 로컬 규칙으로 평가
+
+    너무 짧거나 긴 프롬프트, 같은 학생의 최근 프롬프트와 거의 같은 프롬프트는 즉시 평가
+    결과를 반환하고, 나머지는 모델 평가로 넘깁니다. 수학 용어 사전에 없는 단어만 쓴 프롬프트도
+    수학 내용일 수 있으므로, 관련도가 낮은 프롬프트를 거부하는 규칙(off_topic)은
+    PRESCREEN_OFF_TOPIC=1일 때만 적용합니다.
+    """
+
+    def __init__(self, db=None, enabled=None, min_length=None, max_length=None,
+                 min_relevance=None, duplicate_threshold=None, recent_limit=None, lexicon=None,
+                 off_topic=None):
+        self.db = db
+        self.enabled = (os.getenv('PRESCREEN_ENABLED', '1') != '0') if enabled is None else enabled
+        self.min_length = min_length if min_length is not None else int(os.getenv('PRESCREEN_MIN_LENGTH', 8))
+        self.max_length = max_length if max_length is not None else int(os.getenv('PRESCREEN_MAX_LENGTH', 2000))
+        self.off_topic = (os.getenv('PRESCREEN_OFF_TOPIC', '0') == '1') if off_topic is None else off_topic
+        self.min_relevance = min_relevance if min_relevance is not None else float(
+            os.getenv('PRESCREEN_MIN_RELEVANCE', 0.1))
+        self.duplicate_threshold = duplicate_threshold if duplicate_threshold is not None else float(
+            os.getenv('PRESCREEN_DUPLICATE_THRESHOLD', 0.9))
+        self.recent_limit = recent_limit if recent_limit is not None else int(
+            os.getenv('PRESCREEN_RECENT_PROMPTS', 20))
+        self.lexicon = lexicon or MATH_LEXICON
+        extra = [term.strip() for term in os.getenv('PRESCREEN_EXTRA_TERMS', '').split(',') if term.strip()]
+        if extra:
+            self.lexicon = {**self.lexicon, "추가": tuple(extra)}
+
+    @staticmethod
+    def normalize(prompt):
+        """유니코드 정규화, 공백 정리, 소문자 변환"""
+        prompt = unicodedata.normalize('NFKC', prompt or '')
+        return re.sub(r'\s+', ' ', prompt).strip().lower()
+
+    def relevance(self, text):
+        """수학 관련도 (0~1): 영역 수, 용어 수, 수식 기호 여부를 합산
+
+        (관련도, 찾은 용어 목록)을 반환합니다.
+        """
+        terms = []
+        domains = 0
+        for words in self.lexicon.values():
+            found = [word for word in words if word in text]
+            if found:
+                domains += 1
+                terms.extend(found)
+        score = min(domains, 2) * 0.3 + min(len(terms), 3) * 0.1
+        if MATH_SYMBOLS.search(text):
+            score += 0.2
+        return round(min(score, 1.0), 2), terms
+
+    def screen(self, prompt, student_name="", force=False):
+        """즉시 평가할 수 있으면 평가 결과, 모델 평가가 필요하면 None 반환
+
+        force=True이면 최근 프롬프트 중복 검사를 건너뜁니다 (재평가 요청).
+        """
+        if not self.enabled:
+            return None
+        text = self.normalize(prompt)
+
+        if len(text) < self.min_length:
+            return self._answer('too_short', 1, "프롬프트가 너무 짧습니다. 만들고 싶은 수학 콘텐츠를 구체적으로 설명해주세요.", [
+                "어떤 수학 개념을 다루는지 적어보세요.",
+                "학생이 콘텐츠에서 무엇을 조작하거나 관찰하는지 설명해보세요.",
+            ])
+        if len(text) > self.max_length:
+            return self._answer('too_long', 2, f"프롬프트가 너무 깁니다 ({self.max_length}자 이하로 줄여주세요).", [
+                "핵심 수학 개념과 원하는 활동 위주로 요약해보세요.",
+            ])
+
+        if self.off_topic:
+            score, terms = self.relevance(text)
+            if score < self.min_relevance:
+                return self._answer('off_topic', 1, "수학 학습 내용과의 연관성을 찾기 어렵습니다.", [
+                    "다루고 싶은 수학 개념(예: 이차함수, 삼각형의 넓이, 확률)을 포함해보세요.",
+                ], relevance=score)
+
+        if not force and student_name and self.db is not None:
+            duplicate = self._find_duplicate(text, student_name)
+            if duplicate:
+                return duplicate
+
+        self._count('escalated')
+        return None
+
+    def _find_duplicate(self, text, student_name):
+        """같은 학생의 최근 프롬프트 중 거의 같은 것이 있으면 그 평가 결과 반환"""
+        grams = _trigrams(text)
+        for project in self.db.get_recent_prompts(student_name, self.recent_limit):
+            evaluation = project.get('evaluation')
+            if not isinstance(evaluation, dict) or 'overall_score' not in evaluation:
+                continue
+            served_by = evaluation.get('served_by')
+            if not isinstance(served_by, dict) or served_by.get('path') not in REUSABLE_PATHS:
+                continue
+            similarity = _jaccard(grams, _trigrams(self.normalize(project['prompt'])))
+            if similarity >= self.duplicate_threshold:
+                self._count('duplicate')
+                return {
+                    **evaluation,
+                    "served_by": {
+                        "path": "prescreen",
+                        "rule": "duplicate",
+                        "duplicate_of": project['id'],
+                        "similarity": round(similarity, 3)
+                    }
+                }
+        return None
+
+    def _answer(self, rule, score, feedback, suggestions, relevance=None):
+        """기존 평가 결과 형식의 즉시 평가"""
+        self._count(rule)
+        served_by = {"path": "prescreen", "rule": rule}
+        if relevance is not None:
+            served_by["relevance_score"] = relevance
+        return {
+            "overall_score": score,
+            "scores": {
+                "relevance": 1 if rule == 'off_topic' else score,
+                "clarity": score,
+                "educational_value": score,
+                "feasibility": score
+            },
+            "feedback": feedback,
+            "suggestions": suggestions,
+            "is_appropriate": score >= 3,
+            "served_by": served_by
+        }
+
+    def stats(self):
+        """규칙별 처리 수와 절약한 모델 호출 수 (프로세스 단위)"""
+        counters = metrics.snapshot()["counters"]
+        rules = ('too_short', 'too_long', 'off_topic', 'duplicate', 'escalated')
+        stats = {rule: counters.get(('aiedap_prescreen_total', (('rule', rule),)), 0) for rule in rules}
+        stats['saved_calls'] = sum(stats[rule] for rule in rules if rule != 'escalated')
+        return stats
+
+    @staticmethod
+    def _count(rule):
+        metrics.inc('aiedap_prescreen_total', {"rule": rule})
+
+def _trigrams(text):
+    """공백과 문장 부호를 제외한 글자 3-gram 집합"""
+    text = re.sub(r'[\W_]+', '', text)
+    return {text[i:i + 3] for i in range(max(1, len(text) - 2))}
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
@@ -0,0 +1,159 @@
+import asyncio
+import random
+import threading
+import time
+
+# 일시적인 오류로 보고 재시도하는 HTTP 상태 코드 (google.api_core 예외의 code 속성)
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """서킷 브레이커가 열려 있어 호출하지 않음"""
+
+class DeadlineExceededError(Exception):
+    """지연 시간 예산 초과"""
+
+def is_retryable(error):
+    """재시도할 가치가 있는 일시적 오류인지 판단"""
+    if isinstance(error, (TimeoutError, ConnectionError, DeadlineExceededError)):
+        return True
+    return getattr(error, 'code', None) in RETRYABLE_STATUS_CODES
+
+def is_timeout(error):
+    """시간 초과 오류인지 판단 (재시도 대신 빠른 모델로 전환)"""
+    return isinstance(error, (TimeoutError, DeadlineExceededError)) or getattr(error, 'code', None) in (408, 504)
+
+class CircuitBreaker:
+    """연속 실패가 기준을 넘으면 일정 시간 호출을 차단
+
+    closed: 정상 호출, open: 즉시 실패, half_open: 재개 시간이 지나 한 번만 시험 호출
+    시험 호출이 결과 없이 끝나지 않으면 reset_timeout 뒤에 새 시험 호출을 허용합니다.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._probe_started = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """호출 가능 여부 확인 (불가능하면 CircuitOpenError)"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return
+            if state == 'half_open' and (
+                    not self._probing or time.monotonic() - self._probe_started >= self.reset_timeout):
+                self._probing = True
+                self._probe_started = time.monotonic()
+                return
+        raise CircuitOpenError(f"{self.name} 호출이 일시적으로 차단되었습니다")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """결과 없이 중단된 호출 정리 (취소, 클라이언트 연결 종료 등은 성공/실패로 집계하지 않고 시험 호출 자리만 반환)"""
+        with self._lock:
+            self._probing = False
+
+def retry_call(fn, deadline, max_retries=2, base_delay=0.5, max_delay=8.0):
+    """일시적 오류에 대해 지터가 있는 지수 백오프로 재시도
+
+    fn(timeout)은 남은 시간을 인자로 받아 호출됩니다. deadline(time.monotonic 기준)을
+    넘기면 DeadlineExceededError를 발생시킵니다. (결과, 시도 횟수)를 반환합니다.
+    """
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError("지연 시간 예산을 초과했습니다")
+        attempt += 1
+        try:
+            return fn(remaining), attempt
+        except Exception as e:
+            delay = _retry_delay(e, attempt, deadline, max_retries, base_delay, max_delay)
+            if delay is None:
+                raise
+            time.sleep(delay)
+
+async def retry_call_async(fn, deadline, max_retries=2, base_delay=0.5, max_delay=8.0):
+    """retry_call의 비동기 버전 (fn(timeout)은 코루틴 함수)"""
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError("지연 시간 예산을 초과했습니다")
+        attempt += 1
+        try:
+            return await fn(remaining), attempt
+        except Exception as e:
+            delay = _retry_delay(e, attempt, deadline, max_retries, base_delay, max_delay)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+
+def _retry_delay(error, attempt, deadline, max_retries, base_delay, max_delay):
+    """다음 시도까지 기다릴 시간 (재시도하지 않아야 하면 None)"""
+    if attempt > max_retries or is_timeout(error) or not is_retryable(error):
+        return None
+    # full jitter: 0 ~ min(max_delay, base_delay * 2^n)
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+    if time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+class RateLimiter:
+    """토큰 버킷 방식의 호출 속도 제한
+
+    초당 rate개씩 토큰이 채워지고 최대 burst개까지 쌓입니다. rate가 0 이하이면 제한하지 않습니다.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def acquire(self):
+        """토큰을 하나 얻을 때까지 대기 (기다린 시간(초) 반환)"""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,44 @@
+import os
+import threading
+from collections import OrderedDict
+
+class ResponseCache:
+    """읽기 응답 캐시 (변경 카운터 기준 무효화, LRU 크기 제한)
+
+    항목은 저장 당시의 변경 카운터와 함께 보관되며, 카운터가 바뀌면 더 이상 사용하지 않습니다.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries or int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 256))
+        self.max_bytes = max_bytes or int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key, version):
+        """version에 해당하는 (본문, 상태 코드, mimetype) 반환 (없거나 오래되면 None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != version:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1:]
+
+    def put(self, key, version, body, status, mimetype):
+        """응답 저장 후 크기 제한을 넘는 오래된 항목 삭제"""
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, body, status, mimetype)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry[1])
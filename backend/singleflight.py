@@ -0,0 +1,79 @@
+import asyncio
+import threading
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """같은 키로 동시에 들어온 호출을 하나로 합쳐 결과를 공유
+
+    먼저 들어온 호출만 실제로 실행하고, 실행 중에 들어온 같은 키의 호출은
+    그 결과(또는 예외)를 그대로 받습니다. 완료된 결과는 보관하지 않습니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """key에 대한 실행 중인 호출이 있으면 기다렸다가 결과 공유, 없으면 fn 실행"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class AsyncSingleFlight:
+    """SingleFlight의 asyncio 버전 (하나의 이벤트 루프 안에서 사용)
+
+    호출은 별도 태스크로 실행되므로 기다리던 요청 하나가 취소되어도
+    같은 결과를 기다리는 다른 요청에는 영향이 없습니다.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        """key에 대한 실행 중인 호출이 있으면 기다렸다가 결과 공유, 없으면 fn() 태스크 실행"""
+        task = self._calls.get(key)
+        if task is None:
+            self.executed += 1
+            task = self._calls[key] = asyncio.ensure_future(fn(*args, **kwargs))
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 기다리는 요청이 모두 취소된 경우 "exception was never retrieved" 경고 방지
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,23 @@
+from html_minifier import HtmlMinifier
+
+minifier = HtmlMinifier(enabled=True)
+
+def test_collapses_whitespace_between_tags():
+    html = '<div>\n\n   <p>a    b</p>   <p>c</p>\n</div>'
+    assert minifier.minify(html) == '<div>\n<p>a b</p> <p>c</p>\n</div>'
+
+def test_removes_comments_but_keeps_conditional_comments():
+    html = '<p>a</p><!-- 설명 --><!--[if IE]><p>ie</p><![endif]-->'
+    assert minifier.minify(html) == '<p>a</p><!--[if IE]><p>ie</p><![endif]-->'
+
+def test_keeps_attribute_value_containing_gt():
+    html = '<div title="a >   b" data-x=\'c  >  d\'>x    y</div>'
+    assert minifier.minify(html) == '<div title="a >   b" data-x=\'c  >  d\'>x y</div>'
+
+def test_keeps_preserved_element_with_gt_in_attribute():
+    html = '<pre data-note="1 > 0">  a\n    b  </pre>   <p>c</p>'
+    assert minifier.minify(html) == '<pre data-note="1 > 0">  a\n    b  </pre> <p>c</p>'
+
+def test_disabled_returns_input():
+    html = '<p>  a  </p>'
+    assert HtmlMinifier(enabled=False).minify(html) == html
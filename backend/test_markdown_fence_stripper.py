@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from gemini_service import MarkdownFenceStripper
+
+def strip_fence(text):
+    """스트리밍 이전에 generate_html_content가 전체 응답에 적용하던 처리"""
+    html_content = text.strip()
+    if html_content.startswith('```'):
+        lines = html_content.split('\n')
+        html_content = '\n'.join(lines[1:-1]) if lines[-1].startswith('```') else '\n'.join(lines[1:])
+    return html_content
+
+def run_stripper(chunks):
+    stripper = MarkdownFenceStripper()
+    return ''.join(stripper.feed(chunk) for chunk in chunks) + stripper.finish()
+
+SAMPLES = [
+    '```html\n<p>a</p>\n   \n```  \n',
+    '``',
+    '`',
+    '```',
+    '```html',
+    '```html\n```',
+    '  \n```html\n<!DOCTYPE html>\n<html>\n  <body>\n\n  </body>\n</html>\n```\n',
+    '```\n\n<p>a</p>\n\n',
+    '```html\n<p>a</p>\n``` trailing',
+    '```html\n<pre>\n```\ncode\n```\n</pre>\n```',
+    '```html\n<p>a</p>\n   ```',
+    '```html\n<p>a</p>\n``',
+    '<p>a</p>\n```\n',
+    '  <p>a</p>\n\n  ',
+    '\n\n``x\n<p>a</p>',
+    '```html\r\n<p>a</p>\r\n```\r\n',
+    '',
+    '   \n  ',
+]
+
+@pytest.mark.parametrize('text', SAMPLES)
+def test_matches_batch_processing_in_one_chunk(text):
+    assert run_stripper([text]) == strip_fence(text)
+
+@pytest.mark.parametrize('text', SAMPLES)
+def test_matches_batch_processing_per_character(text):
+    assert run_stripper(list(text)) == strip_fence(text)
+
+def random_response(rng):
+    pieces = ['```', '```html', '``', '`', '<p>a</p>', '<div>', '  ', '\n', '\n\n', ' \n', 'x', '\t']
+    return ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+
+def random_chunks(rng, text):
+    cuts = sorted(rng.sample(range(len(text) + 1), rng.randint(0, min(len(text), 6))))
+    bounds = [0, *cuts, len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+def test_matches_batch_processing_for_random_chunk_splits():
+    rng = random.Random(6)
+    for _ in range(5000):
+        text = random_response(rng) if rng.random() < 0.8 else rng.choice(SAMPLES)
+        chunks = random_chunks(rng, text)
+        assert run_stripper(chunks) == strip_fence(text), (text, chunks)
+
+def test_streams_content_before_finish():
+    stripper = MarkdownFenceStripper()
+    assert stripper.feed('```html\n<p>a') == '<p>a'
+    assert stripper.feed('</p>\n') == '</p>'
+    assert stripper.feed('```') == ''
+    assert stripper.finish() == ''
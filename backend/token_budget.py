@@ -0,0 +1,55 @@
+import os
+
+# 잘라낸 프롬프트 끝에 붙이는 표시
+TRUNCATION_MARKER = '\n...(이하 생략)'
+
+class TokenBudget:
+    """모델 호출 전 토큰 수 추정과 작업별 입력/출력 토큰 한도
+
+    토큰 수는 API(count_tokens)를 호출하지 않고 로컬에서 추정합니다. ASCII 문자는 4자당
+    1토큰, 한글 등 그 외 문자는 1자당 1토큰으로 계산해 실제보다 약간 크게 잡으므로,
+    추정값이 한도 안이면 실제 입력도 한도를 넘지 않습니다.
+    """
+
+    def __init__(self, max_input_tokens=None, max_output_tokens=None):
+        self.max_input_tokens = max_input_tokens if max_input_tokens is not None else int(
+            os.getenv('GEMINI_MAX_INPUT_TOKENS', 8192))
+        # 작업별 응답 토큰 한도 (generation_config의 max_output_tokens, 기본 0은 제한 없음)
+        # 생각(thinking) 모델은 생각 토큰도 이 한도에 포함되므로, 지정할 때는 충분한 여유를 두어야 합니다.
+        self.max_output_tokens = max_output_tokens if max_output_tokens is not None else {
+            'evaluate': int(os.getenv('GEMINI_MAX_OUTPUT_TOKENS_EVALUATE', 0)),
+            'generate': int(os.getenv('GEMINI_MAX_OUTPUT_TOKENS_GENERATE', 0)),
+        }
+
+    @staticmethod
+    def estimate(text):
+        """텍스트의 토큰 수 추정"""
+        if not text:
+            return 0
+        ascii_chars = len(text.encode('ascii', 'ignore'))
+        return -(-ascii_chars // 4) + len(text) - ascii_chars
+
+    def truncate(self, text, max_tokens):
+        """추정 토큰 수가 max_tokens 이하가 되도록 뒷부분을 잘라 반환 (잘랐으면 표시를 붙임)"""
+        if self.estimate(text) <= max_tokens:
+            return text
+        limit = max_tokens - self.estimate(TRUNCATION_MARKER)
+        if limit <= 0:
+            return ''
+        # 문자별 비용(ASCII 1/4, 그 외 1)을 누적해 한도 안에 드는 가장 긴 앞부분을 찾음
+        cost = 0
+        end = 0
+        for index, char in enumerate(text):
+            cost += 1 if ord(char) < 128 else 4
+            # 올림해도 limit을 넘지 않도록 3/4토큰 여유를 둠
+            if cost > limit * 4 - 3:
+                break
+            end = index + 1
+        return text[:end].rstrip() + TRUNCATION_MARKER
+
+    def output_config(self, operation, generation_config=None):
+        """작업의 응답 토큰 한도를 넣은 generation_config (한도가 0 이하이면 그대로 반환)"""
+        limit = self.max_output_tokens.get(operation, 0)
+        if limit <= 0:
+            return generation_config
+        return {**(generation_config or {}), "max_output_tokens": limit}